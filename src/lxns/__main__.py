@@ -0,0 +1,518 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Command line interface to run programs inside namespaces.
+
+Similar to the ``nsenter`` and ``unshare`` utilities but can also run
+commands in many targets in parallel with the ``--batch`` option.
+"""
+from __future__ import annotations
+
+from argparse import REMAINDER, ArgumentParser
+from collections import deque
+from json import dumps
+from os import O_CLOEXEC, O_RDONLY, WEXITSTATUS, WIFEXITED, WTERMSIG
+from os import _exit as os_exit
+from os import close as close_fd
+from os import devnull, dup2, execvp, fork
+from os import open as open_fd
+from os import pidfd_open, pipe2
+from os import read as read_fd
+from os import waitpid
+from selectors import EVENT_READ, DefaultSelector
+from shlex import split as shlex_split
+from sys import stderr, stdin, stdout
+from typing import TYPE_CHECKING
+
+from . import features
+from .namespaces import (
+    ALL_NAMESPACE_CLASSES,
+    CgroupNamespace,
+    IpcNamespace,
+    MountNamespace,
+    NamespaceSet,
+    NetworkNamespace,
+    PidNamespace,
+    TimeNamespace,
+    UserNamespace,
+    UtsNamespace,
+    current_namespaces,
+)
+from .os import CLONE_NEWPID, setns, unshare
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from collections.abc import Iterable, Sequence
+    from typing import Any
+
+    from .namespaces import BaseNamespace
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+NAMESPACE_OPTIONS: tuple[tuple[str, type[BaseNamespace]], ...] = (
+    ("user", UserNamespace),
+    ("mount", MountNamespace),
+    ("net", NetworkNamespace),
+    ("ipc", IpcNamespace),
+    ("uts", UtsNamespace),
+    ("cgroup", CgroupNamespace),
+    ("pid", PidNamespace),
+    ("time", TimeNamespace),
+)
+NAMESPACE_CLASS_BY_OPTION = dict(NAMESPACE_OPTIONS)
+
+
+def _exit_code_from_status(status: int) -> int:
+    if WIFEXITED(status):
+        return WEXITSTATUS(status)
+
+    # Same as the shells report processes killed by a signal
+    return 128 + WTERMSIG(status)
+
+
+def exec_in_namespaces(
+    argv: Sequence[str],
+    namespaces: NamespaceSet,
+    unshare_flags: int,
+    joined_flags: int = 0,
+) -> None:
+    """Join namespaces, unshare new ones and execute the program.
+
+    If the pid namespace was joined or unshared a child is forked
+    to execute the program inside it and the caller waits for it
+    and exits with its exit code.
+
+    :param int joined_flags: ``CLONE_NEW*`` flags of the namespaces
+        that were already joined by :py:func:`join_target_namespaces`.
+    """
+    namespaces.setns()
+    if unshare_flags:
+        unshare(unshare_flags)
+        current_namespaces.invalidate(unshare_flags)
+
+    if PidNamespace in namespaces or (joined_flags | unshare_flags) & CLONE_NEWPID:
+        # Only children are placed in the pid namespace
+        pid = fork()
+        if pid != 0:
+            _, status = waitpid(pid, 0)
+            os_exit(_exit_code_from_status(status))
+
+    execvp(argv[0], list(argv))
+
+
+def join_target_namespaces(
+    target: int,
+    namespace_classes: Iterable[type[BaseNamespace]],
+) -> int:
+    """Join namespaces of the target process with a single ``setns`` call.
+
+    Requires ``setns`` accepting pidfd (Linux 5.8). Namespaces are
+    joined atomically: either all of them are joined or none.
+    Same as ``nsenter`` namespaces the caller is already in are skipped.
+
+    :return: ``CLONE_NEW*`` flags of the joined namespaces.
+    """
+    pidfd = pidfd_open(target)
+    try:
+        flags = 0
+        for ns_class in namespace_classes:
+            with ns_class.from_pidfd(pidfd) as ns:
+                if not current_namespaces.is_current(ns):
+                    flags |= ns_class.NAMESPACE_CONSTANT
+
+        if flags:
+            setns(pidfd, flags)
+            current_namespaces.invalidate(flags)
+    finally:
+        close_fd(pidfd)
+
+    return flags
+
+
+def _open_namespaces(
+    target: int | None,
+    namespace_paths: dict[type[BaseNamespace], str | None],
+) -> NamespaceSet:
+    namespaces: list[BaseNamespace] = []
+    try:
+        for ns_class, path in namespace_paths.items():
+            if path is not None:
+                namespaces.append(ns_class.from_path(path))
+                continue
+
+            if target is None:
+                raise ValueError(
+                    f"Namespace {ns_class.__name__} requires either path or target."
+                )
+
+            ns = ns_class.from_pid(target)
+            # Same as nsenter skip namespaces the caller is already in.
+            # Joining them could fail after joining the target user namespace.
+            if current_namespaces.is_current(ns):
+                ns.close()
+            else:
+                namespaces.append(ns)
+    except BaseException:
+        for ns in namespaces:
+            ns.close()
+
+        raise
+
+    return NamespaceSet(namespaces)
+
+
+class _BatchJob:
+    def __init__(
+        self,
+        line_number: int,
+        target: int,
+        argv: list[str],
+        pid: int,
+        output_fds: tuple[int, int],
+    ):
+        self.line_number = line_number
+        self.target = target
+        self.argv = argv
+        self.pid = pid
+        self.outputs = {fd: bytearray() for fd in output_fds}
+        self.open_fds = len(output_fds)
+
+    def result(self, returncode: int) -> dict[str, Any]:
+        stdout_fd, stderr_fd = self.outputs
+        return {
+            "line": self.line_number,
+            "target": self.target,
+            "argv": self.argv,
+            "returncode": returncode,
+            "stdout": self.outputs[stdout_fd].decode(errors="replace"),
+            "stderr": self.outputs[stderr_fd].decode(errors="replace"),
+        }
+
+
+class _BatchInput:
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.buffer = bytearray()
+        self.lines: deque[tuple[int, str]] = deque()
+        self.line_number = 0
+        self.is_exhausted = False
+
+    def read(self) -> None:
+        data = read_fd(self.fd, READ_CHUNK_SIZE)
+        if data:
+            self.buffer.extend(data)
+        else:
+            self.is_exhausted = True
+
+        *complete_lines, incomplete_line = self.buffer.split(b"\n")
+        if self.is_exhausted and incomplete_line:
+            # Last line without newline
+            complete_lines.append(incomplete_line)
+            incomplete_line = bytearray()
+
+        self.buffer = incomplete_line
+        for line in complete_lines:
+            self.line_number += 1
+            self.lines.append((self.line_number, line.decode(errors="replace")))
+
+
+def _spawn_batch_job(
+    line_number: int,
+    target: int,
+    argv: list[str],
+    namespaces: NamespaceSet,
+    unshare_flags: int,
+    devnull_fd: int,
+) -> _BatchJob:
+    stdout_read, stdout_write = pipe2(O_CLOEXEC)
+    stderr_read, stderr_write = pipe2(O_CLOEXEC)
+    try:
+        pid = fork()
+        if pid == 0:
+            try:
+                dup2(devnull_fd, 0)
+                dup2(stdout_write, 1)
+                dup2(stderr_write, 2)
+                exec_in_namespaces(argv, namespaces, unshare_flags)
+            except BaseException as e:
+                print(f"lxns: {e}", file=stderr, flush=True)
+            finally:
+                os_exit(127)
+    except BaseException:
+        close_fd(stdout_read)
+        close_fd(stderr_read)
+        raise
+    finally:
+        close_fd(stdout_write)
+        close_fd(stderr_write)
+
+    return _BatchJob(line_number, target, argv, pid, (stdout_read, stderr_read))
+
+
+def _print_result(result: dict[str, Any]) -> None:
+    print(dumps(result), flush=True)
+
+
+def run_batch(
+    jobs: int,
+    namespace_classes: Sequence[type[BaseNamespace]],
+    unshare_flags: int,
+) -> bool:
+    """Run commands read from stdin and print results as JSON lines.
+
+    Each line has the target pid followed by the command.
+    Namespaces of the target are opened once and reused for
+    all commands with the same target.
+
+    :return: True if all commands succeeded.
+    """
+    cached_namespaces: dict[int, NamespaceSet] = {}
+    running: dict[int, _BatchJob] = {}
+    selector = DefaultSelector()
+    all_succeeded = True
+    devnull_fd = open_fd(devnull, O_RDONLY | O_CLOEXEC)
+    batch_input = _BatchInput(stdin.fileno())
+    # Regular files can't be polled but are always readable
+    is_input_pollable = True
+    is_input_registered = False
+
+    try:
+        while not batch_input.is_exhausted or batch_input.lines or running:
+            while batch_input.lines and len(running) < jobs:
+                line_number, line = batch_input.lines.popleft()
+                try:
+                    target_str, *argv = shlex_split(line)
+                except ValueError as e:
+                    _print_result({"line": line_number, "error": str(e)})
+                    all_succeeded = False
+                    continue
+
+                try:
+                    target = int(target_str)
+                    if not argv:
+                        raise ValueError("Missing command")
+
+                    namespaces = cached_namespaces.get(target)
+                    if namespaces is None:
+                        namespaces = _open_namespaces(
+                            target, dict.fromkeys(namespace_classes)
+                        )
+                        cached_namespaces[target] = namespaces
+
+                    # Flush results before forking
+                    stdout.flush()
+                    job = _spawn_batch_job(
+                        line_number,
+                        target,
+                        argv,
+                        namespaces,
+                        unshare_flags,
+                        devnull_fd,
+                    )
+                except (OSError, ValueError) as e:
+                    _print_result(
+                        {"line": line_number, "target": target_str, "error": str(e)}
+                    )
+                    all_succeeded = False
+                    continue
+
+                running[job.pid] = job
+                for fd in job.outputs:
+                    selector.register(fd, EVENT_READ, job)
+
+            # Read new commands only when there is a free job slot.
+            # Input is polled together with the jobs outputs so that
+            # the results are printed while waiting for a slow producer.
+            wants_input = not batch_input.is_exhausted and len(running) < jobs
+            if wants_input and not is_input_pollable:
+                batch_input.read()
+                continue
+
+            if wants_input and not is_input_registered:
+                try:
+                    selector.register(batch_input.fd, EVENT_READ, batch_input)
+                except PermissionError:
+                    is_input_pollable = False
+                    continue
+
+                is_input_registered = True
+            elif not wants_input and is_input_registered:
+                selector.unregister(batch_input.fd)
+                is_input_registered = False
+
+            if not running and not is_input_registered:
+                # Input is exhausted and the remaining lines only had errors
+                continue
+
+            for key, _ in selector.select():
+                if key.data is batch_input:
+                    batch_input.read()
+                    continue
+
+                job = key.data
+                assert isinstance(key.fd, int)
+                data = read_fd(key.fd, READ_CHUNK_SIZE)
+                if data:
+                    job.outputs[key.fd].extend(data)
+                    continue
+
+                selector.unregister(key.fd)
+                close_fd(key.fd)
+                job.open_fds -= 1
+                if job.open_fds:
+                    continue
+
+                _, status = waitpid(job.pid, 0)
+                del running[job.pid]
+                returncode = _exit_code_from_status(status)
+                all_succeeded &= returncode == 0
+                _print_result(job.result(returncode))
+    finally:
+        for key in list(selector.get_map().values()):
+            if key.data is not batch_input:
+                close_fd(key.fd)
+
+        selector.close()
+        close_fd(devnull_fd)
+        for namespaces in cached_namespaces.values():
+            namespaces.close()
+
+    return all_succeeded
+
+
+def _parse_unshare_flags(unshare_arg: str) -> int:
+    flags = 0
+    for option_name in filter(None, unshare_arg.split(",")):
+        try:
+            flags |= NAMESPACE_CLASS_BY_OPTION[option_name].NAMESPACE_CONSTANT
+        except KeyError:
+            raise ValueError(f"Unknown namespace type {option_name!r}") from None
+
+    return flags
+
+
+def _create_arg_parser() -> ArgumentParser:
+    arg_parser = ArgumentParser(
+        prog="python -m lxns",
+        description="Run program in existing or new namespaces.",
+    )
+    arg_parser.add_argument(
+        "-t",
+        "--target",
+        type=int,
+        help="Process id to take namespaces from.",
+    )
+    arg_parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Join all namespaces of the target.",
+    )
+    for option_name, ns_class in NAMESPACE_OPTIONS:
+        arg_parser.add_argument(
+            f"--{option_name}",
+            nargs="?",
+            const="",
+            metavar="PATH",
+            help=(
+                f"Join {ns_class.__name__} of the target "
+                "or from the path to the namespace file."
+            ),
+        )
+    arg_parser.add_argument(
+        "-u",
+        "--unshare",
+        default="",
+        metavar="TYPES",
+        help=(
+            "Comma separated list of namespace types to create after "
+            "joining. For example: user,mount,net"
+        ),
+    )
+    arg_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Read lines of target pid and command from stdin "
+            "and print results as JSON lines."
+        ),
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=8,
+        help="Maximum number of commands to run in parallel in batch mode.",
+    )
+    arg_parser.add_argument("command", nargs=REMAINDER)
+    return arg_parser
+
+
+def _selected_namespaces(
+    args: Namespace,
+) -> dict[type[BaseNamespace], str | None]:
+    namespace_paths: dict[type[BaseNamespace], str | None] = {}
+    if args.all:
+        namespace_paths.update(dict.fromkeys(ALL_NAMESPACE_CLASSES))
+
+    for option_name, ns_class in NAMESPACE_OPTIONS:
+        option_value = getattr(args, option_name)
+        if option_value is not None:
+            namespace_paths[ns_class] = option_value or None
+
+    return namespace_paths
+
+
+def main() -> None:
+    arg_parser = _create_arg_parser()
+    args = arg_parser.parse_args()
+
+    try:
+        unshare_flags = _parse_unshare_flags(args.unshare)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    namespace_paths = _selected_namespaces(args)
+
+    if args.batch:
+        if any(path is not None for path in namespace_paths.values()):
+            arg_parser.error("Namespace paths can't be used in batch mode")
+
+        if args.command:
+            arg_parser.error("Batch mode reads commands from stdin")
+
+        all_succeeded = run_batch(
+            args.jobs,
+            tuple(namespace_paths) or ALL_NAMESPACE_CLASSES,
+            unshare_flags,
+        )
+        raise SystemExit(0 if all_succeeded else 1)
+
+    command = args.command
+    if command and command[0] == "--":
+        command = command[1:]
+
+    if not command:
+        arg_parser.error("Command is required")
+
+    if not namespace_paths and args.target is not None:
+        namespace_paths.update(dict.fromkeys(ALL_NAMESPACE_CLASSES))
+
+    try:
+        if (
+            args.target is not None
+            and all(path is None for path in namespace_paths.values())
+            and features.has_setns_pidfd()
+        ):
+            joined_flags = join_target_namespaces(args.target, namespace_paths)
+            exec_in_namespaces(command, NamespaceSet(), unshare_flags, joined_flags)
+        else:
+            namespaces = _open_namespaces(args.target, namespace_paths)
+            exec_in_namespaces(command, namespaces, unshare_flags)
+    except (OSError, ValueError) as e:
+        print(f"lxns: {e}", file=stderr)
+        raise SystemExit(127)
+
+
+if __name__ == "__main__":
+    main()
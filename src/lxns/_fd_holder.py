@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from os import close as close_fd
+from os import register_at_fork
+from threading import Lock
+
+from . import debug
+
+# Locks are picked by the object identity so that threads using
+# unrelated objects rarely contend. Lock is only held for the duration
+# of the attributes update and never during syscalls.
+_FD_LOCKS_COUNT = 64
+_fd_locks = [Lock() for _ in range(_FD_LOCKS_COUNT)]
+
+
+def fd_lock(holder: object) -> Lock:
+    """Return the lock protecting the file descriptor of the object."""
+    # Objects are at least 16 bytes aligned
+    return _fd_locks[(id(holder) >> 4) % _FD_LOCKS_COUNT]
+
+
+def _reset_fd_locks_after_fork() -> None:
+    # Locks could have been held by other threads during fork
+    _fd_locks[:] = [Lock() for _ in range(_FD_LOCKS_COUNT)]
+
+
+register_at_fork(after_in_child=_reset_fd_locks_after_fork)
+
+
+class FileDescriptorHolder:
+    """Base class for objects owning a file descriptor.
+
+    Methods that pass the file descriptor to a syscall should borrow it
+    with :py:meth:`_borrow_fd` and return it with :py:meth:`_return_fd`.
+    If the object is closed by another thread while the file descriptor
+    is borrowed the actual closing is delayed until it is returned.
+    This prevents double closing and using the file descriptor number
+    that was reused by an unrelated file.
+    """
+
+    __slots__ = ("_fd", "_borrows", "__weakref__")
+
+    def __init__(self) -> None:
+        self._fd: int | None = None
+        self._borrows = 0
+
+    def _set_fd(self, fd: int) -> None:
+        self._fd = fd
+        registry = debug._registry
+        if registry is not None:
+            registry.add(self)
+
+    def _borrow_fd(self, closed_message: str) -> int:
+        with fd_lock(self):
+            fd = self._fd
+            if fd is None:
+                raise ValueError(closed_message)
+
+            self._borrows += 1
+            return fd
+
+    def _return_fd(self, fd: int) -> None:
+        with fd_lock(self):
+            self._borrows -= 1
+            close_now = not self._borrows and self._fd is None
+
+        if close_now:
+            self._release_fd(fd)
+
+    def _release_fd(self, fd: int) -> None:
+        close_fd(fd)
+
+    def close(self) -> None:
+        with fd_lock(self):
+            fd = self._fd
+            self._fd = None
+            # Last borrower will close the file descriptor
+            close_now = fd is not None and not self._borrows
+
+        if fd is not None:
+            registry = debug._registry
+            if registry is not None:
+                registry.remove(self)
+
+        if close_now:
+            assert fd is not None
+            self._release_fd(fd)
@@ -0,0 +1,304 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Asyncio helpers to run code inside namespaces.
+
+Children processes are forked and their exit is watched using pidfds
+registered with the event loop. No threads or signal handlers are used.
+"""
+from __future__ import annotations
+
+from asyncio import CancelledError, get_running_loop
+from os import O_CLOEXEC, WNOHANG
+from os import _exit as os_exit
+from os import close as close_fd
+from os import execvp, fork, kill, pidfd_open, pipe2
+from os import read as read_fd
+from os import set_blocking, waitpid, waitstatus_to_exitcode
+from os import write as write_fd
+from pickle import dumps as pickle_dumps
+from pickle import loads as pickle_loads
+from signal import SIGKILL
+from typing import TYPE_CHECKING
+
+from .namespaces import current_namespaces
+from .os import unshare
+
+if TYPE_CHECKING:
+    from asyncio import Future
+    from collections.abc import Callable, Iterable, Sequence
+    from typing import Any, TypeVar
+
+    from .namespaces import BaseNamespace
+
+    T = TypeVar("T")
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Pipes of children in flight. Every forked child closes the pipes of
+# its siblings so that the parent receives EOF as soon as the child
+# that owns the pipe exits or executes.
+_CHILDREN_PIPES_FDS: set[int] = set()
+
+
+def _open_child_pipe() -> tuple[int, int]:
+    read_fd, write_fd = pipe2(O_CLOEXEC)
+    set_blocking(read_fd, False)
+    _CHILDREN_PIPES_FDS.update((read_fd, write_fd))
+    return read_fd, write_fd
+
+
+def _close_child_pipe_fd(fd: int) -> None:
+    _CHILDREN_PIPES_FDS.discard(fd)
+    close_fd(fd)
+
+
+def _fork_child(write_fd: int) -> int:
+    pid = fork()
+    if pid == 0:
+        for fd in _CHILDREN_PIPES_FDS:
+            if fd != write_fd:
+                close_fd(fd)
+
+        _CHILDREN_PIPES_FDS.clear()
+
+    return pid
+
+
+async def _wait_readable(fd: int) -> None:
+    loop = get_running_loop()
+    readable_future: Future[None] = loop.create_future()
+
+    def on_readable() -> None:
+        if not readable_future.done():
+            readable_future.set_result(None)
+
+    loop.add_reader(fd, on_readable)
+    try:
+        await readable_future
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _read_until_eof(fd: int) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        await _wait_readable(fd)
+        try:
+            data = read_fd(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            continue
+
+        if not data:
+            return b"".join(chunks)
+
+        chunks.append(data)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[write_fd(fd, view) :]
+
+
+def _enter_namespaces(namespaces: Iterable[BaseNamespace], unshare_flags: int) -> None:
+    for ns in namespaces:
+        ns.setns()
+
+    if unshare_flags:
+        unshare(unshare_flags)
+        current_namespaces.invalidate(unshare_flags)
+
+
+class NamespaceChild:
+    def __init__(self, pid: int):
+        """Child process watched by a pidfd.
+
+        Should not be created directly.
+        Use :py:func:`spawn_in_namespace` instead.
+        """
+        self.pid = pid
+        self.returncode: int | None = None
+        self._pidfd: int | None = pidfd_open(pid)
+
+    async def wait(self) -> int:
+        """Wait for the child process to exit without blocking the event loop.
+
+        :return: Exit code of the process. Negative if killed by a signal.
+        """
+        while self.returncode is None:
+            pidfd = self._pidfd
+            assert pidfd is not None
+            await _wait_readable(pidfd)
+            # Another coroutine could have reaped the child while waiting.
+            if self.returncode is not None:
+                break
+
+            self._reap(WNOHANG)
+
+        return self.returncode
+
+    def _reap(self, options: int) -> None:
+        pid, status = waitpid(self.pid, options)
+        if pid == 0:
+            return
+
+        self.returncode = waitstatus_to_exitcode(status)
+        if self._pidfd is not None:
+            close_fd(self._pidfd)
+            self._pidfd = None
+
+    def kill(self) -> None:
+        """Kill the child process and reap it.
+
+        Does nothing if the process already exited.
+        """
+        if self.returncode is not None:
+            return
+
+        kill(self.pid, SIGKILL)
+        self._reap(0)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} pid={self.pid} "
+            f"returncode={self.returncode}>"
+        )
+
+
+async def spawn_in_namespace(
+    argv: Sequence[str],
+    namespaces: Iterable[BaseNamespace] = (),
+    unshare_flags: int = 0,
+) -> NamespaceChild:
+    """Execute a program inside the given namespaces.
+
+    Child process joins the namespaces in the passed order, unshares
+    the new namespaces indicated by ``unshare_flags`` and executes ``argv``.
+
+    :param argv: Program and its arguments. ``PATH`` is searched for the program.
+    :param namespaces: Namespaces to join. User namespace should be first.
+    :param int unshare_flags: ``CLONE_NEW*`` flags of namespaces to unshare.
+    :raises OSError: Entering namespaces or executing the program failed.
+    :return: Child process that can be awaited with :py:meth:`NamespaceChild.wait`.
+    """
+    namespaces = tuple(namespaces)
+    error_read_fd, error_write_fd = _open_child_pipe()
+    try:
+        pid = _fork_child(error_write_fd)
+        if pid == 0:
+            try:
+                _enter_namespaces(namespaces, unshare_flags)
+                execvp(argv[0], list(argv))
+            except BaseException as e:
+                try:
+                    _write_all(error_write_fd, pickle_dumps(e))
+                finally:
+                    os_exit(127)
+
+        child = NamespaceChild(pid)
+        _close_child_pipe_fd(error_write_fd)
+        error_write_fd = -1
+
+        try:
+            # Error pipe is closed on exec
+            error_data = await _read_until_eof(error_read_fd)
+        except CancelledError:
+            child.kill()
+            raise
+    finally:
+        _close_child_pipe_fd(error_read_fd)
+        if error_write_fd >= 0:
+            _close_child_pipe_fd(error_write_fd)
+
+    if error_data:
+        await child.wait()
+        raise pickle_loads(error_data)
+
+    return child
+
+
+def _run_child(
+    result_write_fd: int,
+    namespaces: Iterable[BaseNamespace],
+    unshare_flags: int,
+    function: Callable[..., Any],
+    args: Sequence[Any],
+) -> None:
+    exit_code = 0
+    try:
+        try:
+            _enter_namespaces(namespaces, unshare_flags)
+            result = (True, function(*args))
+        except BaseException as e:
+            exit_code = 1
+            result = (False, e)
+
+        try:
+            result_data = pickle_dumps(result)
+        except Exception as e:
+            exit_code = 1
+            result_data = pickle_dumps(
+                (False, RuntimeError(f"Failed to pickle result: {e!r}"))
+            )
+
+        _write_all(result_write_fd, result_data)
+    finally:
+        os_exit(exit_code)
+
+
+async def run_in_namespace(
+    namespaces: Iterable[BaseNamespace],
+    function: Callable[..., T],
+    *args: Any,
+    unshare_flags: int = 0,
+) -> T:
+    """Run a function inside the given namespaces in a forked child process.
+
+    The return value or raised exception of the function is passed back
+    to the caller with pickle. Unlike the ``ProcessPoolExecutor`` the function
+    itself does not need to be picklable.
+
+    :param namespaces: Namespaces to join. User namespace should be first.
+    :param function: Function to call inside the namespaces.
+    :param args: Arguments to pass to the function.
+    :param int unshare_flags: ``CLONE_NEW*`` flags of namespaces to unshare
+        after joining the namespaces.
+    :raises ChildProcessError: Child process exited without returning result.
+    :return: Function return value.
+    """
+    namespaces = tuple(namespaces)
+    result_read_fd, result_write_fd = _open_child_pipe()
+    try:
+        pid = _fork_child(result_write_fd)
+        if pid == 0:
+            _run_child(result_write_fd, namespaces, unshare_flags, function, args)
+
+        child = NamespaceChild(pid)
+        _close_child_pipe_fd(result_write_fd)
+        result_write_fd = -1
+
+        try:
+            result_data = await _read_until_eof(result_read_fd)
+            returncode = await child.wait()
+        except CancelledError:
+            child.kill()
+            raise
+    finally:
+        _close_child_pipe_fd(result_read_fd)
+        if result_write_fd >= 0:
+            _close_child_pipe_fd(result_write_fd)
+
+    if not result_data:
+        raise ChildProcessError(
+            f"Child process {pid} exited with {returncode} without result."
+        )
+
+    is_success, result = pickle_loads(result_data)
+    if is_success:
+        return result  # type: ignore[no-any-return]
+    else:
+        raise result
+
+
+__all__ = ("NamespaceChild", "run_in_namespace", "spawn_in_namespace")
@@ -0,0 +1,396 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Namespace broker service.
+
+Broker holds open namespaces and cloned trees of the registered targets
+and hands them out to the clients over a Unix socket.
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from errno import EINVAL, EOPNOTSUPP
+from os import close as close_fd
+from os import pidfd_open
+from pathlib import Path
+from selectors import EVENT_READ, DefaultSelector
+from socket import AF_UNIX, SOCK_CLOEXEC, SOCK_SEQPACKET, socket
+from typing import TYPE_CHECKING
+
+from .mount import ClonedTree, recv_trees, send_trees
+from .namespaces import (
+    ALL_NAMESPACE_CLASSES,
+    MountNamespace,
+    _run_in_mount_thread,
+    current_namespaces,
+    recv_namespaces,
+    send_namespaces,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any
+
+    from .namespaces import BaseNamespace
+
+
+REQUEST_NAMESPACES = b"N"
+REQUEST_TREES = b"T"
+
+REPLY_OK = b"\0"
+REPLY_UNKNOWN_TARGET = b"\1"
+REPLY_BAD_REQUEST = b"\2"
+REPLY_UNSUPPORTED = b"\3"
+
+MAX_REQUEST_SIZE = 4096
+# Stalled client is disconnected instead of blocking the broker
+CLIENT_TIMEOUT = 1.0
+
+
+class BrokerTarget:
+    """Namespaces and trees held by the broker for a single process."""
+
+    def __init__(
+        self,
+        name: str,
+        pid: int,
+        pidfd: int,
+        namespaces: list[BaseNamespace],
+        trees: list[ClonedTree],
+        mount_namespace: MountNamespace | None = None,
+    ):
+        self.name = name
+        self.pid = pid
+        self.pidfd = pidfd
+        self.namespaces = namespaces
+        self.trees = trees
+        # Mount namespace the trees were registered from
+        self.mount_namespace = mount_namespace
+
+    def close(self) -> None:
+        for ns in self.namespaces:
+            ns.close()
+
+        for tree in self.trees:
+            tree.close()
+
+        self.namespaces.clear()
+        self.trees.clear()
+
+        if self.mount_namespace is not None:
+            self.mount_namespace.close()
+            self.mount_namespace = None
+
+        if self.pidfd >= 0:
+            close_fd(self.pidfd)
+            self.pidfd = -1
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name!r} pid={self.pid}>"
+
+
+def _open_target_namespaces(
+    pidfd: int,
+    namespace_classes: Iterable[type[BaseNamespace]],
+) -> list[BaseNamespace]:
+    namespaces: list[BaseNamespace] = []
+    try:
+        for ns_class in dict.fromkeys(namespace_classes):
+            # Opening from the pidfd guarantees the namespaces belong
+            # to the registered process and not to a process that
+            # reused its pid.
+            namespaces.append(ns_class.from_pidfd(pidfd))
+    except BaseException:
+        for ns in namespaces:
+            ns.close()
+
+        raise
+
+    return namespaces
+
+
+def _copy_tree(tree: ClonedTree, mount_namespace: MountNamespace | None) -> ClonedTree:
+    try:
+        return tree.clone()
+    except OSError as e:
+        # Detached trees can only be cloned since Linux 6.15.
+        # Older kernels clone the original path again in the
+        # mount namespace the tree was registered from.
+        if e.errno != EINVAL or mount_namespace is None or not tree._original_path:
+            raise
+
+    path = tree._original_path
+    if current_namespaces.is_current(mount_namespace):
+        return ClonedTree(path)
+
+    def clone_in_namespace(_: int) -> ClonedTree:
+        assert mount_namespace is not None
+        mount_namespace.setns()
+        return ClonedTree(path)
+
+    return _run_in_mount_thread(clone_in_namespace)
+
+
+class NamespaceBroker:
+    def __init__(self, socket_path: str | Path):
+        """Create namespace broker listening on the given Unix socket path.
+
+        Access to the broker is controlled by the permissions
+        of the socket file.
+
+        Targets are added with :py:meth:`register` and are automatically
+        evicted once the target process exits.
+        """
+        self._targets: dict[str, BrokerTarget] = {}
+        self._targets_by_pid: dict[int, BrokerTarget] = {}
+        self._selector = DefaultSelector()
+
+        self._listen_socket = socket(AF_UNIX, SOCK_SEQPACKET | SOCK_CLOEXEC)
+        try:
+            self._listen_socket.bind(str(socket_path))
+            self._listen_socket.listen()
+        except BaseException:
+            self._listen_socket.close()
+            raise
+
+        self._selector.register(self._listen_socket, EVENT_READ)
+
+    def register(
+        self,
+        name: str,
+        pid: int,
+        namespace_classes: Iterable[type[BaseNamespace]] = ALL_NAMESPACE_CLASSES,
+        trees: Iterable[ClonedTree] = (),
+    ) -> BrokerTarget:
+        """Open and hold namespaces of the given process.
+
+        :param str name: Unique name of the target.
+        :param int pid: Target process id.
+        :param namespace_classes: Types of namespaces to open.
+        :param trees: Detached trees associated with the target.
+            Broker takes the ownership of the trees. Trees should be
+            cloned from absolute paths in the current mount namespace.
+            On kernels older than 6.15 the copies handed out to the
+            clients are cloned from these paths again.
+        :raises KeyError: Target name or pid is already registered.
+        :raises ProcessLookupError: Process exited during registration.
+        """
+        if name in self._targets:
+            raise KeyError(f"Target {name!r} already registered.")
+
+        if pid in self._targets_by_pid:
+            raise KeyError(f"Process {pid} already registered.")
+
+        trees = list(trees)
+        pidfd = pidfd_open(pid)
+        try:
+            namespaces = _open_target_namespaces(pidfd, namespace_classes)
+        except BaseException:
+            close_fd(pidfd)
+            raise
+
+        target = BrokerTarget(name, pid, pidfd, namespaces, trees)
+        if trees:
+            try:
+                target.mount_namespace = MountNamespace.from_self()
+            except BaseException:
+                target.close()
+                raise
+
+        self._targets[name] = target
+        self._targets_by_pid[pid] = target
+        self._selector.register(pidfd, EVENT_READ, target)
+        return target
+
+    def unregister(self, name: str) -> None:
+        """Close held namespaces and trees of the target.
+
+        :raises KeyError: Target not registered.
+        """
+        target = self._targets.pop(name)
+        del self._targets_by_pid[target.pid]
+        self._selector.unregister(target.pidfd)
+        target.close()
+
+    def get_target(self, target: str | int) -> BrokerTarget:
+        """Find target by its name or pid.
+
+        :raises KeyError: Target not registered.
+        """
+        if isinstance(target, int):
+            return self._targets_by_pid[target]
+
+        try:
+            return self._targets[target]
+        except KeyError:
+            if target.isdigit():
+                return self._targets_by_pid[int(target)]
+
+            raise
+
+    def _handle_request(self, client: socket, request: bytes) -> None:
+        request_type, target_name = request[:1], request[1:]
+
+        if request_type not in (REQUEST_NAMESPACES, REQUEST_TREES):
+            client.send(REPLY_BAD_REQUEST)
+            return
+
+        try:
+            target = self.get_target(target_name.decode())
+        except (KeyError, UnicodeDecodeError):
+            client.send(REPLY_UNKNOWN_TARGET)
+            return
+
+        if request_type == REQUEST_NAMESPACES:
+            client.send(REPLY_OK)
+            send_namespaces(client, target.namespaces)
+            return
+
+        # Tree can only be mounted once. Each client gets its own copy
+        # and the held trees stay detached.
+        clones: list[ClonedTree] = []
+        try:
+            try:
+                for tree in target.trees:
+                    clones.append(_copy_tree(tree, target.mount_namespace))
+            except OSError:
+                client.send(REPLY_UNSUPPORTED)
+                return
+
+            client.send(REPLY_OK)
+            send_trees(client, clones)
+        finally:
+            for clone in clones:
+                clone.close()
+
+    def _close_client(self, client: socket) -> None:
+        self._selector.unregister(client)
+        client.close()
+
+    def process_events(self, timeout: float | None = None) -> None:
+        """Process incoming requests and exited targets.
+
+        :param float timeout: Maximum time to wait for events.
+            ``None`` waits indefinitely.
+        """
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._listen_socket:
+                client, _ = self._listen_socket.accept()
+                client.settimeout(CLIENT_TIMEOUT)
+                self._selector.register(client, EVENT_READ)
+            elif isinstance(key.data, BrokerTarget):
+                self.unregister(key.data.name)
+            else:
+                assert isinstance(key.fileobj, socket)
+                client = key.fileobj
+                try:
+                    request = client.recv(MAX_REQUEST_SIZE)
+                    if request:
+                        self._handle_request(client, request)
+                    else:
+                        self._close_client(client)
+                except OSError:
+                    self._close_client(client)
+
+    def serve_forever(self) -> None:
+        """Process events until interrupted."""
+        while True:
+            self.process_events()
+
+    def close(self) -> None:
+        """Close all held namespaces, trees and client connections."""
+        for target_name in list(self._targets):
+            self.unregister(target_name)
+
+        for key in list(self._selector.get_map().values()):
+            if isinstance(key.fileobj, socket):
+                key.fileobj.close()
+
+        self._selector.close()
+
+    def __enter__(self) -> NamespaceBroker:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+class BrokerClient:
+    def __init__(self, socket_path: str | Path):
+        """Connect to the namespace broker."""
+        self._socket = socket(AF_UNIX, SOCK_SEQPACKET | SOCK_CLOEXEC)
+        try:
+            self._socket.connect(str(socket_path))
+        except BaseException:
+            self._socket.close()
+            raise
+
+    def _request(self, request_type: bytes, target: str | int) -> None:
+        self._socket.send(request_type + str(target).encode())
+        reply = self._socket.recv(1)
+        if reply == REPLY_UNKNOWN_TARGET:
+            raise KeyError(target)
+        elif reply == REPLY_UNSUPPORTED:
+            raise OSError(EOPNOTSUPP, "Broker could not copy the trees.")
+        elif reply != REPLY_OK:
+            raise ConnectionError(f"Unexpected broker reply {reply!r}.")
+
+    def get_namespaces(self, target: str | int) -> list[BaseNamespace]:
+        """Get namespaces of the target by its name or pid.
+
+        :raises KeyError: Target is not registered or has exited.
+        """
+        self._request(REQUEST_NAMESPACES, target)
+        return recv_namespaces(self._socket)
+
+    def get_trees(self, target: str | int) -> list[ClonedTree]:
+        """Get detached trees of the target by its name or pid.
+
+        :raises KeyError: Target is not registered or has exited.
+        :raises OSError: Broker could not copy the trees.
+        """
+        self._request(REQUEST_TREES, target)
+        return recv_trees(self._socket)
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> BrokerClient:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(
+        prog="python -m lxns.broker",
+        description="Hold namespaces of processes and serve them over Unix socket.",
+    )
+    arg_parser.add_argument("socket_path", type=Path)
+    arg_parser.add_argument(
+        "--register",
+        metavar="NAME=PID",
+        action="append",
+        default=[],
+        help="Register target process. Can be passed multiple times.",
+    )
+    args = arg_parser.parse_args()
+
+    with NamespaceBroker(args.socket_path) as broker:
+        for register_arg in args.register:
+            name, _, pid = register_arg.rpartition("=")
+            broker.register(name or pid, int(pid))
+
+        try:
+            broker.serve_forever()
+        except KeyboardInterrupt:
+            ...
+        finally:
+            args.socket_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = ("NamespaceBroker", "BrokerClient", "BrokerTarget")
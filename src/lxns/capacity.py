@@ -0,0 +1,272 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Namespaces limits and usage collector.
+
+Creating a namespace over the limit fails with ``ENOSPC``. The collector
+reports how many namespaces exist compared to the limits so that
+the exhaustion can be detected before it happens.
+"""
+from __future__ import annotations
+
+from array import array
+from os import O_CLOEXEC, O_DIRECTORY, O_RDONLY
+from os import close as close_fd
+from os import listdir
+from os import open as open_fd
+from os import pread, stat
+from typing import TYPE_CHECKING
+
+from .namespaces import _NAMESPACE_CLASS_BY_TYPE
+from .os import fstat_ino_many, ns_get_userns_many
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from .namespaces import BaseNamespace
+
+
+LIMIT_READ_SIZE = 32
+
+
+def _proc_limit_name(ns_class: type[BaseNamespace]) -> str:
+    return f"max_{ns_class.NAMESPACE_PROC_NAME}_namespaces"
+
+
+class CapacitySnapshot:
+    def __init__(
+        self,
+        limits: dict[type[BaseNamespace], int],
+        counts: dict[type[BaseNamespace], int],
+        counts_by_user_namespace: dict[int, dict[type[BaseNamespace], int]],
+    ):
+        """Namespaces limits and usage at a point in time.
+
+        Use :py:meth:`NamespaceCapacity.snapshot` to take a snapshot.
+        """
+        self.limits = limits
+        self.counts = counts
+        self.counts_by_user_namespace = counts_by_user_namespace
+
+    def usage(self, ns_class: type[BaseNamespace]) -> float:
+        """Return used fraction of the namespace type limit.
+
+        Limit of zero disables creation of namespaces of that type
+        and is always reported as fully used.
+
+        :raises KeyError: Limit of namespace type is not known.
+        """
+        limit = self.limits[ns_class]
+        if limit <= 0:
+            return 1.0
+
+        return self.counts.get(ns_class, 0) / limit
+
+    def to_prometheus(self) -> str:
+        """Format snapshot as Prometheus text exposition format."""
+        lines = [
+            "# HELP lxns_namespaces_limit Maximum number of namespaces.",
+            "# TYPE lxns_namespaces_limit gauge",
+        ]
+        for ns_class, limit in self.limits.items():
+            lines.append(
+                f'lxns_namespaces_limit{{type="{ns_class.NAMESPACE_PROC_NAME}"}} '
+                f"{limit}"
+            )
+
+        lines.extend(
+            (
+                "# HELP lxns_namespaces Number of namespaces used by processes.",
+                "# TYPE lxns_namespaces gauge",
+            )
+        )
+        for ns_class, count in self.counts.items():
+            lines.append(
+                f'lxns_namespaces{{type="{ns_class.NAMESPACE_PROC_NAME}"}} {count}'
+            )
+
+        lines.extend(
+            (
+                "# HELP lxns_namespaces_by_user_namespace "
+                "Number of namespaces owned by a user namespace.",
+                "# TYPE lxns_namespaces_by_user_namespace gauge",
+            )
+        )
+        for user_ns_id, user_ns_counts in self.counts_by_user_namespace.items():
+            for ns_class, count in user_ns_counts.items():
+                lines.append(
+                    "lxns_namespaces_by_user_namespace{"
+                    f'type="{ns_class.NAMESPACE_PROC_NAME}",'
+                    f'user_namespace="{user_ns_id}"'
+                    f"}} {count}"
+                )
+
+        lines.append("")
+        return "\n".join(lines)
+
+
+class NamespaceCapacity:
+    def __init__(self, proc_path: str = "/proc"):
+        """Collect namespaces limits and number of existing namespaces.
+
+        The ``/proc`` directory and the limits files are opened once
+        and kept open until :py:meth:`close` is called. Owners of the
+        namespaces are cached by the namespace identifier so repeated
+        collections only inspect the newly created namespaces.
+
+        Limits are read from the current user namespace. Namespaces
+        are counted by inspecting the processes in ``/proc`` that
+        the caller has access to. Namespaces only kept alive by bind mounts
+        or file descriptors and threads in different namespaces than their
+        process are not counted.
+
+        :param str proc_path: Path to the mounted procfs.
+        """
+        self._proc_fd = -1
+        self._limit_fds: dict[type[BaseNamespace], int] = {}
+        self._owners: dict[int, int] = {}
+
+        try:
+            self._proc_fd = open_fd(proc_path, O_RDONLY | O_DIRECTORY | O_CLOEXEC)
+            sys_user_fd = open_fd(
+                "sys/user", O_RDONLY | O_DIRECTORY | O_CLOEXEC, dir_fd=self._proc_fd
+            )
+            try:
+                for ns_class in _NAMESPACE_CLASS_BY_TYPE.values():
+                    try:
+                        self._limit_fds[ns_class] = open_fd(
+                            _proc_limit_name(ns_class),
+                            O_RDONLY | O_CLOEXEC,
+                            dir_fd=sys_user_fd,
+                        )
+                    except FileNotFoundError:
+                        # Namespace type not supported by kernel
+                        ...
+            finally:
+                close_fd(sys_user_fd)
+        except BaseException:
+            self.close()
+            raise
+
+    def read_limits(self) -> dict[type[BaseNamespace], int]:
+        """Read limits of all namespace types supported by kernel."""
+        return {
+            ns_class: int(pread(limit_fd, LIMIT_READ_SIZE, 0))
+            for ns_class, limit_fd in self._limit_fds.items()
+        }
+
+    def _resolve_owners(self, new_namespaces: dict[int, str]) -> None:
+        paths = list(new_namespaces.items())
+        fds = array("i")
+        try:
+            for _, path in paths:
+                try:
+                    fds.append(
+                        open_fd(path, O_RDONLY | O_CLOEXEC, dir_fd=self._proc_fd)
+                    )
+                except OSError:
+                    fds.append(-1)
+
+            # Results are written to the C arrays directly
+            owner_fds = array("q", bytes(8 * len(fds)))
+            owner_ids = array("q", bytes(8 * len(fds)))
+            ns_get_userns_many(fds, owner_fds)
+            try:
+                fstat_ino_many(owner_fds, owner_ids)
+            finally:
+                for owner_fd in owner_fds:
+                    if owner_fd >= 0:
+                        close_fd(owner_fd)
+        finally:
+            for fd in fds:
+                if fd >= 0:
+                    close_fd(fd)
+
+        for (ns_id, _), owner_id in zip(paths, owner_ids):
+            # Owner is not accessible, for example, the parent
+            # of the initial user namespace.
+            self._owners[ns_id] = owner_id if owner_id > 0 else 0
+
+    def count_namespaces(
+        self,
+    ) -> tuple[
+        dict[type[BaseNamespace], int],
+        dict[int, dict[type[BaseNamespace], int]],
+    ]:
+        """Count namespaces used by processes.
+
+        :return: Tuple of number of namespaces of each type and
+            number of namespaces of each type by the owning user
+            namespace identifier. User namespaces are counted under
+            their parent user namespace.
+        """
+        seen_namespaces: dict[int, type[BaseNamespace]] = {}
+        new_namespaces: dict[int, str] = {}
+
+        for pid in listdir(self._proc_fd):
+            if not pid.isdigit():
+                continue
+
+            for ns_class in self._limit_fds:
+                path = f"{pid}/ns/{ns_class.NAMESPACE_PROC_NAME}"
+                try:
+                    ns_id = stat(path, dir_fd=self._proc_fd).st_ino
+                except OSError:
+                    # Process exited or not accessible
+                    continue
+
+                if ns_id in seen_namespaces:
+                    continue
+
+                seen_namespaces[ns_id] = ns_class
+                if ns_id not in self._owners:
+                    new_namespaces[ns_id] = path
+
+        if new_namespaces:
+            self._resolve_owners(new_namespaces)
+
+        # Drop owners of namespaces that no longer exist
+        self._owners = {
+            ns_id: self._owners[ns_id]
+            for ns_id in seen_namespaces
+            if ns_id in self._owners
+        }
+
+        counts: dict[type[BaseNamespace], int] = dict.fromkeys(self._limit_fds, 0)
+        counts_by_user_namespace: dict[int, dict[type[BaseNamespace], int]] = {}
+        for ns_id, ns_class in seen_namespaces.items():
+            counts[ns_class] += 1
+
+            owner_id = self._owners.get(ns_id, 0)
+            if not owner_id:
+                continue
+
+            user_ns_counts = counts_by_user_namespace.setdefault(owner_id, {})
+            user_ns_counts[ns_class] = user_ns_counts.get(ns_class, 0) + 1
+
+        return counts, counts_by_user_namespace
+
+    def snapshot(self) -> CapacitySnapshot:
+        """Read limits and count namespaces."""
+        limits = self.read_limits()
+        counts, counts_by_user_namespace = self.count_namespaces()
+        return CapacitySnapshot(limits, counts, counts_by_user_namespace)
+
+    def close(self) -> None:
+        """Close the cached file descriptors."""
+        for limit_fd in self._limit_fds.values():
+            close_fd(limit_fd)
+
+        self._limit_fds.clear()
+
+        if self._proc_fd >= 0:
+            close_fd(self._proc_fd)
+            self._proc_fd = -1
+
+    def __enter__(self) -> NamespaceCapacity:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+__all__ = ("NamespaceCapacity", "CapacitySnapshot")
@@ -0,0 +1,297 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Cgroup v2 statistics collector.
+
+Cgroups of the targets are resolved once. Directories and statistics
+files are kept open and read with ``pread`` into a reused buffer so
+that repeated collections do not open any files.
+"""
+from __future__ import annotations
+
+from os import O_CLOEXEC, O_DIRECTORY, O_RDONLY
+from os import close as close_fd
+from os import open as open_fd
+from os import preadv
+from os.path import realpath
+from typing import TYPE_CHECKING
+
+from .mount import _parse_mountinfo
+from .namespaces import _run_in_thread
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from typing import Any, TypeVar
+
+    from .mount import MountInfo
+    from .namespaces import CgroupNamespace
+
+    T = TypeVar("T")
+
+
+DEFAULT_STAT_FILES = ("cpu.stat", "memory.current", "memory.stat", "pids.current")
+INITIAL_BUFFER_SIZE = 16 * 1024
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, mode="rb") as f:
+        return f.read()
+
+
+def _run_in_namespace(
+    namespace: CgroupNamespace | None, function: Callable[[], T]
+) -> T:
+    if namespace is None:
+        return function()
+
+    # Paths in /proc/<pid>/cgroup and mountinfo are relative to the
+    # cgroup namespace of the reader.
+    return _run_in_thread(namespace.setns, function, "lxns-cgroup")
+
+
+def _find_cgroup2_mount(
+    mounts: Iterable[MountInfo], cgroup_root: str | None
+) -> MountInfo:
+    for mount in mounts:
+        if mount.fs_type != "cgroup2":
+            continue
+
+        if cgroup_root is None or mount.mount_point == cgroup_root:
+            return mount
+
+    if cgroup_root is None:
+        raise ValueError("Cgroup v2 file system is not mounted.")
+
+    raise ValueError(f"{cgroup_root} is not a cgroup v2 mount.")
+
+
+def _parse_unified_cgroup(data: bytes) -> str:
+    for line in data.decode().splitlines():
+        hierarchy_id, _, rest = line.partition(":")
+        controllers, _, cgroup_path = rest.partition(":")
+        if hierarchy_id == "0" and not controllers:
+            return cgroup_path
+
+    raise ValueError("Process is not in a cgroup v2 hierarchy.")
+
+
+def _relative_cgroup_path(cgroup_path: str, mount_root: str) -> str:
+    # Both paths are relative to the cgroup namespace root and
+    # start with "/.." components if they are outside of it.
+    if cgroup_path == mount_root:
+        return "."
+
+    prefix = mount_root if mount_root.endswith("/") else mount_root + "/"
+    if not cgroup_path.startswith(prefix):
+        raise ValueError(
+            f"Cgroup {cgroup_path!r} is not visible under "
+            f"the cgroup mount root {mount_root!r}. "
+            "Pass the cgroup namespace the mount belongs to."
+        )
+
+    return cgroup_path[len(prefix) :]
+
+
+def _parse_stat(file_name: str, data: memoryview, stats: dict[str, int]) -> None:
+    lines = bytes(data).split(b"\n")
+    if len(lines) <= 2 and b" " not in lines[0]:
+        # Single value file such as "memory.current"
+        value = lines[0]
+        if value.isdigit():
+            stats[file_name] = int(value)
+
+        return
+
+    # Flat keyed file such as "cpu.stat"
+    for line in lines:
+        key, _, value = line.partition(b" ")
+        if value.isdigit():
+            stats[f"{file_name}.{key.decode()}"] = int(value)
+
+
+class _CgroupTarget:
+    def __init__(self, path: str, dir_fd: int):
+        self.path = path
+        self.dir_fd = dir_fd
+        # File descriptors of statistics files. -1 if file does not exist.
+        self.file_fds: dict[str, int] = {}
+
+    def close(self) -> None:
+        for fd in self.file_fds.values():
+            if fd >= 0:
+                close_fd(fd)
+
+        self.file_fds.clear()
+        if self.dir_fd >= 0:
+            close_fd(self.dir_fd)
+            self.dir_fd = -1
+
+
+class CgroupStatsCollector:
+    def __init__(
+        self,
+        cgroup_root: str | None = None,
+        stat_files: Iterable[str] = DEFAULT_STAT_FILES,
+        namespace: CgroupNamespace | None = None,
+        proc_path: str = "/proc",
+    ):
+        """Collect statistics of cgroup v2 cgroups.
+
+        Targets are added with :py:meth:`add_pid` or :py:meth:`add_path`.
+        Directories of the cgroups and statistics files are opened once
+        and kept open until the target is removed or the collector
+        is closed. Each target uses one file descriptor plus
+        one for each statistics file.
+
+        Single value files such as ``memory.current`` are reported under
+        the file name and flat keyed files such as ``cpu.stat`` under
+        the file name and the key. For example, ``cpu.stat.usage_usec``.
+        Files that do not exist because the controller is not enabled
+        are skipped.
+
+        :param cgroup_root: Mount point of the cgroup v2 file system.
+            ``None`` finds the first cgroup v2 mount.
+        :param stat_files: Names of statistics files to read.
+        :param namespace: Cgroup namespace to resolve the cgroups of
+            processes in. Required if the cgroup file system was mounted
+            in a different cgroup namespace than the caller's and the
+            targets are outside of the caller's cgroup namespace.
+            For example, the initial cgroup namespace opened with
+            ``CgroupNamespace.from_pid(1)``.
+        :param str proc_path: Path to the mounted procfs.
+        :raises ValueError: Cgroup v2 file system is not mounted.
+        """
+        self.stat_files = tuple(stat_files)
+        self._namespace = namespace
+        self._proc_path = proc_path
+        self._targets: dict[str, _CgroupTarget] = {}
+        self._buffer = bytearray(INITIAL_BUFFER_SIZE)
+
+        mount = _find_cgroup2_mount(
+            _parse_mountinfo(
+                _run_in_namespace(
+                    namespace,
+                    lambda: _read_file(f"{proc_path}/self/mountinfo"),
+                )
+            ),
+            None if cgroup_root is None else realpath(cgroup_root),
+        )
+        self.cgroup_root = mount.mount_point
+        self._mount_root = mount.root
+        self._root_fd = open_fd(self.cgroup_root, O_RDONLY | O_DIRECTORY | O_CLOEXEC)
+
+    def add_path(self, name: str, path: str) -> None:
+        """Add cgroup by its path relative to the cgroup root.
+
+        :raises KeyError: Target name already added.
+        :raises OSError: Cgroup does not exist.
+        """
+        if name in self._targets:
+            raise KeyError(f"Target {name!r} already added.")
+
+        path = path.lstrip("/") or "."
+        dir_fd = open_fd(path, O_RDONLY | O_DIRECTORY | O_CLOEXEC, dir_fd=self._root_fd)
+        self._targets[name] = _CgroupTarget(path, dir_fd)
+
+    def add_pid(self, name: str, pid: int) -> str:
+        """Add cgroup the process is currently in.
+
+        The cgroup is resolved once. If the process moves to
+        a different cgroup the old cgroup is still collected.
+
+        :return: Path of the cgroup relative to the cgroup root.
+        :raises KeyError: Target name already added.
+        :raises ValueError: Cgroup of the process is not visible
+            under the cgroup root.
+        :raises OSError: Process does not exist.
+        """
+        if name in self._targets:
+            raise KeyError(f"Target {name!r} already added.")
+
+        cgroup_path = _parse_unified_cgroup(
+            _run_in_namespace(
+                self._namespace,
+                lambda: _read_file(f"{self._proc_path}/{pid}/cgroup"),
+            )
+        )
+        path = _relative_cgroup_path(cgroup_path, self._mount_root)
+        self.add_path(name, path)
+        return path
+
+    def remove(self, name: str) -> None:
+        """Remove target and close its file descriptors.
+
+        :raises KeyError: Target not found.
+        """
+        self._targets.pop(name).close()
+
+    def _pread(self, fd: int) -> memoryview:
+        while True:
+            buffer = self._buffer
+            read_size = preadv(fd, (buffer,), 0)
+            if read_size < len(buffer):
+                return memoryview(buffer)[:read_size]
+
+            self._buffer = bytearray(len(buffer) * 2)
+
+    def read(self, name: str) -> dict[str, int]:
+        """Read statistics of a single target.
+
+        :raises KeyError: Target not found.
+        :raises OSError: Cgroup was removed.
+        """
+        target = self._targets[name]
+        stats: dict[str, int] = {}
+        for file_name in self.stat_files:
+            fd = target.file_fds.get(file_name)
+            if fd is None:
+                try:
+                    fd = open_fd(file_name, O_RDONLY | O_CLOEXEC, dir_fd=target.dir_fd)
+                except FileNotFoundError:
+                    fd = -1
+
+                target.file_fds[file_name] = fd
+
+            if fd < 0:
+                continue
+
+            data = self._pread(fd)
+            try:
+                _parse_stat(file_name, data, stats)
+            finally:
+                data.release()
+
+        return stats
+
+    def collect(self) -> dict[str, dict[str, int]]:
+        """Read statistics of all targets.
+
+        Targets which cgroups were removed are skipped.
+        """
+        results: dict[str, dict[str, int]] = {}
+        for name in self._targets:
+            try:
+                results[name] = self.read(name)
+            except OSError:
+                # Removed cgroup returns ENODEV
+                continue
+
+        return results
+
+    def close(self) -> None:
+        """Close file descriptors of all targets and the cgroup root."""
+        for target in self._targets.values():
+            target.close()
+
+        self._targets.clear()
+        if self._root_fd >= 0:
+            close_fd(self._root_fd)
+            self._root_fd = -1
+
+    def __enter__(self) -> CgroupStatsCollector:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+__all__ = ("CgroupStatsCollector",)
@@ -0,0 +1,181 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Debugging utilities to track file descriptors leaks.
+
+Tracking is disabled by default. Once enabled every namespace, namespace
+set and cloned tree object that owns a file descriptor is registered until
+it is closed.
+"""
+from __future__ import annotations
+
+from itertools import count
+from threading import Lock
+from traceback import StackSummary, extract_stack
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional, Tuple
+
+    HandleRecord = Tuple[str, Optional[StackSummary]]
+
+
+class _HandleRegistry:
+    def __init__(self, record_tracebacks: bool, traceback_limit: int | None):
+        self.record_tracebacks = record_tracebacks
+        self.traceback_limit = traceback_limit
+        self.lock = Lock()
+        self.handles_sequence: dict[int, int] = {}
+        self.handles: dict[int, HandleRecord] = {}
+        self.live_counts: dict[str, int] = {}
+        self.high_water_marks: dict[str, int] = {}
+        self.sequence_counter = count()
+
+    def add(self, handle: object) -> None:
+        type_name = type(handle).__name__
+        traceback = None
+        if self.record_tracebacks:
+            # Drop the frames of the registry
+            traceback = StackSummary.from_list(
+                extract_stack(limit=self.traceback_limit)[:-2]
+            )
+
+        with self.lock:
+            sequence = next(self.sequence_counter)
+            self.handles_sequence[id(handle)] = sequence
+            self.handles[sequence] = (type_name, traceback)
+
+            live_count = self.live_counts.get(type_name, 0) + 1
+            self.live_counts[type_name] = live_count
+            if live_count > self.high_water_marks.get(type_name, 0):
+                self.high_water_marks[type_name] = live_count
+
+    def remove(self, handle: object) -> None:
+        with self.lock:
+            sequence = self.handles_sequence.pop(id(handle), None)
+            if sequence is None:
+                # Handle was created before tracking was enabled
+                return
+
+            type_name, _ = self.handles.pop(sequence)
+            self.live_counts[type_name] -= 1
+
+
+_registry: _HandleRegistry | None = None
+
+
+def enable(record_tracebacks: bool = False, traceback_limit: int | None = None) -> None:
+    """Start tracking the file descriptors owning objects.
+
+    Objects created before the tracking was enabled are not tracked.
+    Calling this function again resets the tracked state.
+
+    :param bool record_tracebacks: Record the traceback where each object
+        was created. Significantly slows down objects creation.
+    :param int traceback_limit: Maximum number of frames to record.
+    """
+    global _registry
+    _registry = _HandleRegistry(record_tracebacks, traceback_limit)
+
+
+def disable() -> None:
+    """Stop tracking and drop the tracked state."""
+    global _registry
+    _registry = None
+
+
+def is_enabled() -> bool:
+    """Return True if tracking is enabled."""
+    return _registry is not None
+
+
+class HandleCountDiff:
+    """Difference in number of live objects of a type between two snapshots."""
+
+    def __init__(self, type_name: str, count: int, count_diff: int):
+        self.type_name = type_name
+        self.count = count
+        self.count_diff = count_diff
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} {self.type_name} "
+            f"count={self.count} ({self.count_diff:+})>"
+        )
+
+
+class Snapshot:
+    def __init__(
+        self,
+        handles: dict[int, HandleRecord],
+        live_counts: dict[str, int],
+        high_water_marks: dict[str, int],
+    ):
+        """Tracked objects state at a point in time.
+
+        Use :py:func:`snapshot` to take a snapshot.
+        """
+        self.handles = handles
+        self.live_counts = live_counts
+        self.high_water_marks = high_water_marks
+
+    def compare_to(self, old_snapshot: Snapshot) -> list[HandleCountDiff]:
+        """Compare number of live objects with an older snapshot.
+
+        :return: List of differences sorted by the absolute value
+            of the difference from biggest to smallest.
+        """
+        type_names = sorted(self.live_counts.keys() | old_snapshot.live_counts.keys())
+        diffs = [
+            HandleCountDiff(
+                type_name,
+                self.live_counts.get(type_name, 0),
+                self.live_counts.get(type_name, 0)
+                - old_snapshot.live_counts.get(type_name, 0),
+            )
+            for type_name in type_names
+        ]
+        diffs.sort(key=lambda diff: abs(diff.count_diff), reverse=True)
+        return diffs
+
+    def new_handles(self, old_snapshot: Snapshot) -> list[HandleRecord]:
+        """Return objects that are alive now but were not in older snapshot.
+
+        Each object is represented by its type name and the creation
+        traceback if tracebacks recording was enabled.
+        """
+        return [
+            record
+            for sequence, record in self.handles.items()
+            if sequence not in old_snapshot.handles
+        ]
+
+
+def snapshot() -> Snapshot:
+    """Take a snapshot of the currently tracked objects.
+
+    :raises RuntimeError: Tracking is not enabled.
+    """
+    registry = _registry
+    if registry is None:
+        raise RuntimeError("Tracking is not enabled. Call lxns.debug.enable() first.")
+
+    with registry.lock:
+        return Snapshot(
+            dict(registry.handles),
+            {
+                type_name: live_count
+                for type_name, live_count in registry.live_counts.items()
+                if live_count
+            },
+            dict(registry.high_water_marks),
+        )
+
+
+__all__ = (
+    "enable",
+    "disable",
+    "is_enabled",
+    "snapshot",
+    "Snapshot",
+    "HandleCountDiff",
+)
@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Kernel features detection.
+
+Each feature is probed once on the first use and the result is cached
+for the lifetime of the process. Probes are harmless calls that are
+rejected by the kernel either because the arguments are invalid or
+because the feature does not exist.
+"""
+from __future__ import annotations
+
+from fcntl import ioctl
+from functools import lru_cache
+from os import close as close_fd
+from os import getpid, pidfd_open
+from typing import TYPE_CHECKING
+
+from .os import PIDFD_GET_UTS_NAMESPACE, probe_setns_pidfd, probe_syscall
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@lru_cache(maxsize=None)
+def has_syscall(name: str) -> bool:
+    """Check if the kernel implements the syscall.
+
+    Only ``open_tree``, ``move_mount``, ``clone3``, ``mount_setattr``,
+    ``statmount`` and ``listmount`` can be probed. Other names
+    return ``False``. Syscall blocked by seccomp with ``ENOSYS``,
+    ``EPERM`` or ``EACCES`` is reported as missing. The exception is
+    ``move_mount`` which returns ``EPERM`` to unprivileged callers
+    before checking the arguments.
+    """
+    return probe_syscall(name)
+
+
+def has_open_tree() -> bool:
+    """``open_tree`` and ``move_mount`` new mount API syscalls (Linux 5.2)."""
+    return has_syscall("open_tree") and has_syscall("move_mount")
+
+
+def has_clone3() -> bool:
+    """``clone3`` syscall (Linux 5.3)."""
+    return has_syscall("clone3")
+
+
+def has_mount_setattr() -> bool:
+    """``mount_setattr`` syscall (Linux 5.12)."""
+    return has_syscall("mount_setattr")
+
+
+def has_statmount() -> bool:
+    """``statmount`` and ``listmount`` syscalls (Linux 6.8)."""
+    return has_syscall("statmount") and has_syscall("listmount")
+
+
+@lru_cache(maxsize=None)
+def has_setns_pidfd() -> bool:
+    """``setns`` accepts pidfd to join multiple namespaces at once (Linux 5.8).
+
+    Probed by joining namespaces of an already reaped child process
+    which fails before any namespace is changed.
+    """
+    return probe_setns_pidfd()
+
+
+@lru_cache(maxsize=None)
+def has_pidfd_get_namespace() -> bool:
+    """``PIDFD_GET_*_NAMESPACE`` pidfd ioctls (Linux 6.11)."""
+    try:
+        pidfd = pidfd_open(getpid())
+    except OSError:
+        return False
+
+    try:
+        ns_fd = ioctl(pidfd, PIDFD_GET_UTS_NAMESPACE)
+    except OSError:
+        # ENOTTY on older kernels. Any other error also makes
+        # opening namespaces from /proc the safer choice.
+        return False
+    finally:
+        close_fd(pidfd)
+
+    close_fd(ns_fd)
+    return True
+
+
+ALL_FEATURES: dict[str, Callable[[], bool]] = {
+    "open_tree": has_open_tree,
+    "clone3": has_clone3,
+    "mount_setattr": has_mount_setattr,
+    "statmount": has_statmount,
+    "setns_pidfd": has_setns_pidfd,
+    "pidfd_get_namespace": has_pidfd_get_namespace,
+}
+
+
+def probe_all() -> dict[str, bool]:
+    """Probe all features and return the mapping of name to availability."""
+    return {name: probe() for name, probe in ALL_FEATURES.items()}
+
+
+__all__ = (
+    "has_syscall",
+    "has_open_tree",
+    "has_clone3",
+    "has_mount_setattr",
+    "has_statmount",
+    "has_setns_pidfd",
+    "has_pidfd_get_namespace",
+    "probe_all",
+)
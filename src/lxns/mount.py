@@ -2,11 +2,21 @@
 # SPDX-FileCopyrightText: 2024 igo95862
 from __future__ import annotations
 
+from os import O_CLOEXEC, O_RDONLY
 from os import close as close_fd
+from os import fsdecode, fsencode
+from os import open as open_fd
+from os import read as read_fd
+from re import compile as re_compile
+from socket import MSG_CTRUNC, MSG_TRUNC, recv_fds, send_fds
 from typing import TYPE_CHECKING
 from warnings import warn
 
+from ._fd_holder import FileDescriptorHolder
+from .namespaces import _clone_mount_namespaces, _run_in_mount_thread
 from .os import (
+    AT_EMPTY_PATH,
+    AT_RECURSIVE,
     MOVE_MOUNT_F_EMPTY_PATH,
     OPEN_TREE_CLOEXEC,
     OPEN_TREE_CLONE,
@@ -15,11 +25,22 @@ from .os import (
 )
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
     from pathlib import Path
+    from socket import socket
     from typing import Any
 
+    from .namespaces import MountNamespace
+
+
+MOUNTINFO_READ_SIZE = 64 * 1024
+
+_MOUNTINFO_ESCAPE = re_compile(rb"\\([0-7]{3})")
+
+
+class ClonedTree(FileDescriptorHolder):
+    __slots__ = ("_original_path",)
 
-class ClonedTree:
     def __init__(self, path: str | Path):
         """Clone mount tree at the given path.
 
@@ -28,10 +49,38 @@ class ClonedTree:
 
         The cloned tree can be mounted at any point with :py:meth:`mount`.
         """
-        self._fd: int | None = None
+        super().__init__()
         self._original_path = path
 
-        self._fd = open_tree(path=str(path), flags=OPEN_TREE_CLONE | OPEN_TREE_CLOEXEC)
+        self._set_fd(
+            open_tree(path=str(path), flags=OPEN_TREE_CLONE | OPEN_TREE_CLOEXEC)
+        )
+
+    @classmethod
+    def from_fd(cls, fd: int, original_path: str | Path = "") -> ClonedTree:
+        """Wrap existing detached tree file descriptor in a ClonedTree object.
+
+        :param int fd: File descriptor returned by ``open_tree`` with
+            ``OPEN_TREE_CLONE`` flag. ClonedTree takes the ownership of it.
+        :param str original_path: Path the tree was cloned from.
+            Only used for the representation.
+        """
+        tree = cls.__new__(cls)
+        FileDescriptorHolder.__init__(tree)
+        tree._set_fd(fd)
+        tree._original_path = original_path
+        return tree
+
+    def fileno(self) -> int:
+        """Return tree underlying file descriptor.
+
+        :raises ValueError: Tree was already closed.
+        """
+        fd = self._fd
+        if fd is not None:
+            return fd
+        else:
+            raise ValueError("Tree file descriptor is already closed.")
 
     def __del__(self) -> None:
         if self._fd is not None:
@@ -56,14 +105,352 @@ class ClonedTree:
 
         Can be called multiple times in which case only first call
         will close the namespace and subsequent calls will be ignored.
+
+        If another thread is using the tree the file descriptor
+        is closed once that thread finishes.
         """
-        if self._fd is not None:
-            close_fd(self._fd)
-            self._fd = None
+        super().close()
+
+    def clone(self) -> ClonedTree:
+        """Create a new detached copy of the tree including its submounts.
+
+        Tree can only be mounted once. Copies can be handed out
+        to multiple users while the original is kept detached.
+
+        Cloning a detached tree requires Linux 6.15 or newer.
+        """
+        fd = self._borrow_fd("Tree is already closed.")
+        try:
+            return ClonedTree.from_fd(
+                open_tree(
+                    fd,
+                    "",
+                    OPEN_TREE_CLONE | OPEN_TREE_CLOEXEC | AT_EMPTY_PATH | AT_RECURSIVE,
+                ),
+                self._original_path,
+            )
+        finally:
+            self._return_fd(fd)
 
     def mount(self, path: str | Path) -> None:
         """Create bind mount at the given path."""
-        if self._fd is None:
-            raise ValueError("Tree is already closed.")
+        fd = self._borrow_fd("Tree is already closed.")
+        try:
+            move_mount(fd, to_path=str(path), flags=MOVE_MOUNT_F_EMPTY_PATH)
+        finally:
+            self._return_fd(fd)
+
+
+def send_trees(sock: socket, trees: Iterable[ClonedTree]) -> None:
+    """Send cloned trees over a Unix socket.
+
+    File descriptors are passed using ``SCM_RIGHTS`` ancillary data
+    alongside the original paths of the trees.
+    The sender keeps the ownership of the trees and can close them
+    after this function returns.
+
+    Use ``SOCK_SEQPACKET`` or ``SOCK_DGRAM`` sockets so that each call
+    corresponds to exactly one :py:func:`recv_trees` call.
+    The kernel limits a single message to 253 file descriptors.
+    """
+    trees = list(trees)
+    paths = b"\0".join(fsencode(str(tree._original_path)) for tree in trees)
+    # Marker byte makes the message non-empty even without any trees
+    # so it can be told apart from the closed connection.
+    send_fds(sock, (b"T", paths), [tree.fileno() for tree in trees])
+
+
+def recv_trees(
+    sock: socket, max_trees: int = 16, bufsize: int = 4096
+) -> list[ClonedTree]:
+    """Receive cloned trees sent by :py:func:`send_trees`.
+
+    :param int max_trees: Maximum number of trees in a message.
+    :param int bufsize: Maximum size of the original paths data.
+    :raises ConnectionError: Socket was closed by the other side.
+    :raises ValueError: Received message was truncated. For example,
+        more than ``max_trees`` trees were sent. Received trees are closed.
+    """
+    msg, fds, flags, _ = recv_fds(sock, bufsize, max_trees)
+    paths = msg[1:].split(b"\0") if fds else []
+    if not msg or flags & (MSG_CTRUNC | MSG_TRUNC) or len(paths) != len(fds):
+        for fd in fds:
+            close_fd(fd)
+
+        if not msg:
+            raise ConnectionError("Socket closed by the peer.")
+
+        raise ValueError("Received trees were truncated.")
+
+    return [ClonedTree.from_fd(fd, fsdecode(path)) for fd, path in zip(fds, paths)]
+
+
+class MountNamespacePool:
+    def __init__(self) -> None:
+        """Hold prepared template mount namespaces and create copies of them.
+
+        A template is a mount namespace with the complete mount layout
+        of a sandbox. Each copy is created by a single unshare instead
+        of repeating all the mounts.
+
+        See :py:meth:`lxns.namespaces.MountNamespace.clone_from`
+        for the requirements.
+        """
+        self._templates: dict[str, MountNamespace] = {}
+
+    def add_template(self, name: str, template: MountNamespace) -> None:
+        """Add template under the given name.
+
+        Pool takes the ownership of the template and keeps it open
+        until it is removed or the pool is closed.
+
+        :raises KeyError: Template name already added.
+        """
+        if name in self._templates:
+            raise KeyError(f"Template {name!r} already added.")
+
+        self._templates[name] = template
+
+    def remove_template(self, name: str) -> None:
+        """Remove and close the template.
+
+        :raises KeyError: Template not found.
+        """
+        self._templates.pop(name).close()
+
+    def clone(self, name: str) -> MountNamespace:
+        """Create new mount namespace as a copy of the template.
+
+        :raises KeyError: Template not found.
+        :raises OSError: Errors returned by the syscalls.
+        """
+        (ns,) = _clone_mount_namespaces(self._templates[name], 1)
+        return ns
+
+    def clone_many(self, name: str, count: int) -> list[MountNamespace]:
+        """Create multiple copies of the template at once.
+
+        :raises KeyError: Template not found.
+        :raises OSError: Errors returned by the syscalls.
+        """
+        return _clone_mount_namespaces(self._templates[name], count)
+
+    def close(self) -> None:
+        """Close all templates."""
+        for template in self._templates.values():
+            template.close()
+
+        self._templates.clear()
+
+    def __enter__(self) -> MountNamespacePool:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+class MountInfo:
+    """Mount listed in the ``mountinfo`` file of a mount namespace."""
+
+    __slots__ = (
+        "mount_id",
+        "parent_id",
+        "device",
+        "root",
+        "mount_point",
+        "fs_type",
+        "source",
+    )
+
+    def __init__(
+        self,
+        mount_id: int,
+        parent_id: int,
+        device: str,
+        root: str,
+        mount_point: str,
+        fs_type: str,
+        source: str,
+    ):
+        self.mount_id = mount_id
+        self.parent_id = parent_id
+        self.device = device
+        self.root = root
+        self.mount_point = mount_point
+        self.fs_type = fs_type
+        self.source = source
+
+    @property
+    def identity(self) -> tuple[str, str, str]:
+        """Mount point, device and root of the mount.
+
+        Mount ids are different in every mount namespace but the copies
+        of the same mount have the same device and root.
+        """
+        return self.mount_point, self.device, self.root
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} {self.mount_point} "
+            f"id={self.mount_id} device={self.device} root={self.root}>"
+        )
+
+
+class MountsDiff:
+    """Difference between mount tables of two mount namespaces."""
+
+    def __init__(self, missing: list[MountInfo], extra: list[MountInfo]):
+        self.missing = missing
+        self.extra = extra
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.extra)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} missing={len(self.missing)} "
+            f"extra={len(self.extra)}>"
+        )
+
+
+def _unescape_mountinfo(field: bytes) -> str:
+    return fsdecode(
+        _MOUNTINFO_ESCAPE.sub(
+            lambda match: bytes((int(match[1], 8),)),
+            field,
+        )
+    )
+
+
+def _parse_mountinfo(data: bytes) -> list[MountInfo]:
+    mounts: list[MountInfo] = []
+    for line in data.splitlines():
+        fields = line.split(b" ")
+        # Optional fields are terminated by a single hyphen
+        separator = fields.index(b"-", 6)
+        mounts.append(
+            MountInfo(
+                mount_id=int(fields[0]),
+                parent_id=int(fields[1]),
+                device=fields[2].decode(),
+                root=_unescape_mountinfo(fields[3]),
+                mount_point=_unescape_mountinfo(fields[4]),
+                fs_type=_unescape_mountinfo(fields[separator + 1]),
+                source=_unescape_mountinfo(fields[separator + 2]),
+            )
+        )
+
+    return mounts
+
+
+def _read_current_mounts(proc_fd: int) -> list[MountInfo]:
+    fd = open_fd("thread-self/mountinfo", O_RDONLY | O_CLOEXEC, dir_fd=proc_fd)
+    try:
+        chunks: list[bytes] = []
+        while chunk := read_fd(fd, MOUNTINFO_READ_SIZE):
+            chunks.append(chunk)
+    finally:
+        close_fd(fd)
+
+    return _parse_mountinfo(b"".join(chunks))
+
+
+def _compare_mounts(
+    mounts_a: Sequence[MountInfo], mounts_b: Sequence[MountInfo]
+) -> MountsDiff:
+    identities_a = {mount.identity for mount in mounts_a}
+    identities_b = {mount.identity for mount in mounts_b}
+    return MountsDiff(
+        missing=[mount for mount in mounts_a if mount.identity not in identities_b],
+        extra=[mount for mount in mounts_b if mount.identity not in identities_a],
+    )
+
+
+def _is_under_paths(mount_point: str, paths: Sequence[str]) -> bool:
+    for path in paths:
+        if mount_point == path or mount_point.startswith(path.rstrip("/") + "/"):
+            return True
+
+    return False
+
+
+def diff_mounts(ns_a: MountNamespace, ns_b: MountNamespace) -> MountsDiff:
+    """Compare mount tables of two mount namespaces.
+
+    Mounts are compared by the mount point, device and the root
+    of the mount inside the file system.
+
+    Requires CAP_SYS_ADMIN in the user namespaces that own
+    the mount namespaces.
+
+    :return: Difference with the mounts of ``ns_a`` missing
+        in ``ns_b`` and the extra mounts of ``ns_b``.
+    :raises OSError: Failed to join the namespaces.
+    """
+
+    def read_both(proc_fd: int) -> MountsDiff:
+        ns_a.setns()
+        mounts_a = _read_current_mounts(proc_fd)
+        ns_b.setns()
+        return _compare_mounts(mounts_a, _read_current_mounts(proc_fd))
+
+    return _run_in_mount_thread(read_both)
+
+
+def sync_mounts(
+    source_ns: MountNamespace,
+    target_ns: MountNamespace,
+    paths: Iterable[str | Path] | None = None,
+) -> list[MountInfo]:
+    """Bind mount the mounts missing in the target from the source namespace.
+
+    Only the missing mounts are cloned and mounted at the same mount
+    points in the target namespace. Mount points have to exist in the
+    target. Extra mounts of the target are not removed.
+
+    Requires CAP_SYS_ADMIN in the user namespaces that own
+    the mount namespaces.
+
+    :param source_ns: Mount namespace to clone mounts from.
+    :param target_ns: Mount namespace to add mounts to.
+    :param paths: Only sync mounts at or below these paths.
+        ``None`` syncs all mounts.
+    :return: Mounts of the source that were added to the target.
+    :raises OSError: Failed to join the namespaces or mount.
+        Mounts made before the error are kept.
+    """
+    path_filter = None if paths is None else [str(path) for path in paths]
+
+    def sync(proc_fd: int) -> list[MountInfo]:
+        source_ns.setns()
+        source_mounts = _read_current_mounts(proc_fd)
+        target_ns.setns()
+        missing = _compare_mounts(source_mounts, _read_current_mounts(proc_fd)).missing
+
+        # Only the last mount at a mount point is visible and can be cloned
+        visible_mounts = {mount.mount_point: mount for mount in source_mounts}
+        missing = [
+            mount
+            for mount in missing
+            if visible_mounts[mount.mount_point] is mount
+            and (path_filter is None or _is_under_paths(mount.mount_point, path_filter))
+        ]
+        if not missing:
+            return missing
+
+        source_ns.setns()
+        trees: list[ClonedTree] = []
+        try:
+            for mount in missing:
+                trees.append(ClonedTree(mount.mount_point))
+
+            target_ns.setns()
+            for tree in trees:
+                tree.mount(tree._original_path)
+        finally:
+            for tree in trees:
+                tree.close()
+
+        return missing
 
-        move_mount(self._fd, to_path=str(path), flags=MOVE_MOUNT_F_EMPTY_PATH)
+    return _run_in_mount_thread(sync)
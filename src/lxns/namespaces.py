@@ -3,15 +3,25 @@
 """Namespaces classes."""
 from __future__ import annotations
 
-from os import O_CLOEXEC, O_RDONLY
+from array import array
+from errno import ENOTTY
+from fcntl import ioctl
+from os import O_CLOEXEC, O_DIRECTORY, O_RDONLY
 from os import close as close_fd
 from os import fstat
 from os import open as open_fd
-from os import stat
+from os import register_at_fork, stat
+from select import select
+from socket import MSG_CTRUNC, recv_fds, send_fds
+from threading import Thread, get_native_id, local
 from typing import TYPE_CHECKING
 from warnings import warn
 
+from . import debug, features
+from ._fd_holder import FileDescriptorHolder, fd_lock
 from .os import (
+    AT_EMPTY_PATH,
+    CLONE_FS,
     CLONE_NEWCGROUP,
     CLONE_NEWIPC,
     CLONE_NEWNET,
@@ -20,26 +30,63 @@ from .os import (
     CLONE_NEWTIME,
     CLONE_NEWUSER,
     CLONE_NEWUTS,
+    FD_NSFS_ROOT,
+    MOVE_MOUNT_F_EMPTY_PATH,
+    OPEN_TREE_CLOEXEC,
+    OPEN_TREE_CLONE,
+    PIDFD_GET_CGROUP_NAMESPACE,
+    PIDFD_GET_IPC_NAMESPACE,
+    PIDFD_GET_MNT_NAMESPACE,
+    PIDFD_GET_NET_NAMESPACE,
+    PIDFD_GET_PID_NAMESPACE,
+    PIDFD_GET_TIME_NAMESPACE,
+    PIDFD_GET_USER_NAMESPACE,
+    PIDFD_GET_UTS_NAMESPACE,
+    move_mount,
+    name_to_handle_at,
     ns_get_nstype,
     ns_get_userns,
+    open_by_handle_at,
+    open_tree,
     setns,
 )
 from .os import unshare as _unshare
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from pathlib import Path
+    from socket import socket
     from typing import Any, ClassVar, Literal, TypeVar
 
     Self = TypeVar("Self", bound="BaseNamespace")
+    _T = TypeVar("_T")
 
 
-class BaseNamespace:
+def _pidfd_to_pid(pidfd: int) -> int:
+    with open(f"/proc/self/fdinfo/{pidfd}") as f:
+        for line in f:
+            if line.startswith("Pid:"):
+                pid = int(line[4:])
+                if pid < 0:
+                    raise ProcessLookupError("Process already exited.")
+
+                return pid
+
+    raise ValueError(f"File descriptor {pidfd} is not a pidfd.")
+
+
+class BaseNamespace(FileDescriptorHolder):
     """Base namespace class for all namespaces.
 
     Should not be used directly.
     """
 
+    __slots__ = ("_closefd", "_ns_set")
+
     NAMESPACE_CONSTANT: ClassVar[int] = -1
     NAMESPACE_PROC_NAME: ClassVar[str] = "\0"
+    PIDFD_GET_NAMESPACE_IOCTL: ClassVar[int] = -1
+    HAS_NAMESPACE_FOR_CHILDREN: ClassVar[bool] = False
 
     def __init__(self, fd: int, closefd: bool = True):
         """Wrap existing file descriptor in a Namespace object.
@@ -51,16 +98,22 @@ class BaseNamespace:
         :param int fd: File descriptor that references the namespace.
         :param bool closefd: Close underlying file descriptor or not.
         """
-        self._fd: int | None = None
+        super().__init__()
         self._closefd = closefd
+        self._ns_set: NamespaceSet | None = None
         if ns_get_nstype(fd) != self.NAMESPACE_CONSTANT:
             raise ValueError(
                 f"File descriptor {fd!r} does not reference "
                 f"the {self.__class__.__name__} namespace."
             )
 
-        # Only reference the file descriptor after it passed the check
-        self._fd = fd
+        # Only reference the file descriptor after it passed the check.
+        # Objects not owning the file descriptor are never closed
+        # and are not tracked by the debug registry.
+        if closefd:
+            self._set_fd(fd)
+        else:
+            self._fd = fd
 
     def __del__(self) -> None:
         if self._fd is not None and self._closefd:
@@ -73,20 +126,45 @@ class BaseNamespace:
         :raises ValueError: Namespace was already closed.
         """
         fd = self._fd
-        if fd is not None:
+        ns_set = self._ns_set
+        if fd is not None and (ns_set is None or ns_set._fds is not None):
             return fd
         else:
             raise ValueError("Namespace file descriptor is already closed.")
 
+    def _borrow_fd(self, closed_message: str) -> int:
+        fd = super()._borrow_fd(closed_message)
+        ns_set = self._ns_set
+        if ns_set is not None:
+            # View of the namespace set also borrows from the set
+            # so that the set can not close the file descriptor.
+            try:
+                ns_set._borrow_fds(closed_message)
+            except BaseException:
+                super()._return_fd(fd)
+                raise
+
+        return fd
+
+    def _return_fd(self, fd: int) -> None:
+        ns_set = self._ns_set
+        if ns_set is not None:
+            ns_set._return_fds()
+
+        super()._return_fd(fd)
+
     def setns(self: Self) -> None:
         """Enter namespace.
 
         :raises OSError: Errors returned by the syscall.
         """
-        if self._fd is None:
-            raise ValueError("Trying switch to closed namespace.")
+        fd = self._borrow_fd("Trying switch to closed namespace.")
+        try:
+            setns(fd, self.NAMESPACE_CONSTANT)
+        finally:
+            self._return_fd(fd)
 
-        setns(self._fd, self.NAMESPACE_CONSTANT)
+        current_namespaces.invalidate(self.NAMESPACE_CONSTANT)
 
     def get_user_namespace(self: Self) -> UserNamespace:
         """Open user namespace that owns this namespace.
@@ -94,21 +172,26 @@ class BaseNamespace:
         :return: User namespace.
         :rtype: :py:class:`UserNamespace`
         """
-        if self._fd is None:
-            raise ValueError("Namespace closed. Cannot get user namespace.")
-
-        return UserNamespace(ns_get_userns(self._fd))
+        fd = self._borrow_fd("Namespace closed. Cannot get user namespace.")
+        try:
+            return UserNamespace(ns_get_userns(fd))
+        finally:
+            self._return_fd(fd)
 
     def close(self: Self) -> None:
         """Close namespace file descriptor.
 
         Can be called multiple times in which case only first call
         will close the namespace and subsequent calls will be ignored.
+
+        If another thread is using the namespace the file descriptor
+        is closed once that thread finishes.
         """
-        if self._fd is not None:
-            if self._closefd:
-                close_fd(self._fd)
-            self._fd = None
+        super().close()
+
+    def _release_fd(self, fd: int) -> None:
+        if self._closefd:
+            close_fd(fd)
 
     def __enter__(self: Self) -> Self:
         return self
@@ -117,38 +200,164 @@ class BaseNamespace:
         self.close()
 
     @classmethod
-    def from_pid(cls: type[Self], pid: int | Literal["self"]) -> Self:
-        """Open namespace from a process id."""
-        ns_fd = open_fd(
-            f"/proc/{pid}/ns/{cls.NAMESPACE_PROC_NAME}", O_RDONLY | O_CLOEXEC
-        )
-        return cls(ns_fd)
+    def _from_owned_fd(cls: type[Self], fd: int) -> Self:
+        # Close the just opened file descriptor if it does not
+        # reference the namespace of this type.
+        try:
+            return cls(fd)
+        except BaseException:
+            close_fd(fd)
+            raise
+
+    @classmethod
+    def from_pid(
+        cls: type[Self], pid: int | Literal["self"], for_children: bool = False
+    ) -> Self:
+        """Open namespace from a process id.
+
+        :param bool for_children: Open the namespace the children
+            of the process are placed in. Only pid and time namespaces
+            have a separate namespace for children.
+        :raises ValueError: Namespace has no separate namespace for children.
+        """
+        ns_name = cls.NAMESPACE_PROC_NAME
+        if for_children:
+            if not cls.HAS_NAMESPACE_FOR_CHILDREN:
+                raise ValueError(
+                    f"{cls.__name__} has no separate namespace for children."
+                )
+
+            ns_name += "_for_children"
+
+        ns_fd = open_fd(f"/proc/{pid}/ns/{ns_name}", O_RDONLY | O_CLOEXEC)
+        return cls._from_owned_fd(ns_fd)
+
+    @classmethod
+    def from_pidfd(cls: type[Self], pidfd: int) -> Self:
+        """Open namespace of the process referenced by the pidfd.
+
+        Uses the ``PIDFD_GET_*_NAMESPACE`` ioctl if the kernel supports it.
+        Otherwise the namespace is opened from ``/proc`` and the pidfd
+        is checked to make sure the pid was not reused by another process.
+
+        :raises ProcessLookupError: Process already exited.
+        """
+        if features.has_pidfd_get_namespace():
+            return cls._from_owned_fd(ioctl(pidfd, cls.PIDFD_GET_NAMESPACE_IOCTL))
+
+        ns = cls.from_pid(_pidfd_to_pid(pidfd))
+        # Pidfd becomes readable once the process exits
+        if select((pidfd,), (), (), 0)[0]:
+            ns.close()
+            raise ProcessLookupError("Process exited while opening namespace.")
+
+        return ns
 
     @classmethod
     def from_self(cls: type[Self]) -> Self:
         """Open caller current namespace."""
         return cls.from_pid("self")
 
+    @classmethod
+    def from_path(cls: type[Self], path: str | Path) -> Self:
+        """Open namespace from a namespace file path.
+
+        The path can be a namespace file bind mount created
+        by :py:meth:`persist` or a file in ``/proc/<pid>/ns/`` directory.
+
+        :raises ValueError: Path does not reference a namespace of this type.
+        """
+        return cls._from_owned_fd(open_fd(path, O_RDONLY | O_CLOEXEC))
+
+    def persist(self, path: str | Path) -> None:
+        """Bind mount the namespace file to the path.
+
+        Bind mount keeps the namespace alive after all its processes
+        exit and it can be opened again with :py:meth:`from_path`.
+        Namespace is released once the bind mount is unmounted.
+
+        Requires ``CAP_SYS_ADMIN`` in the user namespace owning
+        the current mount namespace. Mount namespace cannot be persisted
+        inside itself.
+
+        :param path: Path to mount namespace file on. Empty file
+            is created if path does not exist.
+        :raises OSError: Errors returned by the syscalls.
+        """
+        with open(path, mode="a"):
+            ...
+
+        fd = self._borrow_fd("Namespace closed. Cannot persist.")
+        try:
+            tree_fd = open_tree(
+                fd,
+                "",
+                flags=OPEN_TREE_CLONE | OPEN_TREE_CLOEXEC | AT_EMPTY_PATH,
+            )
+        finally:
+            self._return_fd(fd)
+
+        try:
+            move_mount(tree_fd, to_path=str(path), flags=MOVE_MOUNT_F_EMPTY_PATH)
+        finally:
+            close_fd(tree_fd)
+
+    def to_handle(self) -> bytes:
+        """Return file handle of the namespace.
+
+        File handle is a small stable identifier of the namespace
+        that can be stored and used to open the namespace again
+        with :py:meth:`from_handle` as long as the namespace exists.
+
+        Requires Linux 6.18 or newer.
+
+        :raises OSError: Errors returned by the syscall.
+        """
+        fd = self._borrow_fd("Namespace closed. Cannot get handle.")
+        try:
+            handle, _ = name_to_handle_at(fd, flags=AT_EMPTY_PATH)
+        finally:
+            self._return_fd(fd)
+
+        return handle
+
+    @classmethod
+    def from_handle(cls: type[Self], handle: bytes) -> Self:
+        """Open namespace from file handle returned by :py:meth:`to_handle`.
+
+        Requires Linux 6.18 or newer. Caller must be privileged over
+        the namespace or be a member of it.
+
+        :raises OSError: Namespace no longer exists or is not accessible.
+        :raises ValueError: Handle does not reference a namespace of this type.
+        """
+        return cls._from_owned_fd(
+            open_by_handle_at(FD_NSFS_ROOT, handle, O_RDONLY | O_CLOEXEC)
+        )
+
     @classmethod
     def get_current_ns_id(cls) -> int:
         """Return the current namespace of this type unique identifier.
 
         This is a class method that works without opening a namespace file.
+        The identifier is cached by :py:data:`current_namespaces`.
         """
-        return stat(f"/proc/self/ns/{cls.NAMESPACE_PROC_NAME}").st_ino
+        return current_namespaces.get_ns_id(cls)
 
     @classmethod
     def unshare(cls) -> None:
         """Create and switch to the new namespace of this type."""
         _unshare(cls.NAMESPACE_CONSTANT)
+        current_namespaces.invalidate(cls.NAMESPACE_CONSTANT)
 
     @property
     def ns_id(self) -> int:
         """Return the namespace unique identifier."""
-        if self._fd is None:
-            raise ValueError("Namespace already closed")
-
-        return fstat(self._fd).st_ino
+        fd = self._borrow_fd("Namespace already closed")
+        try:
+            return fstat(fd).st_ino
+        finally:
+            self._return_fd(fd)
 
     def __repr__(self) -> str:
         try:
@@ -184,50 +393,230 @@ class BaseNamespace:
 class CgroupNamespace(BaseNamespace):
     """Cgroups namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWCGROUP
     NAMESPACE_PROC_NAME = "cgroup"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_CGROUP_NAMESPACE
 
 
 class IpcNamespace(BaseNamespace):
     """IPC namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWIPC
     NAMESPACE_PROC_NAME = "ipc"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_IPC_NAMESPACE
 
 
 class NetworkNamespace(BaseNamespace):
     """Network namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWNET
     NAMESPACE_PROC_NAME = "net"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_NET_NAMESPACE
+
+    def get_nsid(self, relative_to: NetworkNamespace | None = None) -> int:
+        """Return id of this namespace as seen from another namespace.
+
+        Ids are assigned to the peer namespaces, for example, the namespace
+        of a veth peer link, and are reported as ``link-netnsid``.
+
+        :param relative_to: Network namespace that assigned the id.
+            ``None`` means the current network namespace of the caller.
+        :return: Namespace id or ``-1`` if not assigned.
+        """
+        return self.get_nsids((self,), relative_to)[0]
+
+    @staticmethod
+    def get_nsids(
+        namespaces: Sequence[NetworkNamespace],
+        relative_to: NetworkNamespace | None = None,
+    ) -> list[int]:
+        """Return ids of multiple namespaces as seen from another namespace.
+
+        Requests are sent together over a shared rtnetlink socket and
+        the results are cached by the namespace inode number.
+        See :py:func:`lxns.net.get_nsids`.
+
+        :return: Id of each namespace or ``-1`` if not assigned.
+        """
+        # Rtnetlink client is only loaded when needed
+        from .net import get_nsids
+
+        return get_nsids(namespaces, relative_to)
 
 
 class MountNamespace(BaseNamespace):
     """Mount namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWNS
     NAMESPACE_PROC_NAME = "mnt"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_MNT_NAMESPACE
+
+    @classmethod
+    def clone_from(cls, template: MountNamespace) -> MountNamespace:
+        """Create new mount namespace as a copy of the template.
+
+        The whole mount table of the template is copied by the kernel
+        in a single operation which is faster than replaying
+        the mounts one by one.
+
+        Requires CAP_SYS_ADMIN in the current user namespace and
+        in the user namespace that owns the template. Root and current
+        working directory of the caller are not changed.
+
+        :param template: Mount namespace to copy.
+        :raises OSError: Errors returned by the syscalls.
+        """
+        (ns,) = _clone_mount_namespaces(template, 1)
+        return ns
+
+
+def _run_in_thread(
+    setup: Callable[[], Any] | None,
+    function: Callable[[], _T],
+    name: str = "lxns",
+) -> _T:
+    # Namespaces changes made by the setup only apply to a short lived
+    # thread and do not affect the caller.
+    result: list[_T] = []
+    error: list[BaseException] = []
+
+    def run_in_thread() -> None:
+        try:
+            if setup is not None:
+                setup()
+
+            result.append(function())
+        except BaseException as e:
+            error.append(e)
+
+    thread = Thread(target=run_in_thread, name=name)
+    thread.start()
+    thread.join()
+
+    if error:
+        raise error[0]
+
+    return result[0]
+
+
+def _run_in_mount_thread(function: Callable[[int], _T]) -> _T:
+    # Joining mount namespace requires not sharing the filesystem attributes
+    # with other threads and resets root and working directory.
+    #
+    # Function receives the file descriptor of the caller /proc directory
+    # as the joined mount namespaces might not have /proc mounted.
+    proc_fd = open_fd("/proc", O_RDONLY | O_DIRECTORY | O_CLOEXEC)
+    try:
+        return _run_in_thread(
+            lambda: _unshare(CLONE_FS), lambda: function(proc_fd), "lxns-mount"
+        )
+    finally:
+        close_fd(proc_fd)
+
+
+def _clone_mount_namespaces(
+    template: MountNamespace, count: int
+) -> list[MountNamespace]:
+    def clone(proc_fd: int) -> list[MountNamespace]:
+        clones: list[MountNamespace] = []
+        try:
+            for _ in range(count):
+                template.setns()
+                _unshare(CLONE_NEWNS)
+                clones.append(
+                    MountNamespace(
+                        open_fd(
+                            "thread-self/ns/mnt",
+                            O_RDONLY | O_CLOEXEC,
+                            dir_fd=proc_fd,
+                        )
+                    )
+                )
+        except BaseException:
+            for ns in clones:
+                ns.close()
+
+            raise
+
+        return clones
+
+    return _run_in_mount_thread(clone)
 
 
 class PidNamespace(BaseNamespace):
     """PID namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWPID
     NAMESPACE_PROC_NAME = "pid"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_PID_NAMESPACE
+    HAS_NAMESPACE_FOR_CHILDREN = True
 
 
 class TimeNamespace(BaseNamespace):
     """Time namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWTIME
     NAMESPACE_PROC_NAME = "time"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_TIME_NAMESPACE
+    HAS_NAMESPACE_FOR_CHILDREN = True
+
+    @classmethod
+    def create(cls, monotonic: float = 0, boottime: float = 0) -> TimeNamespace:
+        """Create new time namespace with the clock offsets.
+
+        The namespace is created by a short lived thread and the caller
+        namespaces are not changed. Offsets are set before any process
+        enters the namespace.
+
+        The returned namespace can be joined with :py:meth:`setns` by
+        a single threaded process, for example, between fork and exec.
+
+        Requires ``CAP_SYS_ADMIN`` and ``CAP_SYS_TIME`` in the current
+        user namespace.
+
+        :param float monotonic: Offset of ``CLOCK_MONOTONIC`` in seconds.
+        :param float boottime: Offset of ``CLOCK_BOOTTIME`` in seconds.
+        :return: New time namespace.
+        """
+        offsets = ""
+        for clock_name, offset in (("monotonic", monotonic), ("boottime", boottime)):
+            if offset:
+                seconds, nanoseconds = divmod(round(offset * 1e9), 1_000_000_000)
+                offsets += f"{clock_name} {seconds} {nanoseconds}\n"
+
+        def create() -> TimeNamespace:
+            # New time namespace is only used by the children of the thread
+            # and the offsets file of the thread refers to it until then.
+            thread_id = get_native_id()
+            if offsets:
+                with open(f"/proc/{thread_id}/timens_offsets", mode="w") as f:
+                    f.write(offsets)
+
+            return cls.from_pid(thread_id, for_children=True)
+
+        return _run_in_thread(lambda: _unshare(CLONE_NEWTIME), create, "lxns-time")
 
 
 class UserNamespace(BaseNamespace):
     """User namespace."""
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWUSER
     NAMESPACE_PROC_NAME = "user"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_USER_NAMESPACE
 
 
 class UtsNamespace(BaseNamespace):
@@ -236,8 +625,11 @@ class UtsNamespace(BaseNamespace):
     Provides isolation of system identifiers: hostname and NIS domain name.
     """
 
+    __slots__ = ()
+
     NAMESPACE_CONSTANT = CLONE_NEWUTS
     NAMESPACE_PROC_NAME = "uts"
+    PIDFD_GET_NAMESPACE_IOCTL = PIDFD_GET_UTS_NAMESPACE
 
 
 def unshare_namespaces(
@@ -278,6 +670,59 @@ def unshare_namespaces(
         flags |= CLONE_NEWUTS
 
     _unshare(flags)
+    current_namespaces.invalidate(flags)
+
+
+class CurrentNamespaces(local):
+    """Cache of the current thread namespaces identifiers.
+
+    Namespaces are per thread so each thread has its own cache.
+    Use the :py:data:`current_namespaces` instance instead of creating
+    a new one.
+
+    The cache is updated by :py:meth:`BaseNamespace.setns`,
+    :py:meth:`BaseNamespace.unshare` and :py:func:`unshare_namespaces`.
+    If the namespaces were changed by other means, for example, by calling
+    the functions of :py:mod:`lxns.os` module directly, the cache should be
+    updated with :py:meth:`invalidate` or :py:meth:`refresh`.
+    """
+
+    def __init__(self) -> None:
+        self._ns_ids: dict[int, int] = {}
+
+    def get_ns_id(self, ns_class: type[BaseNamespace]) -> int:
+        """Return the current namespace of the given type unique identifier."""
+        try:
+            return self._ns_ids[ns_class.NAMESPACE_CONSTANT]
+        except KeyError:
+            ns_id = stat(f"/proc/thread-self/ns/{ns_class.NAMESPACE_PROC_NAME}").st_ino
+            self._ns_ids[ns_class.NAMESPACE_CONSTANT] = ns_id
+            return ns_id
+
+    def is_current(self, ns: BaseNamespace) -> bool:
+        """Check if the namespace is the current namespace of its type."""
+        return self.get_ns_id(type(ns)) == ns.ns_id
+
+    def invalidate(self, nstype_flags: int) -> None:
+        """Drop cached identifiers of namespaces types indicated by the flags.
+
+        :param int nstype_flags: ``CLONE_NEW*`` flags of changed namespaces.
+        """
+        for nstype in tuple(self._ns_ids):
+            if nstype & nstype_flags:
+                del self._ns_ids[nstype]
+
+    def refresh(self) -> None:
+        """Drop all cached identifiers."""
+        self._ns_ids.clear()
+
+
+current_namespaces = CurrentNamespaces()
+"""Current thread namespaces identifiers cache."""
+
+# Only the forking thread exists in the child and its cache
+# is dropped in case child was created with new namespaces.
+register_at_fork(after_in_child=current_namespaces.refresh)
 
 
 ALL_NAMESPACE_CLASSES = (
@@ -293,6 +738,301 @@ ALL_NAMESPACE_CLASSES = (
 )
 """All Namespace classes arranged in order suited for joining."""
 
+_NAMESPACE_CLASS_BY_TYPE: dict[int, type[BaseNamespace]] = {
+    ns_class.NAMESPACE_CONSTANT: ns_class for ns_class in ALL_NAMESPACE_CLASSES
+}
+_NAMESPACE_CLASS_INDEX: dict[type[BaseNamespace], int] = {
+    ns_class: index for index, ns_class in enumerate(_NAMESPACE_CLASS_BY_TYPE.values())
+}
+
+
+class NamespaceSet:
+    """Set of namespaces of different types.
+
+    File descriptors of all namespaces are stored in a single ``array``
+    which makes holding large number of namespaces cheap. Namespace objects
+    are only created when accessed and do not own the file descriptor.
+    Using them after the set was closed raises ``ValueError``.
+
+    At most one namespace of each type can be held.
+    """
+
+    __slots__ = ("_fds", "_borrows", "_closed_fds", "__weakref__")
+
+    def __init__(self, namespaces: Iterable[BaseNamespace] = ()):
+        """Create set from the namespace objects.
+
+        The set takes the ownership of the namespaces file descriptors
+        and the passed namespace objects are closed without closing
+        the file descriptors.
+
+        Views of another set do not own their file descriptors and
+        can not be passed.
+
+        :raises ValueError: Multiple namespaces of the same type passed
+            or a view of another set passed.
+        """
+        self._fds: array[int] | None = None
+        self._borrows = 0
+        self._closed_fds: array[int] | None = None
+        fds = array("i", (-1,) * len(_NAMESPACE_CLASS_INDEX))
+        namespaces = tuple(namespaces)
+        for ns in namespaces:
+            if ns._ns_set is not None:
+                # Both sets would close the same file descriptor
+                raise ValueError(f"Namespace {ns!r} is a view of another set.")
+
+            index = _NAMESPACE_CLASS_INDEX[type(ns)]
+            if fds[index] != -1:
+                raise ValueError(f"Multiple namespaces of type {type(ns).__name__}.")
+
+            fds[index] = ns.fileno()
+
+        for ns in namespaces:
+            ns._closefd = False
+            ns.close()
+
+        self._fds = fds
+        registry = debug._registry
+        if registry is not None:
+            registry.add(self)
+
+    @classmethod
+    def from_pid(
+        cls,
+        pid: int | Literal["self"],
+        namespace_classes: Iterable[type[BaseNamespace]] = ALL_NAMESPACE_CLASSES,
+    ) -> NamespaceSet:
+        """Open namespaces of the given types from a process id."""
+        ns_set = cls()
+        fds = ns_set._fds
+        assert fds is not None
+        try:
+            for ns_class in namespace_classes:
+                index = _NAMESPACE_CLASS_INDEX[ns_class]
+                if fds[index] == -1:
+                    fds[index] = open_fd(
+                        f"/proc/{pid}/ns/{ns_class.NAMESPACE_PROC_NAME}",
+                        O_RDONLY | O_CLOEXEC,
+                    )
+        except BaseException:
+            ns_set.close()
+            raise
+
+        return ns_set
+
+    def _get_fds(self) -> array[int]:
+        fds = self._fds
+        if fds is None:
+            raise ValueError("Namespace set is already closed.")
+
+        return fds
+
+    def fileno(self, ns_class: type[BaseNamespace]) -> int:
+        """Return file descriptor of the namespace of the given type.
+
+        :raises KeyError: Set does not have namespace of this type.
+        :raises ValueError: Set was already closed.
+        """
+        fd = self._get_fds()[_NAMESPACE_CLASS_INDEX[ns_class]]
+        if fd == -1:
+            raise KeyError(ns_class)
+
+        return fd
+
+    def get(self, ns_class: type[Self]) -> Self | None:
+        """Return view of the namespace of the given type or None."""
+        fd = self._get_fds()[_NAMESPACE_CLASS_INDEX[ns_class]]
+        if fd == -1:
+            return None
+
+        # File descriptor type was verified when it was added to the set
+        ns = ns_class.__new__(ns_class)
+        FileDescriptorHolder.__init__(ns)
+        ns._fd = fd
+        ns._closefd = False
+        ns._ns_set = self
+        return ns
+
+    def _borrow_fds(self, closed_message: str) -> None:
+        with fd_lock(self):
+            if self._fds is None:
+                raise ValueError(closed_message)
+
+            self._borrows += 1
+
+    def _return_fds(self) -> None:
+        with fd_lock(self):
+            self._borrows -= 1
+            fds = None
+            if not self._borrows:
+                fds = self._closed_fds
+                self._closed_fds = None
+
+        if fds is not None:
+            self._close_fds(fds)
+
+    @staticmethod
+    def _close_fds(fds: array[int]) -> None:
+        for fd in fds:
+            if fd != -1:
+                close_fd(fd)
+
+    def __getitem__(self, ns_class: type[Self]) -> Self:
+        ns = self.get(ns_class)
+        if ns is None:
+            raise KeyError(ns_class)
+
+        return ns
+
+    def __contains__(self, ns_class: type[BaseNamespace]) -> bool:
+        return self._get_fds()[_NAMESPACE_CLASS_INDEX[ns_class]] != -1
+
+    def __iter__(self) -> Iterator[BaseNamespace]:
+        """Iterate over namespace views in the order suited for joining."""
+        for ns_class in _NAMESPACE_CLASS_INDEX:
+            ns = self.get(ns_class)
+            if ns is not None:
+                yield ns
+
+    def __len__(self) -> int:
+        return sum(fd != -1 for fd in self._get_fds())
+
+    def setns(self) -> None:
+        """Enter all namespaces of the set.
+
+        User namespace is joined first and skipped if it is already
+        the current user namespace.
+
+        :raises OSError: Errors returned by the syscall.
+        """
+        for ns in self:
+            if isinstance(ns, UserNamespace) and current_namespaces.is_current(ns):
+                continue
+
+            ns.setns()
+
+    def close(self) -> None:
+        """Close all namespaces file descriptors.
+
+        Can be called multiple times in which case only first call
+        will close the namespaces and subsequent calls will be ignored.
+
+        If another thread is using a namespace view of the set
+        the file descriptors are closed once that thread finishes.
+        """
+        with fd_lock(self):
+            fds = self._fds
+            self._fds = None
+            close_now = not self._borrows
+            if fds is not None and not close_now:
+                # Last borrower will close the file descriptors
+                self._closed_fds = fds
+
+        if fds is not None:
+            registry = debug._registry
+            if registry is not None:
+                registry.remove(self)
+
+            if close_now:
+                self._close_fds(fds)
+
+    def __del__(self) -> None:
+        if self._fds is not None:
+            warn(f"unclosed namespace set {self}", ResourceWarning)
+            self.close()
+
+    def __enter__(self) -> NamespaceSet:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        if self._fds is None:
+            return f"<{self.__class__.__name__} closed>"
+
+        return f"<{self.__class__.__name__} {list(self)!r}>"
+
+
+def namespace_from_fd(fd: int) -> BaseNamespace:
+    """Wrap file descriptor in a namespace object of a matching type.
+
+    The type of the namespace is determined with the ``NS_GET_NSTYPE`` ioctl.
+
+    :param int fd: File descriptor that references a namespace.
+        The returned object takes the ownership of it. The caller keeps
+        the ownership if an exception is raised.
+    :raises ValueError: File descriptor does not reference a namespace
+        or the namespace type is unknown.
+    """
+    try:
+        ns_type = ns_get_nstype(fd)
+    except OSError as e:
+        if e.errno != ENOTTY:
+            raise
+
+        raise ValueError(f"File descriptor {fd!r} is not a namespace.") from None
+
+    try:
+        ns_class = _NAMESPACE_CLASS_BY_TYPE[ns_type]
+    except KeyError:
+        raise ValueError(f"Unknown namespace type {ns_type!r} of fd {fd!r}.") from None
+
+    return ns_class(fd)
+
+
+def send_namespaces(sock: socket, namespaces: Iterable[BaseNamespace]) -> None:
+    """Send namespaces over a Unix socket.
+
+    File descriptors are passed using ``SCM_RIGHTS`` ancillary data.
+    The sender keeps the ownership of the namespaces and can close them
+    after this function returns.
+
+    Use ``SOCK_SEQPACKET`` or ``SOCK_DGRAM`` sockets so that each call
+    corresponds to exactly one :py:func:`recv_namespaces` call.
+    """
+    fds = [ns.fileno() for ns in namespaces]
+    send_fds(sock, (b"\0",), fds)
+
+
+def recv_namespaces(
+    sock: socket, max_namespaces: int = len(_NAMESPACE_CLASS_BY_TYPE)
+) -> list[BaseNamespace]:
+    """Receive namespaces sent by :py:func:`send_namespaces`.
+
+    Returned namespaces have their type matching the received file descriptors.
+
+    :param int max_namespaces: Maximum number of namespaces in a message.
+    :raises ConnectionError: Socket was closed by the other side.
+    :raises ValueError: Received file descriptors were truncated or
+        do not reference namespaces.
+    """
+    msg, fds, flags, _ = recv_fds(sock, 1, max_namespaces)
+    if not msg or flags & MSG_CTRUNC:
+        for fd in fds:
+            close_fd(fd)
+
+        if not msg:
+            raise ConnectionError("Socket closed by the peer.")
+
+        raise ValueError("Received file descriptors were truncated.")
+
+    namespaces: list[BaseNamespace] = []
+    try:
+        for fd in fds:
+            namespaces.append(namespace_from_fd(fd))
+    except BaseException:
+        for ns in namespaces:
+            ns.close()
+
+        for fd in fds[len(namespaces) :]:
+            close_fd(fd)
+
+        raise
+
+    return namespaces
+
 
 __all__ = (
     "CgroupNamespace",
@@ -304,4 +1044,10 @@ __all__ = (
     "UserNamespace",
     "UtsNamespace",
     "unshare_namespaces",
+    "NamespaceSet",
+    "CurrentNamespaces",
+    "current_namespaces",
+    "namespace_from_fd",
+    "send_namespaces",
+    "recv_namespaces",
 )
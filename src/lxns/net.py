@@ -0,0 +1,524 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Minimal rtnetlink client to set up network namespaces.
+
+Only the operations needed to make a new network namespace usable are
+implemented: bringing links up, creating veth pairs, moving links between
+namespaces and adding addresses. Network namespace ids (nsids) can be
+looked up in bulk for correlating links and connections between namespaces.
+"""
+from __future__ import annotations
+
+from ipaddress import IPv4Interface, ip_interface
+from itertools import count
+from os import register_at_fork, stat, strerror
+from socket import (
+    AF_INET,
+    AF_INET6,
+    AF_NETLINK,
+    AF_UNSPEC,
+    NETLINK_ROUTE,
+    SOCK_CLOEXEC,
+    SOCK_RAW,
+    socket,
+)
+from struct import Struct
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from .namespaces import _run_in_thread
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from typing import Any
+
+    from .namespaces import NetworkNamespace
+
+
+NLMSG_ERROR = 2
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_NEWNSID = 88
+RTM_GETNSID = 90
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+SOL_NETLINK = 270
+NETLINK_CAP_ACK = 10
+
+IFLA_IFNAME = 3
+IFLA_LINKINFO = 18
+IFLA_NET_NS_FD = 28
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+VETH_INFO_PEER = 1
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+NETNSA_NSID = 1
+NETNSA_FD = 3
+
+NSID_NOT_ASSIGNED = -1
+
+IFF_UP = 0x1
+
+RECV_BUFFER_SIZE = 32 * 1024
+# Replies to a single send are queued on the socket at once.
+# Limit the number of requests so that they fit in the receive buffer.
+MAX_NSID_REQUESTS_PER_SEND = 128
+
+_NLMSGHDR = Struct("=IHHII")
+_IFINFOMSG = Struct("=BxHiII")
+_IFADDRMSG = Struct("=BBBBI")
+_RTGENMSG = Struct("=Bxxx")
+_RTATTR = Struct("=HH")
+_NLMSGERR = Struct("=i")
+_U32 = Struct("=I")
+_S32 = Struct("=i")
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def _attr(attr_type: int, payload: bytes) -> bytes:
+    attr_len = _RTATTR.size + len(payload)
+    return (
+        _RTATTR.pack(attr_len, attr_type) + payload + bytes(_align(attr_len) - attr_len)
+    )
+
+
+def _attr_str(attr_type: int, value: str) -> bytes:
+    return _attr(attr_type, value.encode() + b"\0")
+
+
+def _attr_u32(attr_type: int, value: int) -> bytes:
+    return _attr(attr_type, _U32.pack(value))
+
+
+def _link_message(link: str | int, *attrs: bytes, flags: int = 0) -> bytes:
+    if isinstance(link, int):
+        header = _IFINFOMSG.pack(0, 0, link, flags, flags)
+        return header + b"".join(attrs)
+
+    header = _IFINFOMSG.pack(0, 0, 0, flags, flags)
+    return header + _attr_str(IFLA_IFNAME, link) + b"".join(attrs)
+
+
+def _find_attr(payload: memoryview, attr_type: int) -> memoryview | None:
+    offset = 0
+    while offset + _RTATTR.size <= len(payload):
+        attr_len, found_type = _RTATTR.unpack_from(payload, offset)
+        if attr_len < _RTATTR.size:
+            break
+
+        if found_type == attr_type:
+            return payload[offset + _RTATTR.size : offset + attr_len]
+
+        offset += _align(attr_len)
+
+    return None
+
+
+def _create_socket() -> socket:
+    sock = socket(AF_NETLINK, SOCK_RAW | SOCK_CLOEXEC, NETLINK_ROUTE)
+    try:
+        # Do not echo the whole request in the acknowledgements
+        sock.setsockopt(SOL_NETLINK, NETLINK_CAP_ACK, 1)
+        sock.bind((0, 0))
+    except BaseException:
+        sock.close()
+        raise
+
+    return sock
+
+
+def _create_socket_in_namespace(namespace: NetworkNamespace) -> socket:
+    # Netlink socket is bound to the network namespace of its creator
+    return _run_in_thread(namespace.setns, _create_socket, "lxns-rtnetlink")
+
+
+class RtnetlinkSocket:
+    def __init__(self, namespace: NetworkNamespace | None = None):
+        """Open rtnetlink socket to configure network namespace.
+
+        Requests are sent immediately unless made inside the :py:meth:`batch`
+        block in which case they are sent together in a single message.
+
+        :param namespace: Network namespace to configure.
+            ``None`` means the current network namespace of the caller.
+        :raises OSError: Failed to join the namespace or open the socket.
+        """
+        if namespace is None:
+            self._socket = _create_socket()
+        else:
+            self._socket = _create_socket_in_namespace(namespace)
+
+        self._sequence = count(1)
+        self._recv_buffer = bytearray(RECV_BUFFER_SIZE)
+        self._pending: list[tuple[int, bytes]] = []
+        self._batch_depth = 0
+        self._nsid_cache: dict[int, int] = {}
+
+    def _send(self, message_type: int, flags: int, payload: bytes) -> None:
+        sequence = next(self._sequence)
+        header = _NLMSGHDR.pack(
+            _NLMSGHDR.size + len(payload),
+            message_type,
+            NLM_F_REQUEST | NLM_F_ACK | flags,
+            sequence,
+            0,
+        )
+        self._pending.append((sequence, header + payload))
+        if not self._batch_depth:
+            self.flush()
+
+    def _receive_messages(self) -> Iterator[tuple[int, int, memoryview]]:
+        received = self._socket.recv_into(self._recv_buffer)
+        view = memoryview(self._recv_buffer)[:received]
+        offset = 0
+        while offset + _NLMSGHDR.size <= received:
+            message_len, message_type, _, sequence, _ = _NLMSGHDR.unpack_from(
+                view, offset
+            )
+            if message_len < _NLMSGHDR.size:
+                break
+
+            yield (
+                message_type,
+                sequence,
+                view[offset + _NLMSGHDR.size : offset + message_len],
+            )
+            offset += _align(message_len)
+
+    def flush(self) -> None:
+        """Send pending requests and wait for their acknowledgements.
+
+        :raises OSError: Kernel rejected one of the requests. Other requests
+            are still applied.
+        """
+        pending = self._pending
+        if not pending:
+            return
+
+        self._pending = []
+        self._socket.send(b"".join(message for _, message in pending))
+
+        waiting = {sequence for sequence, _ in pending}
+        first_error = 0
+        while waiting:
+            for message_type, sequence, payload in self._receive_messages():
+                if message_type != NLMSG_ERROR or sequence not in waiting:
+                    continue
+
+                waiting.discard(sequence)
+                (error,) = _NLMSGERR.unpack_from(payload)
+                if error and not first_error:
+                    first_error = -error
+
+        if first_error:
+            raise OSError(first_error, strerror(first_error))
+
+    def batch(self) -> _Batch:
+        """Return context manager that sends requests made within it together.
+
+        Requests are sent on exiting the block. Looking up the link index
+        sends the pending requests first.
+        """
+        return _Batch(self)
+
+    def get_link_index(self, ifname: str) -> int:
+        """Return index of the link in the socket network namespace.
+
+        :raises OSError: Link not found.
+        """
+        self.flush()
+
+        sequence = next(self._sequence)
+        payload = _link_message(ifname)
+        self._socket.send(
+            _NLMSGHDR.pack(
+                _NLMSGHDR.size + len(payload),
+                RTM_GETLINK,
+                NLM_F_REQUEST,
+                sequence,
+                0,
+            )
+            + payload
+        )
+
+        while True:
+            for message_type, reply_sequence, reply in self._receive_messages():
+                if reply_sequence != sequence:
+                    continue
+
+                if message_type == NLMSG_ERROR:
+                    (error,) = _NLMSGERR.unpack_from(reply)
+                    raise OSError(-error, strerror(-error))
+
+                if message_type == RTM_NEWLINK:
+                    _, _, index, _, _ = _IFINFOMSG.unpack_from(reply)
+                    return int(index)
+
+    def get_nsids(self, namespaces: Sequence[NetworkNamespace]) -> list[int]:
+        """Return ids of the network namespaces in the socket namespace.
+
+        Ids are looked up with ``RTM_GETNSID`` requests sent together
+        and cached by the namespace inode number. Namespaces without
+        assigned id are not cached.
+
+        :param namespaces: Network namespaces to look up.
+        :return: Id of each namespace or :py:data:`NSID_NOT_ASSIGNED`.
+        :raises OSError: Kernel rejected one of the requests.
+        """
+        self.flush()
+
+        results: list[int] = []
+        # Sequence number of the request to the index in the results
+        requests: dict[int, int] = {}
+        messages: list[bytes] = []
+        for index, namespace in enumerate(namespaces):
+            ns_id = namespace.ns_id
+            nsid = self._nsid_cache.get(ns_id)
+            results.append(NSID_NOT_ASSIGNED if nsid is None else nsid)
+            if nsid is not None:
+                continue
+
+            sequence = next(self._sequence)
+            payload = _RTGENMSG.pack(AF_UNSPEC) + _attr_u32(
+                NETNSA_FD, namespace.fileno()
+            )
+            messages.append(
+                _NLMSGHDR.pack(
+                    _NLMSGHDR.size + len(payload),
+                    RTM_GETNSID,
+                    NLM_F_REQUEST,
+                    sequence,
+                    0,
+                )
+                + payload
+            )
+            requests[sequence] = index
+
+        first_error = 0
+        for start in range(0, len(messages), MAX_NSID_REQUESTS_PER_SEND):
+            self._socket.send(
+                b"".join(messages[start : start + MAX_NSID_REQUESTS_PER_SEND])
+            )
+            waiting = min(MAX_NSID_REQUESTS_PER_SEND, len(messages) - start)
+            while waiting:
+                for message_type, sequence, reply in self._receive_messages():
+                    index = requests.pop(sequence, -1)
+                    if index < 0:
+                        continue
+
+                    waiting -= 1
+                    if message_type == NLMSG_ERROR:
+                        (error,) = _NLMSGERR.unpack_from(reply)
+                        if error and not first_error:
+                            first_error = -error
+
+                        continue
+
+                    nsid_attr = _find_attr(reply[_RTGENMSG.size :], NETNSA_NSID)
+                    if nsid_attr is None:
+                        continue
+
+                    (nsid,) = _S32.unpack_from(nsid_attr)
+                    results[index] = nsid
+                    if nsid != NSID_NOT_ASSIGNED:
+                        self._nsid_cache[namespaces[index].ns_id] = nsid
+
+        if first_error:
+            raise OSError(first_error, strerror(first_error))
+
+        return results
+
+    def clear_nsid_cache(self) -> None:
+        """Drop cached namespace ids.
+
+        Inode numbers of destroyed namespaces are reused by the new
+        namespaces. Clear the cache once the namespaces are destroyed.
+        """
+        self._nsid_cache.clear()
+
+    def set_link_up(self, link: str | int) -> None:
+        """Bring link up.
+
+        :param link: Link name or index. Loopback is named ``lo``.
+        """
+        self._send(RTM_NEWLINK, 0, _link_message(link, flags=IFF_UP))
+
+    def create_veth(
+        self,
+        ifname: str,
+        peer_ifname: str,
+        peer_namespace: NetworkNamespace | None = None,
+    ) -> None:
+        """Create a pair of connected virtual ethernet links.
+
+        :param str ifname: Name of the link in the socket namespace.
+        :param str peer_ifname: Name of the peer link.
+        :param peer_namespace: Network namespace to create the peer link in.
+            ``None`` creates the peer in the socket namespace.
+        """
+        peer_attrs = _attr_str(IFLA_IFNAME, peer_ifname)
+        if peer_namespace is not None:
+            peer_attrs += _attr_u32(IFLA_NET_NS_FD, peer_namespace.fileno())
+
+        link_info = _attr_str(IFLA_INFO_KIND, "veth") + _attr(
+            IFLA_INFO_DATA,
+            _attr(VETH_INFO_PEER, _IFINFOMSG.pack(0, 0, 0, 0, 0) + peer_attrs),
+        )
+        self._send(
+            RTM_NEWLINK,
+            NLM_F_CREATE | NLM_F_EXCL,
+            _link_message(ifname, _attr(IFLA_LINKINFO, link_info)),
+        )
+
+    def move_link(self, link: str | int, namespace: NetworkNamespace) -> None:
+        """Move link to another network namespace.
+
+        :param link: Link name or index.
+        :param namespace: Target network namespace.
+        """
+        self._send(
+            RTM_NEWLINK,
+            0,
+            _link_message(link, _attr_u32(IFLA_NET_NS_FD, namespace.fileno())),
+        )
+
+    def add_address(self, link: str | int, address: str) -> None:
+        """Add IP address to the link.
+
+        :param link: Link name or index. If name is passed the pending
+            requests are sent to look up the link index.
+        :param str address: IPv4 or IPv6 address with optional prefix
+            length. For example, ``10.0.0.1/24``.
+        :raises ValueError: Invalid address.
+        """
+        if isinstance(link, str):
+            link = self.get_link_index(link)
+
+        interface = ip_interface(address)
+        family = AF_INET if isinstance(interface, IPv4Interface) else AF_INET6
+        packed_address = interface.ip.packed
+        self._send(
+            RTM_NEWADDR,
+            NLM_F_CREATE | NLM_F_EXCL,
+            _IFADDRMSG.pack(family, interface.network.prefixlen, 0, 0, link)
+            + _attr(IFA_LOCAL, packed_address)
+            + _attr(IFA_ADDRESS, packed_address),
+        )
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> RtnetlinkSocket:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+class _Batch:
+    def __init__(self, rtnl: RtnetlinkSocket):
+        self._rtnl = rtnl
+
+    def __enter__(self) -> RtnetlinkSocket:
+        self._rtnl._batch_depth += 1
+        return self._rtnl
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        self._rtnl._batch_depth -= 1
+        if self._rtnl._batch_depth:
+            return
+
+        if exc_type is None:
+            self._rtnl.flush()
+        else:
+            self._rtnl._pending.clear()
+
+
+def setup_loopback(namespace: NetworkNamespace | None = None) -> None:
+    """Bring loopback link of the network namespace up.
+
+    :param namespace: Network namespace. ``None`` means the current
+        network namespace.
+    """
+    with RtnetlinkSocket(namespace) as rtnl:
+        rtnl.set_link_up("lo")
+
+
+# Sockets shared by the get_nsids calls keyed by the inode number
+# of the network namespace they were opened in.
+_shared_sockets: dict[int, RtnetlinkSocket] = {}
+_shared_sockets_lock = Lock()
+
+
+def get_nsids(
+    namespaces: Sequence[NetworkNamespace],
+    relative_to: NetworkNamespace | None = None,
+) -> list[int]:
+    """Return ids of the network namespaces as seen from another namespace.
+
+    A single rtnetlink socket is kept open for each relative namespace
+    and shared by all calls. Results are cached. See
+    :py:meth:`RtnetlinkSocket.get_nsids`.
+
+    :param namespaces: Network namespaces to look up.
+    :param relative_to: Network namespace that assigned the ids.
+        ``None`` means the current network namespace of the caller.
+    :return: Id of each namespace or :py:data:`NSID_NOT_ASSIGNED`.
+    """
+    if relative_to is None:
+        relative_ns_id = stat("/proc/thread-self/ns/net").st_ino
+    else:
+        relative_ns_id = relative_to.ns_id
+
+    with _shared_sockets_lock:
+        rtnl = _shared_sockets.get(relative_ns_id)
+        if rtnl is None:
+            rtnl = RtnetlinkSocket(relative_to)
+            _shared_sockets[relative_ns_id] = rtnl
+
+        return rtnl.get_nsids(namespaces)
+
+
+def close_shared_sockets() -> None:
+    """Close sockets shared by :py:func:`get_nsids` and drop their caches.
+
+    Shared socket keeps its network namespace alive.
+    """
+    with _shared_sockets_lock:
+        for rtnl in _shared_sockets.values():
+            rtnl.close()
+
+        _shared_sockets.clear()
+
+
+def _reset_shared_sockets_after_fork() -> None:
+    global _shared_sockets_lock
+    # Lock could have been held by another thread during fork
+    _shared_sockets_lock = Lock()
+    for rtnl in _shared_sockets.values():
+        rtnl.close()
+
+    _shared_sockets.clear()
+
+
+register_at_fork(after_in_child=_reset_shared_sockets_after_fork)
+
+
+__all__ = (
+    "RtnetlinkSocket",
+    "setup_loopback",
+    "get_nsids",
+    "close_shared_sockets",
+    "NSID_NOT_ASSIGNED",
+)
@@ -3,11 +3,19 @@
 
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <errno.h>
 #include <fcntl.h>
+#include <limits.h>
 #include <linux/mount.h>
 #include <linux/nsfs.h>
 #include <sched.h>
+#include <string.h>
 #include <sys/ioctl.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
 
 #ifdef PYTHON_LXNS_FOUND_OPEN_TREE
 #include <sys/mount.h>
@@ -29,6 +37,47 @@ static inline int move_mount(int from_dirfd, const char* from_pathname, int to_d
 }
 #endif
 
+// Special mount_fd value of open_by_handle_at to decode namespaces handles
+#ifndef FD_NSFS_ROOT
+#define FD_NSFS_ROOT -10003
+#endif
+
+// Pidfd ioctls to open namespaces of the process (Linux 6.11)
+#ifndef PIDFD_GET_CGROUP_NAMESPACE
+#define PIDFS_IOCTL_MAGIC 0xFF
+#define PIDFD_GET_CGROUP_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 1)
+#define PIDFD_GET_IPC_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 2)
+#define PIDFD_GET_MNT_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 3)
+#define PIDFD_GET_NET_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 4)
+#define PIDFD_GET_PID_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 5)
+#define PIDFD_GET_PID_FOR_CHILDREN_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 6)
+#define PIDFD_GET_TIME_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 7)
+#define PIDFD_GET_TIME_FOR_CHILDREN_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 8)
+#define PIDFD_GET_USER_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 9)
+#define PIDFD_GET_UTS_NAMESPACE _IO(PIDFS_IOCTL_MAGIC, 10)
+#endif
+
+// Syscalls numbers of the unified table used by all architectures
+// except alpha. Used if the build headers are older than the kernel.
+#ifndef __alpha__
+#ifndef SYS_clone3
+#define SYS_clone3 435
+#endif
+#ifndef SYS_mount_setattr
+#define SYS_mount_setattr 442
+#endif
+#ifndef SYS_statmount
+#define SYS_statmount 457
+#endif
+#ifndef SYS_listmount
+#define SYS_listmount 458
+#endif
+#endif
+
+#ifndef CLONE_PIDFD
+#define CLONE_PIDFD 0x00001000
+#endif
+
 #define CALL_PYTHON_FAIL_ACTION(py_function, action) \
         ({                                           \
                 PyObject* new_object = py_function;  \
@@ -40,15 +89,20 @@ static inline int move_mount(int from_dirfd, const char* from_pathname, int to_d
 
 #define CALL_PYTHON_AND_CHECK(py_function) CALL_PYTHON_FAIL_ACTION(py_function, return NULL)
 
-#define CALL_PYTHON_INT_CHECK(py_function)    \
-        ({                                    \
-                int return_int = py_function; \
-                if (return_int < 0) {         \
-                        return NULL;          \
-                }                             \
-                return_int;                   \
+#define CALL_PYTHON_INT_FAIL_ACTION(py_function, action) \
+        ({                                               \
+                int return_int = py_function;            \
+                if (return_int < 0) {                    \
+                        action;                          \
+                }                                        \
+                return_int;                              \
         })
 
+#define CALL_PYTHON_INT_CHECK(py_function) CALL_PYTHON_INT_FAIL_ACTION(py_function, return NULL)
+
+// Module exec slot function returns -1 on error
+#define CALL_PYTHON_EXEC_CHECK(py_function) CALL_PYTHON_INT_FAIL_ACTION(py_function, return -1)
+
 #define CALL_PYTHON_BOOL_CHECK(py_function)   \
         ({                                    \
                 int return_int = py_function; \
@@ -64,157 +118,901 @@ __attribute__((used)) static inline void PyObject_cleanup(PyObject** object) {
 
 #define CLEANUP_PY_OBJECT __attribute__((cleanup(PyObject_cleanup)))
 
-static PyObject* LxnsOs_unshare(PyObject* Py_UNUSED(self), PyObject* args) {
+__attribute__((used)) static inline void PyMem_cleanup(void* pointer) {
+        PyMem_Free(*(void**)pointer);
+}
+
+#define CLEANUP_PY_MEM __attribute__((cleanup(PyMem_cleanup)))
+
+// METH_FASTCALL is part of the limited API since Python 3.10
+#if !defined(Py_LIMITED_API) || Py_LIMITED_API + 0 >= 0x030A0000
+#define PYTHON_LXNS_HAVE_FASTCALL
+#endif
+
+// Buffer protocol is part of the limited API since Python 3.11
+#if !defined(Py_LIMITED_API) || Py_LIMITED_API + 0 >= 0x030B0000
+#define PYTHON_LXNS_HAVE_BUFFER
+
+__attribute__((used)) static inline void PyBuffer_cleanup(Py_buffer* view) {
+        if (view->obj != NULL) {
+                PyBuffer_Release(view);
+        }
+}
+
+#define CLEANUP_PY_BUFFER __attribute__((cleanup(PyBuffer_cleanup)))
+#endif
+
+// PySys_Audit is part of the limited API since Python 3.13
+#if !defined(Py_LIMITED_API) || Py_LIMITED_API + 0 >= 0x030D0000
+#define CALL_PYTHON_AUDIT(event, format, ...) CALL_PYTHON_INT_CHECK(PySys_Audit(event, format, __VA_ARGS__))
+#else
+// Call sys.audit for the older limited API versions. Unlike PySys_Audit
+// which returns early if no audit hooks are installed this looks up and
+// calls a Python function on every call of the audited syscalls.
+#define CALL_PYTHON_AUDIT(event, format, ...) Py_DECREF(CALL_PYTHON_AND_CHECK(PyObject_CallFunction(PySys_GetObject("audit"), "s" format, event, __VA_ARGS__)))
+#endif
+
+// Syscall statistics are process wide and shared between interpreters
+// as the namespaces are process (or thread) properties as well.
+// All counters are updated with atomic operations and the GIL released.
+enum LxnsOsSyscall {
+        LXNS_OS_SYSCALL_UNSHARE,
+        LXNS_OS_SYSCALL_SETNS,
+        LXNS_OS_SYSCALL_NS_GET_USERNS,
+        LXNS_OS_SYSCALL_NS_GET_PARENT,
+        LXNS_OS_SYSCALL_NS_GET_NSTYPE,
+        LXNS_OS_SYSCALL_NS_GET_OWNER_UID,
+        LXNS_OS_SYSCALL_OPEN_TREE,
+        LXNS_OS_SYSCALL_MOVE_MOUNT,
+        LXNS_OS_SYSCALL_NAME_TO_HANDLE_AT,
+        LXNS_OS_SYSCALL_OPEN_BY_HANDLE_AT,
+        LXNS_OS_SYSCALL_MAX,
+};
+
+static const char* lxns_os_syscall_names[LXNS_OS_SYSCALL_MAX] = {
+    "unshare",          "setns",     "ns_get_userns", "ns_get_parent",     "ns_get_nstype",
+    "ns_get_owner_uid", "open_tree", "move_mount",    "name_to_handle_at", "open_by_handle_at",
+};
+
+// Errno values above the limit are accounted in the last slot
+#define LXNS_OS_STATS_ERRNO_MAX 256
+// Bucket N counts calls that took less than 2^N nanoseconds
+#define LXNS_OS_STATS_LATENCY_BUCKETS 40
+
+struct LxnsOsSyscallStats {
+        unsigned long long calls;
+        unsigned long long errors;
+        unsigned long long total_latency_ns;
+        unsigned long long errno_counts[LXNS_OS_STATS_ERRNO_MAX];
+        unsigned long long latency_buckets[LXNS_OS_STATS_LATENCY_BUCKETS];
+};
+
+static int lxns_os_stats_enabled = 0;
+static struct LxnsOsSyscallStats lxns_os_stats[LXNS_OS_SYSCALL_MAX];
+
+static inline int LxnsOs_stats_start(struct timespec* start) {
+        if (!__atomic_load_n(&lxns_os_stats_enabled, __ATOMIC_RELAXED)) {
+                return 0;
+        }
+        clock_gettime(CLOCK_MONOTONIC, start);
+        return 1;
+}
+
+static void LxnsOs_stats_record(enum LxnsOsSyscall syscall_id, const struct timespec* start, int failed) {
+        int saved_errno = errno;
+        struct timespec end;
+        clock_gettime(CLOCK_MONOTONIC, &end);
+
+        unsigned long long latency_ns = (end.tv_sec - start->tv_sec) * 1000000000ULL + end.tv_nsec - start->tv_nsec;
+        int bucket = latency_ns ? 64 - __builtin_clzll(latency_ns) : 0;
+        if (bucket >= LXNS_OS_STATS_LATENCY_BUCKETS) {
+                bucket = LXNS_OS_STATS_LATENCY_BUCKETS - 1;
+        }
+
+        struct LxnsOsSyscallStats* stats = &lxns_os_stats[syscall_id];
+        __atomic_fetch_add(&stats->calls, 1, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&stats->total_latency_ns, latency_ns, __ATOMIC_RELAXED);
+        __atomic_fetch_add(&stats->latency_buckets[bucket], 1, __ATOMIC_RELAXED);
+        if (failed) {
+                int errno_index = saved_errno < LXNS_OS_STATS_ERRNO_MAX ? saved_errno : LXNS_OS_STATS_ERRNO_MAX - 1;
+                __atomic_fetch_add(&stats->errors, 1, __ATOMIC_RELAXED);
+                __atomic_fetch_add(&stats->errno_counts[errno_index], 1, __ATOMIC_RELAXED);
+        }
+        errno = saved_errno;
+}
+
+// Call the syscall and record its statistics if enabled.
+// Statement result is set to the syscall return value. -1 means failure.
+#define LXNS_OS_SYSCALL(syscall_id, result, syscall_expression)                      \
+        do {                                                                         \
+                struct timespec stats_start;                                         \
+                int stats_started = LxnsOs_stats_start(&stats_start);                \
+                result = syscall_expression;                                         \
+                if (stats_started) {                                                 \
+                        LxnsOs_stats_record(syscall_id, &stats_start, result == -1); \
+                }                                                                    \
+        } while (0)
+
+static PyObject* LxnsOs_enable_stats(PyObject* Py_UNUSED(self), PyObject* enabled_object) {
+        int enabled = CALL_PYTHON_INT_CHECK(PyObject_IsTrue(enabled_object));
+        __atomic_store_n(&lxns_os_stats_enabled, enabled, __ATOMIC_RELAXED);
+        Py_RETURN_NONE;
+}
+
+static PyObject* LxnsOs_reset_stats(PyObject* Py_UNUSED(self), PyObject* Py_UNUSED(args)) {
+        for (int i = 0; i < LXNS_OS_SYSCALL_MAX; i++) {
+                unsigned long long* counters = (unsigned long long*)&lxns_os_stats[i];
+                for (size_t j = 0; j < sizeof(struct LxnsOsSyscallStats) / sizeof(unsigned long long); j++) {
+                        __atomic_store_n(&counters[j], 0, __ATOMIC_RELAXED);
+                }
+        }
+        Py_RETURN_NONE;
+}
+
+static int LxnsOs_set_counter(PyObject* dict, PyObject* key, unsigned long long* counter) {
+        PyObject* value CLEANUP_PY_OBJECT = CALL_PYTHON_FAIL_ACTION(PyLong_FromUnsignedLongLong(__atomic_load_n(counter, __ATOMIC_RELAXED)), return -1);
+        return PyDict_SetItem(dict, key, value);
+}
+
+static int LxnsOs_set_counter_str(PyObject* dict, const char* key, unsigned long long* counter) {
+        PyObject* key_object CLEANUP_PY_OBJECT = CALL_PYTHON_FAIL_ACTION(PyUnicode_FromString(key), return -1);
+        return LxnsOs_set_counter(dict, key_object, counter);
+}
+
+static PyObject* LxnsOs_syscall_stats(struct LxnsOsSyscallStats* stats) {
+        PyObject* stats_dict CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyDict_New());
+        PyObject* errno_dict CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyDict_New());
+        PyObject* latency_dict CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyDict_New());
+
+        CALL_PYTHON_INT_CHECK(LxnsOs_set_counter_str(stats_dict, "calls", &stats->calls));
+        CALL_PYTHON_INT_CHECK(LxnsOs_set_counter_str(stats_dict, "errors", &stats->errors));
+        CALL_PYTHON_INT_CHECK(LxnsOs_set_counter_str(stats_dict, "total_latency_ns", &stats->total_latency_ns));
+
+        for (int i = 0; i < LXNS_OS_STATS_ERRNO_MAX; i++) {
+                if (__atomic_load_n(&stats->errno_counts[i], __ATOMIC_RELAXED)) {
+                        PyObject* errno_key CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyLong_FromLong(i));
+                        CALL_PYTHON_INT_CHECK(LxnsOs_set_counter(errno_dict, errno_key, &stats->errno_counts[i]));
+                }
+        }
+
+        for (int i = 0; i < LXNS_OS_STATS_LATENCY_BUCKETS; i++) {
+                if (__atomic_load_n(&stats->latency_buckets[i], __ATOMIC_RELAXED)) {
+                        PyObject* bucket_key CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyLong_FromUnsignedLongLong(1ULL << i));
+                        CALL_PYTHON_INT_CHECK(LxnsOs_set_counter(latency_dict, bucket_key, &stats->latency_buckets[i]));
+                }
+        }
+
+        CALL_PYTHON_INT_CHECK(PyDict_SetItemString(stats_dict, "errnos", errno_dict));
+        CALL_PYTHON_INT_CHECK(PyDict_SetItemString(stats_dict, "latency_ns_histogram", latency_dict));
+
+        Py_INCREF(stats_dict);
+        return stats_dict;
+}
+
+static PyObject* LxnsOs_stats(PyObject* Py_UNUSED(self), PyObject* Py_UNUSED(args)) {
+        PyObject* all_stats CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyDict_New());
+
+        for (int i = 0; i < LXNS_OS_SYSCALL_MAX; i++) {
+                PyObject* syscall_stats CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(LxnsOs_syscall_stats(&lxns_os_stats[i]));
+                CALL_PYTHON_INT_CHECK(PyDict_SetItemString(all_stats, lxns_os_syscall_names[i], syscall_stats));
+        }
+
+        Py_INCREF(all_stats);
+        return all_stats;
+}
+
+static int LxnsOs_parse_int(PyObject* int_object, int* result) {
+        long value = PyLong_AsLong(int_object);
+        if (value == -1 && PyErr_Occurred()) {
+                return -1;
+        }
+        if (value < INT_MIN || value > INT_MAX) {
+                PyErr_SetString(PyExc_OverflowError, "Python int too large to convert to C int");
+                return -1;
+        }
+        *result = (int)value;
+        return 0;
+}
+
+static int LxnsOs_set_keyword_arg(const char* function_name, const char* const* names, PyObject** slots, PyObject* key, PyObject* value) {
+        for (Py_ssize_t i = 0; names[i] != NULL; i++) {
+                if (PyUnicode_CompareWithASCIIString(key, names[i]) != 0) {
+                        continue;
+                }
+                if (slots[i] != NULL) {
+                        PyErr_Format(PyExc_TypeError, "%s() got multiple values for argument '%s'", function_name, names[i]);
+                        return -1;
+                }
+                slots[i] = value;
+                return 0;
+        }
+        PyErr_Format(PyExc_TypeError, "%s() got an unexpected keyword argument '%U'", function_name, key);
+        return -1;
+}
+
+static int LxnsOs_check_args(const char* function_name, const char* const* names, Py_ssize_t required, PyObject** slots, Py_ssize_t nargs) {
+        Py_ssize_t max_args = 0;
+        while (names[max_args] != NULL) {
+                max_args++;
+        }
+        if (nargs > max_args) {
+                PyErr_Format(PyExc_TypeError, "%s() takes at most %zd arguments (%zd given)", function_name, max_args, nargs);
+                return -1;
+        }
+        for (Py_ssize_t i = 0; i < required; i++) {
+                if (slots[i] == NULL) {
+                        PyErr_Format(PyExc_TypeError, "%s() missing required argument '%s'", function_name, names[i]);
+                        return -1;
+                }
+        }
+        return 0;
+}
+
+// Collect positional and keyword arguments into the slots in the order
+// of the parameters names. Slots of the missing optional arguments are
+// left NULL. Avoids creating the arguments tuple and keywords dict
+// with the fast call convention.
+#ifdef PYTHON_LXNS_HAVE_FASTCALL
+#define LXNS_OS_KEYWORDS_PARAMS PyObject *const *args, Py_ssize_t nargs, PyObject *kwnames
+#define LXNS_OS_KEYWORDS_FLAGS (METH_FASTCALL | METH_KEYWORDS)
+#define LXNS_OS_COLLECT_ARGS(function_name, names, required, slots) \
+        CALL_PYTHON_INT_CHECK(LxnsOs_collect_args(function_name, names, required, slots, args, nargs, kwnames))
+
+static int LxnsOs_collect_args(const char* function_name,
+                               const char* const* names,
+                               Py_ssize_t required,
+                               PyObject** slots,
+                               PyObject* const* args,
+                               Py_ssize_t nargs,
+                               PyObject* kwnames) {
+        for (Py_ssize_t i = 0; i < nargs && names[i] != NULL; i++) {
+                slots[i] = args[i];
+        }
+        Py_ssize_t nkwargs = kwnames == NULL ? 0 : PyTuple_Size(kwnames);
+        for (Py_ssize_t i = 0; i < nkwargs; i++) {
+                CALL_PYTHON_EXEC_CHECK(LxnsOs_set_keyword_arg(function_name, names, slots, PyTuple_GetItem(kwnames, i), args[nargs + i]));
+        }
+        return LxnsOs_check_args(function_name, names, required, slots, nargs);
+}
+#else
+#define LXNS_OS_KEYWORDS_PARAMS PyObject *args, PyObject *kwargs
+#define LXNS_OS_KEYWORDS_FLAGS (METH_VARARGS | METH_KEYWORDS)
+#define LXNS_OS_COLLECT_ARGS(function_name, names, required, slots) \
+        CALL_PYTHON_INT_CHECK(LxnsOs_collect_args(function_name, names, required, slots, args, kwargs))
+
+static int LxnsOs_collect_args(const char* function_name, const char* const* names, Py_ssize_t required, PyObject** slots, PyObject* args, PyObject* kwargs) {
+        Py_ssize_t nargs = PyTuple_Size(args);
+        for (Py_ssize_t i = 0; i < nargs && names[i] != NULL; i++) {
+                slots[i] = PyTuple_GetItem(args, i);
+        }
+        PyObject *key = NULL, *value = NULL;
+        Py_ssize_t position = 0;
+        while (kwargs != NULL && PyDict_Next(kwargs, &position, &key, &value)) {
+                CALL_PYTHON_EXEC_CHECK(LxnsOs_set_keyword_arg(function_name, names, slots, key, value));
+        }
+        return LxnsOs_check_args(function_name, names, required, slots, nargs);
+}
+#endif
+
+// Parse collected argument with a single format unit if it was passed
+#define LXNS_OS_PARSE_ARG(slot, format, ...)                                            \
+        do {                                                                            \
+                if (slot != NULL) {                                                     \
+                        CALL_PYTHON_BOOL_CHECK(PyArg_Parse(slot, format, __VA_ARGS__)); \
+                }                                                                       \
+        } while (0)
+
+static PyObject* LxnsOs_unshare(PyObject* Py_UNUSED(self), PyObject* flags_object) {
         int flags = 0;
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "i", &flags, NULL));
-        if (unshare(flags) == -1) {
+        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(flags_object, &flags));
+        CALL_PYTHON_AUDIT("lxns.os.unshare", "i", flags);
+
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_UNSHARE, r, unshare(flags));
+        Py_END_ALLOW_THREADS
+        if (r == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
         Py_RETURN_NONE;
 }
 
+#ifdef PYTHON_LXNS_HAVE_FASTCALL
+static PyObject* LxnsOs_setns(PyObject* Py_UNUSED(self), PyObject* const* args, Py_ssize_t nargs) {
+        int fd = -1, nstype = -1;
+
+        if (nargs != 2) {
+                PyErr_Format(PyExc_TypeError, "setns expected 2 arguments, got %zd", nargs);
+                return NULL;
+        }
+        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(args[0], &fd));
+        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(args[1], &nstype));
+#else
 static PyObject* LxnsOs_setns(PyObject* Py_UNUSED(self), PyObject* args) {
         int fd = -1, nstype = -1;
 
         CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "ii", &fd, &nstype, NULL));
-        if (setns(fd, nstype) == -1) {
+#endif
+        CALL_PYTHON_AUDIT("lxns.os.setns", "ii", fd, nstype);
+
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_SETNS, r, setns(fd, nstype));
+        Py_END_ALLOW_THREADS
+        if (r == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
         Py_RETURN_NONE;
 }
 
-static PyObject* LxnsOs_ns_get_userns(PyObject* Py_UNUSED(self), PyObject* args) {
+static PyObject* LxnsOs_ns_ioctl(PyObject* fd_object, enum LxnsOsSyscall syscall_id, unsigned long request) {
         int fd = -1;
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "i", &fd, NULL));
+        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(fd_object, &fd));
 
-        int userns = ioctl(fd, NS_GET_USERNS);
-        if (userns == -1) {
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(syscall_id, r, ioctl(fd, request));
+        Py_END_ALLOW_THREADS
+        if (r == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
 
-        return Py_BuildValue("i", userns, NULL);
+        return PyLong_FromLong(r);
+}
+
+static PyObject* LxnsOs_ns_get_userns(PyObject* Py_UNUSED(self), PyObject* fd_object) {
+        return LxnsOs_ns_ioctl(fd_object, LXNS_OS_SYSCALL_NS_GET_USERNS, NS_GET_USERNS);
 };
 
-static PyObject* LxnsOs_ns_get_parent(PyObject* Py_UNUSED(self), PyObject* args) {
+static PyObject* LxnsOs_ns_get_parent(PyObject* Py_UNUSED(self), PyObject* fd_object) {
+        return LxnsOs_ns_ioctl(fd_object, LXNS_OS_SYSCALL_NS_GET_PARENT, NS_GET_PARENT);
+};
+
+static PyObject* LxnsOs_ns_get_nstype(PyObject* Py_UNUSED(self), PyObject* fd_object) {
+        return LxnsOs_ns_ioctl(fd_object, LXNS_OS_SYSCALL_NS_GET_NSTYPE, NS_GET_NSTYPE);
+};
+
+static PyObject* LxnsOs_ns_get_owner_uid(PyObject* Py_UNUSED(self), PyObject* fd_object) {
         int fd = -1;
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "i", &fd, NULL));
+        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(fd_object, &fd));
 
-        int ns_type = ioctl(fd, NS_GET_PARENT);
-        if (ns_type == -1) {
+        uid_t uid = -1;
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_NS_GET_OWNER_UID, r, ioctl(fd, NS_GET_OWNER_UID, &uid));
+        Py_END_ALLOW_THREADS
+        if (r == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
 
-        return Py_BuildValue("i", ns_type, NULL);
+        return PyLong_FromUnsignedLong(uid);
 };
 
-static PyObject* LxnsOs_ns_get_nstype(PyObject* Py_UNUSED(self), PyObject* args) {
-        int fd = -1;
+// Batched functions return negative errno in place of the value
+// of the file descriptor that failed.
+static long long LxnsOs_fd_ns_get_nstype(int fd) {
+        int r;
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_NS_GET_NSTYPE, r, ioctl(fd, NS_GET_NSTYPE));
+        return r == -1 ? -errno : r;
+}
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "i", &fd, NULL));
+static long long LxnsOs_fd_ns_get_userns(int fd) {
+        int r;
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_NS_GET_USERNS, r, ioctl(fd, NS_GET_USERNS));
+        return r == -1 ? -errno : r;
+}
 
-        int ns_type = ioctl(fd, NS_GET_NSTYPE);
-        if (ns_type == -1) {
-                return PyErr_SetFromErrno(PyExc_OSError);
+static long long LxnsOs_fd_fstat_ino(int fd) {
+        struct stat fd_stat;
+        if (fstat(fd, &fd_stat) == -1) {
+                return -errno;
         }
+        return (long long)fd_stat.st_ino;
+}
 
-        return Py_BuildValue("i", ns_type, NULL);
-};
+#ifdef PYTHON_LXNS_HAVE_BUFFER
+// Get contiguous buffer of integers of the given size and one of the formats.
+// Returns 0 if the object is not such buffer and should be used as a sequence.
+static int LxnsOs_get_int_buffer(PyObject* object, Py_buffer* view, int flags, Py_ssize_t itemsize, const char* formats) {
+        if (!PyObject_CheckBuffer(object)) {
+                return 0;
+        }
+        if (PyObject_GetBuffer(object, view, flags | PyBUF_FORMAT | PyBUF_C_CONTIGUOUS) == -1) {
+                // For example, read only buffer. Sequence protocol reports the error.
+                PyErr_Clear();
+                return 0;
+        }
+        const char* format = view->format[0] == '@' ? view->format + 1 : view->format;
+        if (view->itemsize == itemsize && format[0] != '\0' && format[1] == '\0' && strchr(formats, format[0]) != NULL) {
+                return 1;
+        }
+        PyBuffer_Release(view);
+        return 0;
+}
+#endif
 
-static PyObject* LxnsOs_ns_get_owner_uid(PyObject* Py_UNUSED(self), PyObject* args) {
-        int fd = -1;
+static void LxnsOs_close_fds(const long long* fds, Py_ssize_t fds_len) {
+        for (Py_ssize_t i = 0; i < fds_len; i++) {
+                if (fds[i] >= 0) {
+                        close((int)fds[i]);
+                }
+        }
+}
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "i", &fd, NULL));
+static PyObject* LxnsOs_store_values(const long long* values_array, Py_ssize_t values_len, PyObject* out) {
+        if (out == NULL) {
+                PyObject* results CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyList_New(values_len));
+                for (Py_ssize_t i = 0; i < values_len; i++) {
+                        PyObject* value = CALL_PYTHON_AND_CHECK(PyLong_FromLongLong(values_array[i]));
+                        // Steals the value reference
+                        CALL_PYTHON_INT_CHECK(PyList_SetItem(results, i, value));
+                }
+                Py_INCREF(results);
+                return results;
+        }
 
-        uid_t uid = -1;
-        int r = ioctl(fd, NS_GET_OWNER_UID, &uid);
-        if (r == -1) {
-                return PyErr_SetFromErrno(PyExc_OSError);
+        // Mapping protocol also supports memoryview on the older limited API
+        for (Py_ssize_t i = 0; i < values_len; i++) {
+                PyObject* index CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyLong_FromSsize_t(i));
+                PyObject* value CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyLong_FromLongLong(values_array[i]));
+                CALL_PYTHON_INT_CHECK(PyObject_SetItem(out, index, value));
         }
+        Py_RETURN_NONE;
+}
 
-        return Py_BuildValue("I", uid, NULL);
-};
+// Call the function on each file descriptor with the GIL released.
+// File descriptors are read from a sequence of ints. Buffers of C ints,
+// for example array("i"), are copied directly.
+//
+// Results are returned as a new list or written to the output sequence
+// if passed. Buffers of 64 bit integers, for example array("q"),
+// are filled directly without creating int objects.
+//
+// If the results are new file descriptors they are closed on errors.
+static PyObject* LxnsOs_map_fds(PyObject* fds, PyObject* out, long long (*fd_function)(int), int results_are_fds) {
+        Py_ssize_t fds_len = -1;
+#ifdef PYTHON_LXNS_HAVE_BUFFER
+        Py_buffer fds_view CLEANUP_PY_BUFFER = {0};
+        Py_buffer out_view CLEANUP_PY_BUFFER = {0};
+        if (LxnsOs_get_int_buffer(fds, &fds_view, PyBUF_SIMPLE, sizeof(int), "i")) {
+                fds_len = fds_view.len / fds_view.itemsize;
+        }
+#endif
+        if (fds_len == -1) {
+                fds_len = CALL_PYTHON_INT_CHECK(PySequence_Size(fds));
+        }
+
+        // Output is checked before calling the functions
+        // so that the returned file descriptors are not lost.
+        if (out != NULL) {
+                Py_ssize_t out_len = -1;
+#ifdef PYTHON_LXNS_HAVE_BUFFER
+                if (LxnsOs_get_int_buffer(out, &out_view, PyBUF_WRITABLE, sizeof(long long), "ql")) {
+                        out_len = out_view.len / out_view.itemsize;
+                }
+#endif
+                if (out_len == -1) {
+                        out_len = CALL_PYTHON_INT_CHECK(PyObject_Size(out));
+                }
+                if (out_len < fds_len) {
+                        PyErr_SetString(PyExc_ValueError, "Output is shorter than the file descriptors sequence");
+                        return NULL;
+                }
+        }
+
+        int* fds_array CLEANUP_PY_MEM = PyMem_Calloc(fds_len ? fds_len : 1, sizeof(int));
+        long long* values_array CLEANUP_PY_MEM = PyMem_Calloc(fds_len ? fds_len : 1, sizeof(long long));
+        if (fds_array == NULL || values_array == NULL) {
+                return PyErr_NoMemory();
+        }
+
+#ifdef PYTHON_LXNS_HAVE_BUFFER
+        if (fds_view.obj != NULL) {
+                memcpy(fds_array, fds_view.buf, fds_len * sizeof(int));
+        } else
+#endif
+        {
+                for (Py_ssize_t i = 0; i < fds_len; i++) {
+                        PyObject* fd_object CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PySequence_GetItem(fds, i));
+                        CALL_PYTHON_INT_CHECK(LxnsOs_parse_int(fd_object, &fds_array[i]));
+                }
+        }
+
+        Py_BEGIN_ALLOW_THREADS
+        for (Py_ssize_t i = 0; i < fds_len; i++) {
+                values_array[i] = fd_function(fds_array[i]);
+        }
+        Py_END_ALLOW_THREADS
+
+#ifdef PYTHON_LXNS_HAVE_BUFFER
+        if (out_view.obj != NULL) {
+                memcpy(out_view.buf, values_array, fds_len * sizeof(long long));
+                Py_RETURN_NONE;
+        }
+#endif
+        PyObject* results = LxnsOs_store_values(values_array, fds_len, out);
+        if (results == NULL && results_are_fds) {
+                LxnsOs_close_fds(values_array, fds_len);
+        }
+        return results;
+}
 
-static PyObject* LxnsOs_open_tree(PyObject* Py_UNUSED(self), PyObject* args, PyObject* kwargs) {
+#ifdef PYTHON_LXNS_HAVE_FASTCALL
+#define LXNS_OS_MANY_PARAMS PyObject *const *args, Py_ssize_t nargs
+#define LXNS_OS_MANY_FLAGS METH_FASTCALL
+#define LXNS_OS_PARSE_MANY_ARGS(function_name, fds, out) CALL_PYTHON_INT_CHECK(LxnsOs_parse_many_args(function_name, args, nargs, fds, out))
+
+static int LxnsOs_parse_many_args(const char* function_name, PyObject* const* args, Py_ssize_t nargs, PyObject** fds, PyObject** out) {
+        if (nargs < 1 || nargs > 2) {
+                PyErr_Format(PyExc_TypeError, "%s expected 1 or 2 arguments, got %zd", function_name, nargs);
+                return -1;
+        }
+        *fds = args[0];
+        *out = nargs == 2 ? args[1] : NULL;
+        return 0;
+}
+#else
+#define LXNS_OS_MANY_PARAMS PyObject* args
+#define LXNS_OS_MANY_FLAGS METH_VARARGS
+#define LXNS_OS_PARSE_MANY_ARGS(function_name, fds, out) CALL_PYTHON_BOOL_CHECK(PyArg_ParseTuple(args, "O|O:" function_name, fds, out))
+#endif
+
+static PyObject* LxnsOs_ns_get_nstype_many(PyObject* Py_UNUSED(self), LXNS_OS_MANY_PARAMS) {
+        PyObject *fds = NULL, *out = NULL;
+        LXNS_OS_PARSE_MANY_ARGS("ns_get_nstype_many", &fds, &out);
+        return LxnsOs_map_fds(fds, out, LxnsOs_fd_ns_get_nstype, 0);
+}
+
+static PyObject* LxnsOs_ns_get_userns_many(PyObject* Py_UNUSED(self), LXNS_OS_MANY_PARAMS) {
+        PyObject *fds = NULL, *out = NULL;
+        LXNS_OS_PARSE_MANY_ARGS("ns_get_userns_many", &fds, &out);
+        return LxnsOs_map_fds(fds, out, LxnsOs_fd_ns_get_userns, 1);
+}
+
+static PyObject* LxnsOs_fstat_ino_many(PyObject* Py_UNUSED(self), LXNS_OS_MANY_PARAMS) {
+        PyObject *fds = NULL, *out = NULL;
+        LXNS_OS_PARSE_MANY_ARGS("fstat_ino_many", &fds, &out);
+        return LxnsOs_map_fds(fds, out, LxnsOs_fd_fstat_ino, 0);
+}
+
+static const char* const lxns_os_open_tree_names[] = {"dirfd", "path", "flags", NULL};
+
+static PyObject* LxnsOs_open_tree(PyObject* Py_UNUSED(self), LXNS_OS_KEYWORDS_PARAMS) {
         int dirfd = AT_FDCWD;
         const char* path = NULL;
         unsigned int flags = 0;
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTupleAndKeywords(args, kwargs, "|izI", (char*[]){"dirfd", "path", "flags", NULL}, &dirfd, &path, &flags, NULL));
+        PyObject* slots[3] = {NULL};
+        LXNS_OS_COLLECT_ARGS("open_tree", lxns_os_open_tree_names, 0, slots);
+        LXNS_OS_PARSE_ARG(slots[0], "i", &dirfd);
+        LXNS_OS_PARSE_ARG(slots[1], "z", &path);
+        LXNS_OS_PARSE_ARG(slots[2], "I", &flags);
+
+        CALL_PYTHON_AUDIT("lxns.os.open_tree", "izI", dirfd, path, flags);
 
-        int tree_fd = open_tree(dirfd, path, flags);
+        int tree_fd;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_OPEN_TREE, tree_fd, open_tree(dirfd, path, flags));
+        Py_END_ALLOW_THREADS
         if (tree_fd == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
-        return Py_BuildValue("i", tree_fd, NULL);
+        return PyLong_FromLong(tree_fd);
 }
 
-static PyObject* LxnsOs_move_mount(PyObject* Py_UNUSED(self), PyObject* args, PyObject* kwargs) {
+static const char* const lxns_os_move_mount_names[] = {"from_dirfd", "from_path", "to_dirfd", "to_path", "flags", NULL};
+
+static PyObject* LxnsOs_move_mount(PyObject* Py_UNUSED(self), LXNS_OS_KEYWORDS_PARAMS) {
         int from_dirfd = AT_FDCWD;
         const char* from_path = "";
         int to_dirfd = AT_FDCWD;
         const char* to_path = "";
         unsigned int flags = 0;
 
-        CALL_PYTHON_BOOL_CHECK(PyArg_ParseTupleAndKeywords(args, kwargs, "|izizI", (char*[]){"from_dirfd", "from_path", "to_dirfd", "to_path", "flags", NULL},
-                                                           &from_dirfd, &from_path, &to_dirfd, &to_path, &flags, NULL));
+        PyObject* slots[5] = {NULL};
+        LXNS_OS_COLLECT_ARGS("move_mount", lxns_os_move_mount_names, 0, slots);
+        LXNS_OS_PARSE_ARG(slots[0], "i", &from_dirfd);
+        LXNS_OS_PARSE_ARG(slots[1], "z", &from_path);
+        LXNS_OS_PARSE_ARG(slots[2], "i", &to_dirfd);
+        LXNS_OS_PARSE_ARG(slots[3], "z", &to_path);
+        LXNS_OS_PARSE_ARG(slots[4], "I", &flags);
+
+        CALL_PYTHON_AUDIT("lxns.os.move_mount", "izizI", from_dirfd, from_path, to_dirfd, to_path, flags);
 
-        int r = move_mount(from_dirfd, from_path, to_dirfd, to_path, flags);
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_MOVE_MOUNT, r, move_mount(from_dirfd, from_path, to_dirfd, to_path, flags));
+        Py_END_ALLOW_THREADS
         if (r == -1) {
                 return PyErr_SetFromErrno(PyExc_OSError);
         }
         Py_RETURN_NONE;
 }
 
+static const char* const lxns_os_name_to_handle_at_names[] = {"dirfd", "path", "flags", NULL};
+
+static PyObject* LxnsOs_name_to_handle_at(PyObject* Py_UNUSED(self), LXNS_OS_KEYWORDS_PARAMS) {
+        int dirfd = AT_FDCWD;
+        const char* path = "";
+        int flags = 0;
+
+        PyObject* slots[3] = {NULL};
+        LXNS_OS_COLLECT_ARGS("name_to_handle_at", lxns_os_name_to_handle_at_names, 0, slots);
+        LXNS_OS_PARSE_ARG(slots[0], "i", &dirfd);
+        LXNS_OS_PARSE_ARG(slots[1], "s", &path);
+        LXNS_OS_PARSE_ARG(slots[2], "i", &flags);
+
+        struct {
+                struct file_handle handle;
+                unsigned char f_handle[MAX_HANDLE_SZ];
+        } handle_buffer = {.handle.handle_bytes = MAX_HANDLE_SZ};
+        int mount_id = -1;
+
+        int r;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_NAME_TO_HANDLE_AT, r, name_to_handle_at(dirfd, path, &handle_buffer.handle, &mount_id, flags));
+        Py_END_ALLOW_THREADS
+        if (r == -1) {
+                return PyErr_SetFromErrno(PyExc_OSError);
+        }
+
+        // Handle is returned as the struct file_handle followed by the handle data
+        Py_ssize_t handle_size = sizeof(struct file_handle) + handle_buffer.handle.handle_bytes;
+        return Py_BuildValue("(y#i)", (const char*)&handle_buffer, handle_size, mount_id);
+}
+
+static const char* const lxns_os_open_by_handle_at_names[] = {"mount_fd", "handle", "flags", NULL};
+
+static PyObject* LxnsOs_open_by_handle_at(PyObject* Py_UNUSED(self), LXNS_OS_KEYWORDS_PARAMS) {
+        int mount_fd = -1;
+        const char* handle_data = NULL;
+        Py_ssize_t handle_size = 0;
+        int flags = 0;
+
+        PyObject* slots[3] = {NULL};
+        LXNS_OS_COLLECT_ARGS("open_by_handle_at", lxns_os_open_by_handle_at_names, 2, slots);
+        LXNS_OS_PARSE_ARG(slots[0], "i", &mount_fd);
+        LXNS_OS_PARSE_ARG(slots[1], "y#", &handle_data, &handle_size);
+        LXNS_OS_PARSE_ARG(slots[2], "i", &flags);
+
+        struct {
+                struct file_handle handle;
+                unsigned char f_handle[MAX_HANDLE_SZ];
+        } handle_buffer;
+        if (handle_size < (Py_ssize_t)sizeof(struct file_handle) || handle_size > (Py_ssize_t)sizeof(handle_buffer)) {
+                PyErr_SetString(PyExc_ValueError, "Invalid file handle size");
+                return NULL;
+        }
+        memcpy(&handle_buffer, handle_data, handle_size);
+        if (sizeof(struct file_handle) + handle_buffer.handle.handle_bytes != (size_t)handle_size) {
+                PyErr_SetString(PyExc_ValueError, "File handle size does not match its header");
+                return NULL;
+        }
+
+        CALL_PYTHON_AUDIT("lxns.os.open_by_handle_at", "ii", mount_fd, flags);
+
+        int fd;
+        Py_BEGIN_ALLOW_THREADS
+        LXNS_OS_SYSCALL(LXNS_OS_SYSCALL_OPEN_BY_HANDLE_AT, fd, open_by_handle_at(mount_fd, &handle_buffer.handle, flags));
+        Py_END_ALLOW_THREADS
+        if (fd == -1) {
+                return PyErr_SetFromErrno(PyExc_OSError);
+        }
+        return PyLong_FromLong(fd);
+}
+
+struct LxnsOsProbedSyscall {
+        const char* name;
+        long number;
+        // Syscall checks the caller permissions before the arguments
+        // and returns EPERM to unprivileged callers.
+        int checks_permissions_first;
+};
+
+static const struct LxnsOsProbedSyscall lxns_os_probed_syscalls[] = {
+#ifdef SYS_open_tree
+    {"open_tree", SYS_open_tree, 0},
+#endif
+#ifdef SYS_move_mount
+    {"move_mount", SYS_move_mount, 1},
+#endif
+#ifdef SYS_clone3
+    {"clone3", SYS_clone3, 0},
+#endif
+#ifdef SYS_mount_setattr
+    {"mount_setattr", SYS_mount_setattr, 0},
+#endif
+#ifdef SYS_statmount
+    {"statmount", SYS_statmount, 0},
+#endif
+#ifdef SYS_listmount
+    {"listmount", SYS_listmount, 0},
+#endif
+    {NULL, 0, 0},
+};
+
+static PyObject* LxnsOs_probe_syscall(PyObject* Py_UNUSED(self), PyObject* name_object) {
+        const char* name = NULL;
+        CALL_PYTHON_BOOL_CHECK(PyArg_Parse(name_object, "s", &name));
+
+        for (const struct LxnsOsProbedSyscall* probed = lxns_os_probed_syscalls; probed->name != NULL; probed++) {
+                if (strcmp(probed->name, name) != 0) {
+                        continue;
+                }
+
+                // All probed syscalls reject zero arguments before doing
+                // anything. ENOSYS is returned if the syscall does not exist
+                // or is blocked by seccomp. Seccomp filters can also return
+                // EPERM or EACCES, for example, the Docker default profile.
+                long r;
+                int probe_errno;
+                Py_BEGIN_ALLOW_THREADS
+                r = syscall(probed->number, 0, 0, 0, 0, 0, 0);
+                probe_errno = errno;
+                Py_END_ALLOW_THREADS
+                if (r != -1) {
+                        Py_RETURN_TRUE;
+                }
+                switch (probe_errno) {
+                        case ENOSYS:
+                        case EACCES:
+                                Py_RETURN_FALSE;
+                        case EPERM:
+                                // Can't be told apart from the missing privileges
+                                // if the syscall checks them first. has_open_tree
+                                // also probes open_tree which checks arguments first.
+                                return PyBool_FromLong(probed->checks_permissions_first);
+                        default:
+                                Py_RETURN_TRUE;
+                }
+        }
+
+        // Unknown to the build headers
+        Py_RETURN_FALSE;
+}
+
+// First fields of the clone3 arguments (CLONE_ARGS_SIZE_VER0)
+struct LxnsOsCloneArgs {
+        uint64_t flags;
+        uint64_t pidfd;
+        uint64_t child_tid;
+        uint64_t parent_tid;
+        uint64_t exit_signal;
+        uint64_t stack;
+        uint64_t stack_size;
+        uint64_t tls;
+};
+
+static PyObject* LxnsOs_probe_setns_pidfd(PyObject* Py_UNUSED(self), PyObject* Py_UNUSED(args)) {
+#ifdef SYS_clone3
+        // Child exits immediately and is reaped. Joining namespaces of
+        // the reaped process fails with ESRCH before any namespace is
+        // changed if setns accepts pidfd and with EINVAL otherwise.
+        // No exit signal so that the child is not reaped by other waiters.
+        int pidfd = -1;
+        struct LxnsOsCloneArgs clone_args = {
+            .flags = CLONE_PIDFD | CLONE_VFORK,
+            .pidfd = (uint64_t)(uintptr_t)&pidfd,
+        };
+        long pid;
+        int r = 0;
+        Py_BEGIN_ALLOW_THREADS
+        pid = syscall(SYS_clone3, &clone_args, sizeof(clone_args));
+        if (pid == 0) {
+                _exit(0);
+        }
+        if (pid > 0) {
+                waitpid(pid, NULL, __WALL);
+                r = setns(pidfd, CLONE_NEWUTS);
+                if (r == -1) {
+                        r = errno;
+                }
+                close(pidfd);
+        }
+        Py_END_ALLOW_THREADS
+        if (pid == -1) {
+                if (errno == ENOSYS) {
+                        // No clone3 means kernel is older than 5.3
+                        Py_RETURN_FALSE;
+                }
+                return PyErr_SetFromErrno(PyExc_OSError);
+        }
+        return PyBool_FromLong(r == ESRCH);
+#else
+        Py_RETURN_FALSE;
+#endif
+}
+
 static PyMethodDef lxns_os_methods[] = {
-    {"unshare", (PyCFunction)LxnsOs_unshare, METH_VARARGS, NULL},
+    {"unshare", (PyCFunction)LxnsOs_unshare, METH_O, NULL},
+#ifdef PYTHON_LXNS_HAVE_FASTCALL
+    {"setns", (PyCFunction)(void*)LxnsOs_setns, METH_FASTCALL, NULL},
+#else
     {"setns", (PyCFunction)LxnsOs_setns, METH_VARARGS, NULL},
-    {"ns_get_userns", (PyCFunction)LxnsOs_ns_get_userns, METH_VARARGS, NULL},
-    {"ns_get_parent", (PyCFunction)LxnsOs_ns_get_parent, METH_VARARGS, NULL},
-    {"ns_get_nstype", (PyCFunction)LxnsOs_ns_get_nstype, METH_VARARGS, NULL},
-    {"ns_get_owner_uid", (PyCFunction)LxnsOs_ns_get_owner_uid, METH_VARARGS, NULL},
-    {"open_tree", (PyCFunction)(void*)LxnsOs_open_tree, METH_VARARGS | METH_KEYWORDS, NULL},
-    {"move_mount", (PyCFunction)(void*)LxnsOs_move_mount, METH_VARARGS | METH_KEYWORDS, NULL},
+#endif
+    {"ns_get_userns", (PyCFunction)LxnsOs_ns_get_userns, METH_O, NULL},
+    {"ns_get_parent", (PyCFunction)LxnsOs_ns_get_parent, METH_O, NULL},
+    {"ns_get_nstype", (PyCFunction)LxnsOs_ns_get_nstype, METH_O, NULL},
+    {"ns_get_owner_uid", (PyCFunction)LxnsOs_ns_get_owner_uid, METH_O, NULL},
+    {"ns_get_nstype_many", (PyCFunction)(void*)LxnsOs_ns_get_nstype_many, LXNS_OS_MANY_FLAGS, NULL},
+    {"ns_get_userns_many", (PyCFunction)(void*)LxnsOs_ns_get_userns_many, LXNS_OS_MANY_FLAGS, NULL},
+    {"fstat_ino_many", (PyCFunction)(void*)LxnsOs_fstat_ino_many, LXNS_OS_MANY_FLAGS, NULL},
+    {"enable_stats", (PyCFunction)LxnsOs_enable_stats, METH_O, NULL},
+    {"reset_stats", (PyCFunction)LxnsOs_reset_stats, METH_NOARGS, NULL},
+    {"stats", (PyCFunction)LxnsOs_stats, METH_NOARGS, NULL},
+    {"open_tree", (PyCFunction)(void*)LxnsOs_open_tree, LXNS_OS_KEYWORDS_FLAGS, NULL},
+    {"move_mount", (PyCFunction)(void*)LxnsOs_move_mount, LXNS_OS_KEYWORDS_FLAGS, NULL},
+    {"name_to_handle_at", (PyCFunction)(void*)LxnsOs_name_to_handle_at, LXNS_OS_KEYWORDS_FLAGS, NULL},
+    {"open_by_handle_at", (PyCFunction)(void*)LxnsOs_open_by_handle_at, LXNS_OS_KEYWORDS_FLAGS, NULL},
+    {"probe_syscall", (PyCFunction)LxnsOs_probe_syscall, METH_O, NULL},
+    {"probe_setns_pidfd", (PyCFunction)LxnsOs_probe_setns_pidfd, METH_NOARGS, NULL},
     {0},
 };
 
+static int LxnsOs_exec(PyObject* m) {
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_FILES", CLONE_FILES));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_FS", CLONE_FS));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWCGROUP", CLONE_NEWCGROUP));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWIPC", CLONE_NEWIPC));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWNET", CLONE_NEWNET));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWNS", CLONE_NEWNS));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWPID", CLONE_NEWPID));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWTIME", CLONE_NEWTIME));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWUSER", CLONE_NEWUSER));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWUTS", CLONE_NEWUTS));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "CLONE_SYSVSEM", CLONE_SYSVSEM));
+
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "AT_EMPTY_PATH", AT_EMPTY_PATH));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "AT_NO_AUTOMOUNT", AT_NO_AUTOMOUNT));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "AT_SYMLINK_NOFOLLOW", AT_SYMLINK_NOFOLLOW));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "OPEN_TREE_CLOEXEC", OPEN_TREE_CLOEXEC));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "OPEN_TREE_CLONE", OPEN_TREE_CLONE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "AT_RECURSIVE", AT_RECURSIVE));
+
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_EMPTY_PATH", MOVE_MOUNT_F_EMPTY_PATH));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_T_EMPTY_PATH", MOVE_MOUNT_T_EMPTY_PATH));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_AUTOMOUNTS", MOVE_MOUNT_F_AUTOMOUNTS));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_SYMLINKS", MOVE_MOUNT_F_SYMLINKS));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_T_SYMLINKS", MOVE_MOUNT_T_SYMLINKS));
+
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "FD_NSFS_ROOT", FD_NSFS_ROOT));
+
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_CGROUP_NAMESPACE", PIDFD_GET_CGROUP_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_IPC_NAMESPACE", PIDFD_GET_IPC_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_MNT_NAMESPACE", PIDFD_GET_MNT_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_NET_NAMESPACE", PIDFD_GET_NET_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_PID_NAMESPACE", PIDFD_GET_PID_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_PID_FOR_CHILDREN_NAMESPACE", PIDFD_GET_PID_FOR_CHILDREN_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_TIME_NAMESPACE", PIDFD_GET_TIME_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_TIME_FOR_CHILDREN_NAMESPACE", PIDFD_GET_TIME_FOR_CHILDREN_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_USER_NAMESPACE", PIDFD_GET_USER_NAMESPACE));
+        CALL_PYTHON_EXEC_CHECK(PyModule_AddIntConstant(m, "PIDFD_GET_UTS_NAMESPACE", PIDFD_GET_UTS_NAMESPACE));
+
+        return 0;
+}
+
+static PyModuleDef_Slot lxns_os_slots[] = {
+    {Py_mod_exec, LxnsOs_exec},
+#ifdef Py_mod_multiple_interpreters
+    // Only global state are the syscall statistics which are process wide
+    // by design, hold no Python objects and are only accessed with atomic
+    // operations. Module can be loaded in isolated subinterpreters.
+    {Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED},
+#endif
+#ifdef Py_mod_gil
+    // All functions are thread safe
+    {Py_mod_gil, Py_MOD_GIL_NOT_USED},
+#endif
+    {0, NULL},
+};
+
 static PyModuleDef lxns_os_module = {
-    PyModuleDef_HEAD_INIT,
-    .m_name = "os",
-    .m_size = -1,
-    .m_methods = lxns_os_methods,
+    PyModuleDef_HEAD_INIT, .m_name = "os", .m_size = 0, .m_methods = lxns_os_methods, .m_slots = lxns_os_slots,
 };
 
 PyMODINIT_FUNC PyInit_os(void) {
-        PyObject* m CLEANUP_PY_OBJECT = CALL_PYTHON_AND_CHECK(PyModule_Create(&lxns_os_module));
-
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_FILES", CLONE_FILES));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_FS", CLONE_FS));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWCGROUP", CLONE_NEWCGROUP));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWIPC", CLONE_NEWIPC));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWNET", CLONE_NEWNET));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWNS", CLONE_NEWNS));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWPID", CLONE_NEWPID));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWTIME", CLONE_NEWTIME));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWUSER", CLONE_NEWUSER));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_NEWUTS", CLONE_NEWUTS));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "CLONE_SYSVSEM", CLONE_SYSVSEM));
-
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "AT_EMPTY_PATH", AT_EMPTY_PATH));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "AT_NO_AUTOMOUNT", AT_NO_AUTOMOUNT));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "AT_SYMLINK_NOFOLLOW", AT_SYMLINK_NOFOLLOW));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "OPEN_TREE_CLOEXEC", OPEN_TREE_CLOEXEC));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "OPEN_TREE_CLONE", OPEN_TREE_CLONE));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "AT_RECURSIVE", AT_RECURSIVE));
-
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_EMPTY_PATH", MOVE_MOUNT_F_EMPTY_PATH));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_T_EMPTY_PATH", MOVE_MOUNT_T_EMPTY_PATH));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_AUTOMOUNTS", MOVE_MOUNT_F_AUTOMOUNTS));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_F_SYMLINKS", MOVE_MOUNT_F_SYMLINKS));
-        CALL_PYTHON_INT_CHECK(PyModule_AddIntConstant(m, "MOVE_MOUNT_T_SYMLINKS", MOVE_MOUNT_T_SYMLINKS));
-
-        Py_INCREF(m);
-        return m;
+        return PyModuleDef_Init(&lxns_os_module);
 }
@@ -2,6 +2,20 @@
 # SPDX-FileCopyrightText: 2023 igo95862
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, overload
+
+if TYPE_CHECKING:
+    from collections.abc import MutableSequence, Sequence
+    from typing import TypedDict
+
+    class SyscallStats(TypedDict):
+        calls: int
+        errors: int
+        total_latency_ns: int
+        errnos: dict[int, int]
+        latency_ns_histogram: dict[int, int]
+
+
 STUB_ERROR = "Typing stub. Actual library failed to load. Check your installation."
 
 
@@ -29,6 +43,54 @@ def ns_get_owner_uid(fd: int, /) -> int:
     raise NotImplementedError(STUB_ERROR)
 
 
+@overload
+def ns_get_nstype_many(fds: Sequence[int], /) -> list[int]: ...
+
+
+@overload
+def ns_get_nstype_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview, /
+) -> None: ...
+
+
+def ns_get_nstype_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview | None = None, /
+) -> list[int] | None:
+    raise NotImplementedError(STUB_ERROR)
+
+
+@overload
+def ns_get_userns_many(fds: Sequence[int], /) -> list[int]: ...
+
+
+@overload
+def ns_get_userns_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview, /
+) -> None: ...
+
+
+def ns_get_userns_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview | None = None, /
+) -> list[int] | None:
+    raise NotImplementedError(STUB_ERROR)
+
+
+@overload
+def fstat_ino_many(fds: Sequence[int], /) -> list[int]: ...
+
+
+@overload
+def fstat_ino_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview, /
+) -> None: ...
+
+
+def fstat_ino_many(
+    fds: Sequence[int], out: MutableSequence[int] | memoryview | None = None, /
+) -> list[int] | None:
+    raise NotImplementedError(STUB_ERROR)
+
+
 def open_tree(dirfd: int = -1, path: str = "", flags: int = 0) -> int:
     raise NotImplementedError(STUB_ERROR)
 
@@ -43,6 +105,38 @@ def move_mount(
     raise NotImplementedError(STUB_ERROR)
 
 
+def name_to_handle_at(
+    dirfd: int = -1,
+    path: str = "",
+    flags: int = 0,
+) -> tuple[bytes, int]:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def open_by_handle_at(mount_fd: int, handle: bytes, flags: int = 0) -> int:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def probe_syscall(name: str, /) -> bool:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def probe_setns_pidfd() -> bool:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def enable_stats(enabled: bool, /) -> None:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def reset_stats() -> None:
+    raise NotImplementedError(STUB_ERROR)
+
+
+def stats() -> dict[str, SyscallStats]:
+    raise NotImplementedError(STUB_ERROR)
+
+
 CLONE_FILES: int = 0
 CLONE_FS: int = 0
 CLONE_NEWCGROUP: int = 0
@@ -67,3 +161,16 @@ MOVE_MOUNT_T_EMPTY_PATH: int = 0
 MOVE_MOUNT_F_AUTOMOUNTS: int = 0
 MOVE_MOUNT_F_SYMLINKS: int = 0
 MOVE_MOUNT_T_SYMLINKS: int = 0
+
+FD_NSFS_ROOT: int = 0
+
+PIDFD_GET_CGROUP_NAMESPACE: int = 0
+PIDFD_GET_IPC_NAMESPACE: int = 0
+PIDFD_GET_MNT_NAMESPACE: int = 0
+PIDFD_GET_NET_NAMESPACE: int = 0
+PIDFD_GET_PID_NAMESPACE: int = 0
+PIDFD_GET_PID_FOR_CHILDREN_NAMESPACE: int = 0
+PIDFD_GET_TIME_NAMESPACE: int = 0
+PIDFD_GET_TIME_FOR_CHILDREN_NAMESPACE: int = 0
+PIDFD_GET_USER_NAMESPACE: int = 0
+PIDFD_GET_UTS_NAMESPACE: int = 0
@@ -0,0 +1,277 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Pytest plugin to run tests in new namespaces.
+
+Enable with ``-p lxns.pytest`` command line option or by adding
+``pytest_plugins = ("lxns.pytest",)`` to the ``conftest.py``.
+
+Tests marked with ``lxns_isolated`` are run in forked children of the
+pytest process after the collection finished. Children already have
+all test modules imported and run in parallel.
+"""
+from __future__ import annotations
+
+from json import dumps, loads
+from os import O_CLOEXEC
+from os import _exit as os_exit
+from os import close as close_fd
+from os import cpu_count, fork, getgid, getuid, pipe2
+from os import read as read_fd
+from os import waitpid, waitstatus_to_exitcode
+from os import write as write_fd
+from selectors import EVENT_READ, DefaultSelector
+from traceback import print_exc
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .namespaces import NamespaceSet, current_namespaces
+from .os import CLONE_NEWNET, CLONE_NEWNS, CLONE_NEWPID, CLONE_NEWUSER, unshare
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--lxns-jobs",
+        type=int,
+        default=None,
+        help=(
+            "Maximum number of isolated tests to run in parallel. "
+            "Defaults to the number of CPUs."
+        ),
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "lxns_isolated(network=False, pid=False): "
+        "run test in new user and mount namespaces.",
+    )
+
+
+def _get_unshare_flags(item: pytest.Item) -> int | None:
+    marker = item.get_closest_marker("lxns_isolated")
+    if marker is None:
+        return None
+
+    flags = CLONE_NEWNS
+    if marker.kwargs.get("network", False):
+        flags |= CLONE_NEWNET
+
+    if marker.kwargs.get("pid", False):
+        flags |= CLONE_NEWPID
+
+    return flags
+
+
+@pytest.fixture
+def lxns_namespaces(request: pytest.FixtureRequest) -> Iterator[NamespaceSet]:
+    """Namespaces the isolated test runs in."""
+    if request.node.get_closest_marker("lxns_isolated") is None:
+        pytest.fail("lxns_namespaces fixture requires lxns_isolated marker")
+
+    with NamespaceSet.from_pid("self") as namespaces:
+        yield namespaces
+
+
+def _enter_namespaces(unshare_flags: int) -> None:
+    # Map current user to root similar to "unshare --map-root-user"
+    uid, gid = getuid(), getgid()
+    unshare(CLONE_NEWUSER | unshare_flags)
+    current_namespaces.refresh()
+
+    with open("/proc/self/setgroups", mode="w") as f:
+        f.write("deny")
+
+    with open("/proc/self/uid_map", mode="w") as f:
+        f.write(f"0 {uid} 1")
+
+    with open("/proc/self/gid_map", mode="w") as f:
+        f.write(f"0 {gid} 1")
+
+
+class _ReportSender:
+    def __init__(self, config: pytest.Config, report_fd: int):
+        self.config = config
+        self.report_fd = report_fd
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        data = self.config.hook.pytest_report_to_serializable(
+            config=self.config, report=report
+        )
+        view = memoryview(dumps(data).encode() + b"\n")
+        while view:
+            view = view[write_fd(self.report_fd, view) :]
+
+
+def _run_child(item: pytest.Item, unshare_flags: int, report_fd: int) -> None:
+    exit_code = 0
+    try:
+        _enter_namespaces(unshare_flags)
+
+        if unshare_flags & CLONE_NEWPID:
+            # Only children are placed in the new pid namespace
+            pid = fork()
+            if pid != 0:
+                _, status = waitpid(pid, 0)
+                exit_code = waitstatus_to_exitcode(status)
+                return
+
+        plugin_manager = item.config.pluginmanager
+        # Reports are printed by the parent
+        terminal_reporter = plugin_manager.get_plugin("terminalreporter")
+        if terminal_reporter is not None:
+            plugin_manager.unregister(terminal_reporter)
+
+        plugin_manager.register(_ReportSender(item.config, report_fd))
+        item.ihook.pytest_runtest_protocol(item=item, nextitem=None)
+    except BaseException:
+        exit_code = 1
+        print_exc()
+    finally:
+        os_exit(exit_code)
+
+
+class _IsolatedChild:
+    def __init__(self, item: pytest.Item, pid: int, report_fd: int):
+        self.item = item
+        self.pid = pid
+        self.report_fd = report_fd
+        self.data = bytearray()
+
+
+def _start_child(item: pytest.Item, unshare_flags: int) -> _IsolatedChild:
+    read_end, write_end = pipe2(O_CLOEXEC)
+    try:
+        pid = fork()
+        if pid == 0:
+            close_fd(read_end)
+            _run_child(item, unshare_flags, write_end)
+    except BaseException:
+        close_fd(read_end)
+        raise
+    finally:
+        close_fd(write_end)
+
+    return _IsolatedChild(item, pid, read_end)
+
+
+def _finish_child(child: _IsolatedChild) -> None:
+    _, status = waitpid(child.pid, 0)
+    exit_code = waitstatus_to_exitcode(status)
+
+    item = child.item
+    config = item.config
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+
+    reports: list[pytest.TestReport] = [
+        config.hook.pytest_report_from_serializable(config=config, data=loads(line))
+        for line in child.data.splitlines()
+    ]
+    if exit_code != 0 or not reports:
+        reports.append(
+            pytest.TestReport(
+                nodeid=item.nodeid,
+                location=item.location,
+                keywords={},
+                outcome="failed",
+                longrepr=f"Isolated test process exited with code {exit_code}",
+                when="call",
+            )
+        )
+
+    for report in reports:
+        item.ihook.pytest_runtest_logreport(report=report)
+
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+def _run_isolated_items(
+    session: pytest.Session,
+    items: list[tuple[pytest.Item, int]],
+    jobs: int,
+) -> None:
+    pending = list(reversed(items))
+    selector = DefaultSelector()
+    try:
+        while pending or selector.get_map():
+            while (
+                pending
+                and len(selector.get_map()) < jobs
+                and not (session.shouldfail or session.shouldstop)
+            ):
+                child = _start_child(*pending.pop())
+                selector.register(child.report_fd, EVENT_READ, child)
+
+            if not selector.get_map():
+                break
+
+            for key, _ in selector.select():
+                child = key.data
+                data = read_fd(child.report_fd, READ_CHUNK_SIZE)
+                if data:
+                    child.data.extend(data)
+                    continue
+
+                selector.unregister(child.report_fd)
+                close_fd(child.report_fd)
+                _finish_child(child)
+    finally:
+        for key in list(selector.get_map().values()):
+            close_fd(key.data.report_fd)
+
+        selector.close()
+
+
+def _check_session_stop(session: pytest.Session) -> None:
+    if session.shouldfail:
+        raise session.Failed(session.shouldfail)
+
+    if session.shouldstop:
+        raise session.Interrupted(session.shouldstop)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session: pytest.Session) -> bool | None:
+    config = session.config
+    if config.option.collectonly:
+        return None
+
+    isolated_items: list[tuple[pytest.Item, int]] = []
+    regular_items: list[pytest.Item] = []
+    for item in session.items:
+        unshare_flags = _get_unshare_flags(item)
+        if unshare_flags is None:
+            regular_items.append(item)
+        else:
+            isolated_items.append((item, unshare_flags))
+
+    if not isolated_items:
+        # Use the default loop
+        return None
+
+    if session.testsfailed and not config.option.continue_on_collection_errors:
+        raise session.Interrupted(
+            f"{session.testsfailed} errors during collection",
+        )
+
+    # Isolated tests run first while no fixtures are set up
+    # in the parent so that children set up and tear down their own.
+    jobs = config.option.lxns_jobs or cpu_count() or 1
+    _run_isolated_items(session, isolated_items, jobs)
+    _check_session_stop(session)
+
+    for index, item in enumerate(regular_items):
+        next_index = index + 1
+        next_item = (
+            regular_items[next_index] if next_index < len(regular_items) else None
+        )
+        item.config.hook.pytest_runtest_protocol(item=item, nextitem=next_item)
+        _check_session_stop(session)
+
+    return True
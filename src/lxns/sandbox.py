@@ -0,0 +1,356 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Declarative sandbox set up in a single child process.
+
+The list of actions is computed by the parent before forking. The child
+applies all of them, reports the timing of each step over a pipe and
+executes the program. The pipe is closed on exec which is the only
+point the parent waits for.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import partial
+from io import BytesIO
+from os import O_CLOEXEC, WNOHANG
+from os import _exit as os_exit
+from os import chdir
+from os import close as close_fd
+from os import execvp, execvpe, fork, getgid, getuid, pidfd_open, pipe2
+from os import read as read_fd
+from os import waitpid, waitstatus_to_exitcode
+from os import write as write_fd
+from pickle import Unpickler
+from pickle import dumps as pickle_dumps
+from signal import SIGKILL, pidfd_send_signal
+from socket import sethostname
+from time import perf_counter_ns
+from typing import TYPE_CHECKING
+
+from .mount import ClonedTree
+from .namespaces import current_namespaces
+from .net import setup_loopback
+from .os import (
+    CLONE_NEWCGROUP,
+    CLONE_NEWIPC,
+    CLONE_NEWNET,
+    CLONE_NEWNS,
+    CLONE_NEWPID,
+    CLONE_NEWTIME,
+    CLONE_NEWUSER,
+    CLONE_NEWUTS,
+    unshare,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from typing import Any
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[write_fd(fd, view) :]
+
+
+def _write_file(path: str, data: str) -> None:
+    with open(path, mode="w") as f:
+        f.write(data)
+
+
+def _unshare(flags: int) -> None:
+    unshare(flags)
+    current_namespaces.invalidate(flags)
+
+
+def _bind_mount(source: str, target: str) -> None:
+    with ClonedTree(source) as tree:
+        tree.mount(target)
+
+
+def _fork_pid_namespace_init(report_fd: int) -> None:
+    # Only children are placed in the new pid namespace.
+    # Forked child continues applying the actions while
+    # the parent waits for it and exits with its exit code.
+    pid = fork()
+    if pid == 0:
+        return
+
+    close_fd(report_fd)
+    _, status = waitpid(pid, 0)
+    exit_code = waitstatus_to_exitcode(status)
+    # Same as the shells report processes killed by a signal
+    os_exit(exit_code if exit_code >= 0 else 128 - exit_code)
+
+
+class SandboxProcess:
+    def __init__(self, pid: int, timings: dict[str, int]):
+        """Process running inside the sandbox.
+
+        Use :py:meth:`SandboxSpec.spawn` to create it.
+
+        If the sandbox has a new pid namespace the process is
+        the parent of the program which exits with the exit code
+        of the program.
+        """
+        self.pid = pid
+        self.timings = timings
+        self.returncode: int | None = None
+        self._pidfd: int | None = pidfd_open(pid)
+
+    def fileno(self) -> int:
+        """Return pidfd of the process.
+
+        Pidfd becomes readable once the process exits.
+
+        :raises ValueError: Process was already reaped.
+        """
+        pidfd = self._pidfd
+        if pidfd is None:
+            raise ValueError("Process was already reaped.")
+
+        return pidfd
+
+    def poll(self) -> int | None:
+        """Reap the process if it exited.
+
+        :return: Exit code or ``None`` if the process is still running.
+        """
+        if self.returncode is None:
+            self._reap(WNOHANG)
+
+        return self.returncode
+
+    def wait(self) -> int:
+        """Wait for the process to exit.
+
+        :return: Exit code of the process. Negative if killed by a signal.
+        """
+        if self.returncode is None:
+            self._reap(0)
+
+        assert self.returncode is not None
+        return self.returncode
+
+    def _reap(self, options: int) -> None:
+        pid, status = waitpid(self.pid, options)
+        if pid == 0:
+            return
+
+        self.returncode = waitstatus_to_exitcode(status)
+        if self._pidfd is not None:
+            close_fd(self._pidfd)
+            self._pidfd = None
+
+    def kill(self) -> None:
+        """Kill the process and reap it.
+
+        Does nothing if the process already exited.
+        """
+        if self._pidfd is None:
+            return
+
+        pidfd_send_signal(self._pidfd, SIGKILL)
+        self._reap(0)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} pid={self.pid} "
+            f"returncode={self.returncode}>"
+        )
+
+
+@dataclass
+class SandboxSpec:
+    """Description of the sandbox to run a program in.
+
+    New namespaces are created in a single ``unshare`` call. The user
+    namespace maps are written by the child itself which means without
+    privileges only the current user and group can be mapped.
+
+    :param user: Create new user namespace.
+    :param mount: Create new mount namespace.
+    :param network: Create new network namespace and bring loopback up.
+    :param pid: Create new pid namespace. Program runs as its pid 1.
+    :param ipc: Create new IPC namespace.
+    :param uts: Create new UTS namespace.
+    :param cgroup: Create new cgroup namespace.
+    :param time: Create new time namespace.
+    :param uid_map: Content of the ``uid_map`` file. ``None`` maps
+        the current user to root.
+    :param gid_map: Content of the ``gid_map`` file. ``None`` maps
+        the current group to root.
+    :param hostname: Hostname to set. Requires new UTS namespace.
+    :param bind_mounts: Pairs of source and target paths to bind mount.
+        Requires new mount namespace.
+    :param cwd: Working directory to change to before executing.
+    :param env: Environment of the program. ``None`` inherits
+        the environment of the caller.
+    """
+
+    user: bool = True
+    mount: bool = True
+    network: bool = False
+    pid: bool = False
+    ipc: bool = False
+    uts: bool = False
+    cgroup: bool = False
+    time: bool = False
+    uid_map: str | None = None
+    gid_map: str | None = None
+    hostname: str | None = None
+    bind_mounts: Sequence[tuple[str, str]] = ()
+    cwd: str | None = None
+    env: dict[str, str] | None = None
+
+    def unshare_flags(self) -> int:
+        """Return ``CLONE_NEW*`` flags of the namespaces to create."""
+        flags = 0
+        for enabled, flag in (
+            (self.user, CLONE_NEWUSER),
+            (self.mount, CLONE_NEWNS),
+            (self.network, CLONE_NEWNET),
+            (self.pid, CLONE_NEWPID),
+            (self.ipc, CLONE_NEWIPC),
+            (self.uts, CLONE_NEWUTS),
+            (self.cgroup, CLONE_NEWCGROUP),
+            (self.time, CLONE_NEWTIME),
+        ):
+            if enabled:
+                flags |= flag
+
+        return flags
+
+    def _actions(self, report_fd: int) -> list[tuple[str, Callable[[], Any]]]:
+        actions: list[tuple[str, Callable[[], Any]]] = []
+
+        flags = self.unshare_flags()
+        if flags:
+            actions.append(("unshare", partial(_unshare, flags)))
+
+        if self.user:
+            uid_map = self.uid_map
+            if uid_map is None:
+                uid_map = f"0 {getuid()} 1"
+
+            gid_map = self.gid_map
+            if gid_map is None:
+                gid_map = f"0 {getgid()} 1"
+                # Unprivileged process can only map its group
+                # after denying setgroups.
+                actions.append(
+                    ("setgroups", partial(_write_file, "/proc/self/setgroups", "deny"))
+                )
+
+            actions.extend(
+                (
+                    ("uid_map", partial(_write_file, "/proc/self/uid_map", uid_map)),
+                    ("gid_map", partial(_write_file, "/proc/self/gid_map", gid_map)),
+                )
+            )
+
+        if self.pid:
+            actions.append(
+                ("fork_pid_init", partial(_fork_pid_namespace_init, report_fd))
+            )
+
+        if self.hostname is not None:
+            actions.append(("hostname", partial(sethostname, self.hostname)))
+
+        for source, target in self.bind_mounts:
+            actions.append(
+                (f"mount:{target}", partial(_bind_mount, str(source), str(target)))
+            )
+
+        if self.network:
+            actions.append(("loopback", setup_loopback))
+
+        if self.cwd is not None:
+            actions.append(("chdir", partial(chdir, self.cwd)))
+
+        return actions
+
+    def spawn(self, argv: Sequence[str]) -> SandboxProcess:
+        """Run the program inside the new sandbox.
+
+        Returns once the program was executed.
+
+        :param argv: Program and its arguments. ``PATH`` is searched
+            for the program.
+        :return: Sandbox process with the timing of each step in
+            nanoseconds. ``fork`` is the time to fork the child
+            and ``total`` is the time until the program was executed.
+        :raises OSError: Setting up the sandbox or executing
+            the program failed.
+        """
+        argv = list(argv)
+        env = self.env
+        start = perf_counter_ns()
+        report_read_fd, report_write_fd = pipe2(O_CLOEXEC)
+        try:
+            actions = self._actions(report_write_fd)
+            pid = fork()
+            if pid == 0:
+                _run_actions(actions, report_write_fd, argv, env)
+
+            fork_ns = perf_counter_ns() - start
+            close_fd(report_write_fd)
+            report_write_fd = -1
+
+            chunks: list[bytes] = []
+            while chunk := read_fd(report_read_fd, READ_CHUNK_SIZE):
+                chunks.append(chunk)
+        finally:
+            close_fd(report_read_fd)
+            if report_write_fd >= 0:
+                close_fd(report_write_fd)
+
+        process = SandboxProcess(pid, {"fork": fork_ns})
+        unpickler = Unpickler(BytesIO(b"".join(chunks)))
+        error: BaseException | None = None
+        try:
+            # Child reports the timings before exec and
+            # reports again if exec has failed.
+            while True:
+                timings, error = unpickler.load()
+        except EOFError:
+            ...
+
+        if error is not None or not chunks:
+            process.wait()
+            raise error or ChildProcessError("Sandbox child exited without report.")
+
+        process.timings.update(timings)
+        process.timings["total"] = perf_counter_ns() - start
+        return process
+
+
+def _run_actions(
+    actions: list[tuple[str, Callable[[], Any]]],
+    report_fd: int,
+    argv: list[str],
+    env: dict[str, str] | None,
+) -> None:
+    timings: dict[str, int] = {}
+    try:
+        try:
+            for name, action in actions:
+                start = perf_counter_ns()
+                action()
+                timings[name] = perf_counter_ns() - start
+
+            _write_all(report_fd, pickle_dumps((timings, None)))
+            if env is None:
+                execvp(argv[0], argv)
+            else:
+                execvpe(argv[0], argv, env)
+        except BaseException as e:
+            _write_all(report_fd, pickle_dumps((timings, e)))
+    finally:
+        os_exit(127)
+
+
+__all__ = ("SandboxSpec", "SandboxProcess")
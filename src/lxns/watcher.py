@@ -0,0 +1,316 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Namespaces liveness tracking.
+
+Member processes of the watched namespaces are tracked with pidfds
+registered in a single epoll instance. Once the last member exits
+the namespace is reported as empty.
+"""
+from __future__ import annotations
+
+from asyncio import get_running_loop
+from os import close as close_fd
+from os import listdir, pidfd_open, stat
+from selectors import EVENT_READ, EpollSelector
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop, Future
+    from collections.abc import Callable, Iterable
+    from typing import Any
+
+    from .namespaces import BaseNamespace
+
+
+class WatchedNamespace:
+    def __init__(
+        self,
+        namespace: BaseNamespace,
+        ns_id: int,
+        auto_close: bool,
+    ):
+        """Namespace watched by the :py:class:`NamespaceWatcher`.
+
+        Use :py:meth:`NamespaceWatcher.watch` to create it.
+        """
+        self.namespace = namespace
+        self.ns_id = ns_id
+        self.auto_close = auto_close
+        self.pidfds: dict[int, int] = {}
+        self.callbacks: list[Callable[[WatchedNamespace], Any]] = []
+        self.is_empty = False
+
+    @property
+    def pids(self) -> set[int]:
+        """Process ids of the tracked live member processes."""
+        return set(self.pidfds)
+
+    def add_callback(self, callback: Callable[[WatchedNamespace], Any]) -> None:
+        """Add function to call once the namespace becomes empty.
+
+        Called immediately if the namespace is already empty.
+        """
+        if self.is_empty:
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} {self.namespace!r} "
+            f"pids={sorted(self.pidfds)}>"
+        )
+
+
+class NamespaceWatcher:
+    def __init__(self, proc_path: str = "/proc", rescan_on_exit: bool = True):
+        """Watch namespaces until their member processes exit.
+
+        Member processes are tracked with pidfds. All pidfds are registered
+        in a single epoll instance which file descriptor can be polled
+        with :py:meth:`fileno` or used with asyncio event loop
+        by :py:meth:`attach_to_loop`.
+
+        Processes that join the namespace after it was added are not
+        tracked unless added with :py:meth:`add_pids`. By default
+        ``/proc`` is scanned for the remaining members when the last
+        tracked member exits.
+
+        :param str proc_path: Path to the mounted procfs.
+        :param bool rescan_on_exit: Scan ``/proc`` for members of the
+            namespace once all tracked members exited.
+        """
+        self._proc_path = proc_path
+        self._rescan_on_exit = rescan_on_exit
+        self._selector = EpollSelector()
+        self._watched: dict[int, WatchedNamespace] = {}
+        self._loop: AbstractEventLoop | None = None
+
+    def fileno(self) -> int:
+        """Return epoll file descriptor that becomes readable once
+        a tracked process exits."""
+        return self._selector.fileno()
+
+    def _find_members(self, namespace: BaseNamespace, ns_id: int) -> list[int]:
+        members: list[int] = []
+        ns_name = namespace.NAMESPACE_PROC_NAME
+        for pid in listdir(self._proc_path):
+            if not pid.isdigit():
+                continue
+
+            try:
+                if stat(f"{self._proc_path}/{pid}/ns/{ns_name}").st_ino == ns_id:
+                    members.append(int(pid))
+            except OSError:
+                # Process exited or not accessible
+                continue
+
+        return members
+
+    def _track_pids(
+        self, watched: WatchedNamespace, pids: Iterable[int], strict: bool = True
+    ) -> None:
+        ns_name = watched.namespace.NAMESPACE_PROC_NAME
+        for pid in pids:
+            if pid in watched.pidfds:
+                continue
+
+            try:
+                pidfd = pidfd_open(pid)
+            except ProcessLookupError:
+                continue
+
+            try:
+                # Checked after opening the pidfd so that the pid
+                # could not have been reused by another process.
+                ns_id = stat(f"{self._proc_path}/{pid}/ns/{ns_name}").st_ino
+            except OSError:
+                close_fd(pidfd)
+                continue
+
+            if ns_id != watched.ns_id:
+                close_fd(pidfd)
+                if not strict:
+                    # Process found by the scan exited and the pid
+                    # was reused by another process.
+                    continue
+
+                raise ValueError(f"Process {pid} is not a member of the namespace.")
+
+            watched.pidfds[pid] = pidfd
+            self._selector.register(pidfd, EVENT_READ, (watched, pid))
+
+    def watch(
+        self,
+        namespace: BaseNamespace,
+        pids: Iterable[int] | None = None,
+        callback: Callable[[WatchedNamespace], Any] | None = None,
+        auto_close: bool = False,
+    ) -> WatchedNamespace:
+        """Start watching the namespace.
+
+        If the namespace has no members the callback is called
+        immediately.
+
+        :param namespace: Namespace to watch.
+        :param pids: Member processes of the namespace. ``None`` scans
+            ``/proc`` for the processes in the namespace.
+        :param callback: Function to call once the namespace is empty.
+        :param bool auto_close: Close the namespace once it is empty.
+            Watcher takes the ownership of the namespace.
+        :raises KeyError: Namespace is already watched.
+        :raises ValueError: Passed process is not a member
+            of the namespace.
+        """
+        ns_id = namespace.ns_id
+        if ns_id in self._watched:
+            raise KeyError(f"Namespace {namespace!r} is already watched.")
+
+        watched = WatchedNamespace(namespace, ns_id, auto_close)
+        if callback is not None:
+            watched.callbacks.append(callback)
+
+        # Only the processes passed by the caller must be members
+        strict = pids is not None
+        if pids is None:
+            pids = self._find_members(namespace, ns_id)
+
+        self._watched[ns_id] = watched
+        try:
+            self._track_pids(watched, pids, strict)
+        except BaseException:
+            self._close_watched(watched)
+            raise
+
+        if not watched.pidfds:
+            self._namespace_emptied(watched)
+
+        return watched
+
+    def add_pids(self, watched: WatchedNamespace, pids: Iterable[int]) -> None:
+        """Track new member processes of a watched namespace.
+
+        :raises ValueError: Process is not a member of the namespace.
+        """
+        self._track_pids(watched, pids)
+
+    def unwatch(self, watched: WatchedNamespace) -> None:
+        """Stop watching the namespace.
+
+        Namespace is not closed and callbacks are not called.
+        """
+        self._close_watched(watched)
+
+    def _close_watched(self, watched: WatchedNamespace) -> None:
+        self._watched.pop(watched.ns_id, None)
+        for pidfd in watched.pidfds.values():
+            self._selector.unregister(pidfd)
+            close_fd(pidfd)
+
+        watched.pidfds.clear()
+
+    def _namespace_emptied(self, watched: WatchedNamespace) -> None:
+        self._close_watched(watched)
+        watched.is_empty = True
+        if watched.auto_close:
+            watched.namespace.close()
+
+        callbacks = watched.callbacks
+        watched.callbacks = []
+        for callback in callbacks:
+            callback(watched)
+
+    def process_events(self, timeout: float | None = 0) -> list[WatchedNamespace]:
+        """Process exits of the tracked processes.
+
+        :param float timeout: Maximum time to wait for events.
+            ``None`` waits indefinitely.
+        :return: Namespaces that became empty.
+        """
+        emptied: list[WatchedNamespace] = []
+        for key, _ in self._selector.select(timeout):
+            watched, pid = key.data
+            pidfd = watched.pidfds.pop(pid, None)
+            if pidfd is None:
+                continue
+
+            self._selector.unregister(pidfd)
+            close_fd(pidfd)
+            if watched.pidfds:
+                continue
+
+            if self._rescan_on_exit:
+                self._track_pids(
+                    watched,
+                    self._find_members(watched.namespace, watched.ns_id),
+                    strict=False,
+                )
+                if watched.pidfds:
+                    continue
+
+            emptied.append(watched)
+
+        for watched in emptied:
+            self._namespace_emptied(watched)
+
+        return emptied
+
+    def attach_to_loop(self, loop: AbstractEventLoop | None = None) -> None:
+        """Process events from the asyncio event loop.
+
+        :param loop: Event loop. ``None`` uses the running loop.
+        """
+        if loop is None:
+            loop = get_running_loop()
+
+        self.detach_from_loop()
+        loop.add_reader(self.fileno(), self.process_events)
+        self._loop = loop
+
+    def detach_from_loop(self) -> None:
+        """Stop processing events from the asyncio event loop."""
+        if self._loop is not None:
+            self._loop.remove_reader(self.fileno())
+            self._loop = None
+
+    async def wait_empty(self, watched: WatchedNamespace) -> None:
+        """Wait until the namespace becomes empty.
+
+        Watcher has to be attached to the running event loop
+        with :py:meth:`attach_to_loop`.
+        """
+        if watched.is_empty:
+            return
+
+        empty_future: Future[None] = get_running_loop().create_future()
+
+        def on_empty(_: WatchedNamespace) -> None:
+            if not empty_future.done():
+                empty_future.set_result(None)
+
+        watched.add_callback(on_empty)
+        try:
+            await empty_future
+        finally:
+            if on_empty in watched.callbacks:
+                watched.callbacks.remove(on_empty)
+
+    def close(self) -> None:
+        """Stop watching all namespaces and close the pidfds.
+
+        Namespaces are not closed.
+        """
+        self.detach_from_loop()
+        for watched in list(self._watched.values()):
+            self._close_watched(watched)
+
+        self._selector.close()
+
+    def __enter__(self) -> NamespaceWatcher:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+__all__ = ("NamespaceWatcher", "WatchedNamespace")
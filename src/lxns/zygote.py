@@ -0,0 +1,506 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+"""Fork server for namespace children.
+
+Zygote is a small Python process started once with the chosen modules
+already imported and optionally joined to the base namespaces. Clients
+request children over a Unix socket. Each child is forked from the zygote,
+joins or creates the requested namespaces and runs a single function.
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from importlib import import_module
+from os import O_CLOEXEC, O_RDONLY
+from os import _exit as os_exit
+from os import close as close_fd
+from os import fork
+from os import open as open_fd
+from os import pidfd_open, pipe2
+from os import read as read_fd
+from os import strerror, waitpid, waitstatus_to_exitcode
+from os import write as write_fd
+from pathlib import Path
+from pickle import dumps, loads
+from selectors import EVENT_READ, DefaultSelector
+from socket import (
+    AF_UNIX,
+    SHUT_WR,
+    SOCK_CLOEXEC,
+    SOCK_SEQPACKET,
+    SOCK_STREAM,
+    recv_fds,
+    send_fds,
+    socket,
+    socketpair,
+)
+from struct import Struct
+from subprocess import Popen
+from sys import executable
+from traceback import print_exc
+from typing import TYPE_CHECKING
+
+from .namespaces import NamespaceSet, current_namespaces, namespace_from_fd
+from .os import CLONE_NEWPID, unshare
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from typing import Any
+
+    from .namespaces import BaseNamespace
+
+
+_REQUEST = Struct("=I")
+_REPLY = Struct("=i")
+
+MAX_REQUEST_FDS = 16
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _recv_all(sock: socket) -> bytes:
+    data = bytearray()
+    while True:
+        chunk = sock.recv(READ_CHUNK_SIZE)
+        if not chunk:
+            return bytes(data)
+
+        data.extend(chunk)
+
+
+class _ZygoteChildProcess:
+    def __init__(self, pid: int, pidfd: int):
+        self.pid = pid
+        self.pidfd = pidfd
+
+
+class ZygoteServer:
+    def __init__(
+        self,
+        socket_path: str | Path,
+        preload: Iterable[str] = (),
+        namespaces: Iterable[BaseNamespace] = (),
+    ):
+        """Create zygote listening on the given Unix socket path.
+
+        Access to the zygote is controlled by the permissions
+        of the socket file.
+
+        :param socket_path: Path to bind the listening socket to.
+        :param preload: Names of the modules to import. Children
+            forked from the zygote start with these modules imported.
+        :param namespaces: Namespaces the zygote joins. All children
+            start in these namespaces. Zygote takes the ownership of
+            the namespaces and closes them after joining.
+        """
+        for module_name in preload:
+            import_module(module_name)
+
+        with NamespaceSet(namespaces) as base_namespaces:
+            base_namespaces.setns()
+
+        self._selector = DefaultSelector()
+        self._listen_socket = socket(AF_UNIX, SOCK_SEQPACKET | SOCK_CLOEXEC)
+        try:
+            self._listen_socket.bind(str(socket_path))
+            self._listen_socket.listen()
+        except BaseException:
+            self._listen_socket.close()
+            raise
+
+        self._selector.register(self._listen_socket, EVENT_READ)
+
+    def _close_in_child(self) -> None:
+        for key in self._selector.get_map().values():
+            if isinstance(key.fileobj, socket):
+                key.fileobj.close()
+            elif isinstance(key.data, _ZygoteChildProcess):
+                close_fd(key.data.pidfd)
+
+        self._selector.close()
+
+    def _run_child(
+        self,
+        task_socket: socket,
+        namespaces: NamespaceSet,
+        unshare_flags: int,
+    ) -> None:
+        exit_code = 0
+        try:
+            try:
+                self._close_in_child()
+                # Read the whole request first as closing the socket
+                # with unread data resets the connection.
+                payload = _recv_all(task_socket)
+                namespaces.setns()
+                namespaces.close()
+                if unshare_flags:
+                    unshare(unshare_flags)
+                    current_namespaces.invalidate(unshare_flags)
+
+                if unshare_flags & CLONE_NEWPID:
+                    # Only children are placed in the new pid namespace
+                    pid = fork()
+                    if pid != 0:
+                        _, status = waitpid(pid, 0)
+                        exit_code = waitstatus_to_exitcode(status)
+                        return
+
+                function, args = loads(payload)
+                reply = dumps((True, function(*args)))
+            except Exception as e:
+                reply = dumps((False, e))
+
+            task_socket.sendall(reply)
+        except BaseException:
+            exit_code = 1
+            print_exc()
+        finally:
+            os_exit(exit_code)
+
+    def _spawn_child(
+        self,
+        task_socket: socket,
+        namespaces: NamespaceSet,
+        unshare_flags: int,
+    ) -> int:
+        pid = fork()
+        if pid == 0:
+            self._run_child(task_socket, namespaces, unshare_flags)
+
+        try:
+            pidfd = pidfd_open(pid)
+        except BaseException:
+            waitpid(pid, 0)
+            raise
+
+        self._selector.register(pidfd, EVENT_READ, _ZygoteChildProcess(pid, pidfd))
+        return pid
+
+    def _handle_request(self, client: socket) -> bool:
+        request, fds, _, _ = recv_fds(client, _REQUEST.size, MAX_REQUEST_FDS)
+        if not request:
+            for fd in fds:
+                close_fd(fd)
+
+            return False
+
+        if len(request) != _REQUEST.size or not fds:
+            for fd in fds:
+                close_fd(fd)
+
+            raise ValueError("Malformed request.")
+
+        (unshare_flags,) = _REQUEST.unpack(request)
+        task_socket = socket(fileno=fds[0])
+        namespace_list: list[BaseNamespace] = []
+        try:
+            for fd in fds[1:]:
+                namespace_list.append(namespace_from_fd(fd))
+
+            namespaces = NamespaceSet(namespace_list)
+        except BaseException:
+            task_socket.close()
+            for ns in namespace_list:
+                ns.close()
+
+            for fd in fds[1 + len(namespace_list) :]:
+                close_fd(fd)
+
+            raise
+
+        try:
+            pid = self._spawn_child(task_socket, namespaces, unshare_flags)
+        except OSError as e:
+            pid = -(e.errno or 0)
+        finally:
+            task_socket.close()
+            namespaces.close()
+
+        client.send(_REPLY.pack(pid))
+        return True
+
+    def _close_client(self, client: socket) -> None:
+        self._selector.unregister(client)
+        client.close()
+
+    def process_events(self, timeout: float | None = None) -> None:
+        """Process incoming requests and exited children.
+
+        :param float timeout: Maximum time to wait for events.
+            ``None`` waits indefinitely.
+        """
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._listen_socket:
+                client, _ = self._listen_socket.accept()
+                self._selector.register(client, EVENT_READ)
+            elif isinstance(key.data, _ZygoteChildProcess):
+                child = key.data
+                self._selector.unregister(child.pidfd)
+                close_fd(child.pidfd)
+                waitpid(child.pid, 0)
+            else:
+                assert isinstance(key.fileobj, socket)
+                client = key.fileobj
+                try:
+                    if not self._handle_request(client):
+                        self._close_client(client)
+                except (OSError, ValueError):
+                    self._close_client(client)
+
+    def serve_forever(self) -> None:
+        """Process events until interrupted."""
+        while True:
+            self.process_events()
+
+    def close(self) -> None:
+        """Close the listening socket and client connections.
+
+        Running children are not waited for.
+        """
+        for key in list(self._selector.get_map().values()):
+            if isinstance(key.fileobj, socket):
+                key.fileobj.close()
+            elif isinstance(key.data, _ZygoteChildProcess):
+                close_fd(key.data.pidfd)
+
+        self._selector.close()
+
+    def __enter__(self) -> ZygoteServer:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+class ZygoteChild:
+    def __init__(self, pid: int, task_socket: socket):
+        """Child process forked by the zygote.
+
+        Use :py:meth:`ZygoteClient.spawn` to create children.
+        """
+        self.pid = pid
+        self._task_socket = task_socket
+
+    def result(self) -> Any:
+        """Wait for the child to finish and return the function result.
+
+        Can only be called once.
+
+        :raises ChildProcessError: Child exited without returning a result.
+        :raises Exception: Exception raised by the function.
+        """
+        try:
+            data = _recv_all(self._task_socket)
+        except ConnectionResetError:
+            data = b""
+        finally:
+            self.close()
+
+        if not data:
+            raise ChildProcessError(f"Zygote child {self.pid} exited without result.")
+
+        success, value = loads(data)
+        if not success:
+            raise value
+
+        return value
+
+    def fileno(self) -> int:
+        """File descriptor that becomes readable once the result is sent.
+
+        Can be used with ``selectors`` or ``asyncio`` to wait for
+        multiple children.
+        """
+        return self._task_socket.fileno()
+
+    def close(self) -> None:
+        self._task_socket.close()
+
+    def __enter__(self) -> ZygoteChild:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} pid={self.pid}>"
+
+
+class ZygoteClient:
+    def __init__(self, socket_path: str | Path):
+        """Connect to the zygote."""
+        self._socket = socket(AF_UNIX, SOCK_SEQPACKET | SOCK_CLOEXEC)
+        try:
+            self._socket.connect(str(socket_path))
+        except BaseException:
+            self._socket.close()
+            raise
+
+    def spawn(
+        self,
+        function: Callable[..., Any],
+        *args: Any,
+        namespaces: Iterable[BaseNamespace] = (),
+        unshare_flags: int = 0,
+    ) -> ZygoteChild:
+        """Fork a child from the zygote to run the function.
+
+        Child first joins the passed namespaces and then unshares
+        the namespaces in the ``unshare_flags``. If a new pid namespace
+        is created the function runs in a child of the forked child.
+
+        Function and arguments are pickled. Function has to be
+        importable by the zygote, for example, be defined in one
+        of the preloaded modules.
+
+        :param function: Function to call in the child.
+        :param args: Arguments to pass to the function.
+        :param namespaces: Namespaces to join.
+        :param int unshare_flags: Bitmask of ``CLONE_NEW*`` flags.
+        :raises OSError: Zygote failed to fork the child.
+        :raises ConnectionError: Zygote closed the connection.
+        """
+        payload = dumps((function, args))
+        task_socket, child_task_socket = socketpair(AF_UNIX, SOCK_STREAM | SOCK_CLOEXEC)
+        try:
+            try:
+                send_fds(
+                    self._socket,
+                    (_REQUEST.pack(unshare_flags),),
+                    [child_task_socket.fileno(), *(ns.fileno() for ns in namespaces)],
+                )
+            finally:
+                child_task_socket.close()
+
+            reply = self._socket.recv(_REPLY.size)
+            if len(reply) != _REPLY.size:
+                raise ConnectionError("Zygote closed the connection.")
+
+            (pid,) = _REPLY.unpack(reply)
+            if pid < 0:
+                raise OSError(-pid, strerror(-pid))
+
+            try:
+                task_socket.sendall(payload)
+                task_socket.shutdown(SHUT_WR)
+            except BrokenPipeError:
+                # Child failed before reading the function
+                # and the error will be returned as a result.
+                ...
+        except BaseException:
+            task_socket.close()
+            raise
+
+        return ZygoteChild(pid, task_socket)
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> ZygoteClient:
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+
+def start_zygote(
+    socket_path: str | Path,
+    preload: Iterable[str] = (),
+    namespaces: Iterable[BaseNamespace] = (),
+) -> Popen[bytes]:
+    """Start zygote in a new Python interpreter process.
+
+    Returns once the zygote is ready to accept connections.
+    Terminate the returned process to stop the zygote.
+
+    :param socket_path: Path to bind the listening socket to.
+    :param preload: Names of the modules to import in the zygote.
+    :param namespaces: Namespaces the zygote joins.
+    :raises ChildProcessError: Zygote exited before becoming ready.
+    """
+    command = [executable, "-m", "lxns.zygote", str(socket_path)]
+    for module_name in preload:
+        command.extend(("--preload", module_name))
+
+    ns_fds = [ns.fileno() for ns in namespaces]
+    for fd in ns_fds:
+        command.extend(("--join", f"/proc/self/fd/{fd}"))
+
+    ready_read, ready_write = pipe2(O_CLOEXEC)
+    try:
+        command.extend(("--ready-fd", str(ready_write)))
+        process = Popen(command, pass_fds=(*ns_fds, ready_write))
+        close_fd(ready_write)
+        ready_write = -1
+        if not read_fd(ready_read, 1):
+            raise ChildProcessError(
+                f"Zygote exited with code {process.wait()} before becoming ready."
+            )
+    finally:
+        close_fd(ready_read)
+        if ready_write >= 0:
+            close_fd(ready_write)
+
+    return process
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(
+        prog="python -m lxns.zygote",
+        description="Fork children in namespaces on requests over Unix socket.",
+    )
+    arg_parser.add_argument("socket_path", type=Path)
+    arg_parser.add_argument(
+        "--preload",
+        metavar="MODULE",
+        action="append",
+        default=[],
+        help="Import module before serving. Can be passed multiple times.",
+    )
+    arg_parser.add_argument(
+        "--join",
+        metavar="PATH",
+        action="append",
+        default=[],
+        help="Join namespace from the path. Can be passed multiple times.",
+    )
+    arg_parser.add_argument(
+        "--ready-fd",
+        type=int,
+        help="Write a byte to file descriptor once ready and close it.",
+    )
+    args = arg_parser.parse_args()
+
+    namespaces: list[BaseNamespace] = []
+    try:
+        for path in args.join:
+            namespaces.append(namespace_from_fd(open_fd(path, O_RDONLY | O_CLOEXEC)))
+    except BaseException:
+        for ns in namespaces:
+            ns.close()
+
+        raise
+
+    with ZygoteServer(args.socket_path, args.preload, namespaces) as zygote:
+        if args.ready_fd is not None:
+            write_fd(args.ready_fd, b"\0")
+            close_fd(args.ready_fd)
+
+        try:
+            zygote.serve_forever()
+        except KeyboardInterrupt:
+            ...
+        finally:
+            args.socket_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = (
+    "ZygoteServer",
+    "ZygoteClient",
+    "ZygoteChild",
+    "start_zygote",
+)
@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from asyncio import gather
+from unittest import IsolatedAsyncioTestCase
+
+from lxns.asyncio import run_in_namespace, spawn_in_namespace
+from lxns.namespaces import UserNamespace
+from lxns.os import CLONE_NEWUSER
+
+
+def _raise_error() -> None:
+    raise LookupError("test")
+
+
+class TestLxnsAsyncio(IsolatedAsyncioTestCase):
+    async def test_run_in_namespace(self) -> None:
+        current_user_ns_id = UserNamespace.get_current_ns_id()
+
+        self.assertEqual(
+            await run_in_namespace((), UserNamespace.get_current_ns_id),
+            current_user_ns_id,
+        )
+
+        new_ns_ids = await gather(
+            *(
+                run_in_namespace(
+                    (), UserNamespace.get_current_ns_id, unshare_flags=CLONE_NEWUSER
+                )
+                for _ in range(20)
+            )
+        )
+        self.assertNotIn(current_user_ns_id, new_ns_ids)
+        self.assertEqual(len(set(new_ns_ids)), 20)
+
+        with self.assertRaisesRegex(LookupError, "test"):
+            await run_in_namespace((), _raise_error)
+
+    async def test_run_in_existing_namespace(self) -> None:
+        sleep_child = await spawn_in_namespace(
+            ("sleep", "10"), unshare_flags=CLONE_NEWUSER
+        )
+        try:
+            with UserNamespace.from_pid(sleep_child.pid) as user_ns:
+                self.assertNotEqual(user_ns.ns_id, UserNamespace.get_current_ns_id())
+                self.assertEqual(
+                    await run_in_namespace((user_ns,), UserNamespace.get_current_ns_id),
+                    user_ns.ns_id,
+                )
+        finally:
+            sleep_child.kill()
+
+    async def test_spawn_in_namespace(self) -> None:
+        children = await gather(
+            spawn_in_namespace(("true",), unshare_flags=CLONE_NEWUSER),
+            spawn_in_namespace(("false",)),
+        )
+        self.assertEqual([await child.wait() for child in children], [0, 1])
+
+        with self.assertRaises(FileNotFoundError):
+            await spawn_in_namespace(("/non-existent-program",))
@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from errno import EINVAL, EOPNOTSUPP
+from pathlib import Path
+from subprocess import Popen
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import monotonic
+from unittest import TestCase
+from unittest.mock import patch
+
+from lxns.broker import BrokerClient, NamespaceBroker
+from lxns.mount import ClonedTree
+from lxns.namespaces import NetworkNamespace, UserNamespace, unshare_namespaces
+from lxns.os import OPEN_TREE_CLOEXEC, OPEN_TREE_CLONE, open_tree
+
+
+def get_trees_test(tmpdir: Path, detached_clone: bool, with_path: bool) -> list[str]:
+    unshare_namespaces(user=True, mount=True)
+    source_file = tmpdir / "source"
+    source_file.write_text("source")
+    targets = [tmpdir / "target_a", tmpdir / "target_b"]
+    for target in targets:
+        target.write_text("target")
+
+    if with_path:
+        tree = ClonedTree(source_file)
+    else:
+        tree = ClonedTree.from_fd(
+            open_tree(path=str(source_file), flags=OPEN_TREE_CLONE | OPEN_TREE_CLOEXEC)
+        )
+
+    if detached_clone:
+        try:
+            tree.clone().close()
+        except OSError as e:
+            tree.close()
+            if e.errno == EINVAL:
+                # Detached trees can only be cloned since Linux 6.15
+                return []
+
+            raise
+
+        clone_patch: AbstractContextManager[object] = nullcontext()
+    else:
+        clone_patch = patch.object(
+            ClonedTree, "clone", side_effect=OSError(EINVAL, "Invalid argument")
+        )
+
+    socket_path = tmpdir / "trees.socket"
+    stop_event = Event()
+    results: list[str] = []
+    with NamespaceBroker(socket_path) as broker, Popen(("sleep", "10")) as process:
+        broker.register("sleep", process.pid, (), trees=(tree,))
+
+        def run_broker() -> None:
+            while not stop_event.is_set():
+                broker.process_events(0.05)
+
+        broker_thread = Thread(target=run_broker)
+        with clone_patch:
+            broker_thread.start()
+            try:
+                # Each client gets its own copy of the tree
+                for target in targets:
+                    with BrokerClient(socket_path) as client:
+                        try:
+                            (client_tree,) = client.get_trees("sleep")
+                        except OSError as e:
+                            results.append(f"errno {e.errno}")
+                            continue
+
+                        with client_tree:
+                            client_tree.mount(target)
+
+                        results.append(target.read_text())
+            finally:
+                stop_event.set()
+                broker_thread.join(3)
+                process.kill()
+
+    return results
+
+
+class TestNamespaceBroker(TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = TemporaryDirectory()
+        self.socket_path = Path(self._tmpdir.name) / "broker.socket"
+        self.broker = NamespaceBroker(self.socket_path)
+
+        self._stop_event = Event()
+        self._broker_thread = Thread(target=self._run_broker)
+
+    def _run_broker(self) -> None:
+        while not self._stop_event.is_set():
+            self.broker.process_events(0.05)
+
+    def _start_broker(self) -> None:
+        # Selector is not thread safe. Targets are registered
+        # before the broker thread starts.
+        self._broker_thread.start()
+
+    def tearDown(self) -> None:
+        self._stop_event.set()
+        if self._broker_thread.is_alive():
+            self._broker_thread.join(3)
+
+        self.broker.close()
+        self._tmpdir.cleanup()
+
+    def test_get_namespaces(self) -> None:
+        with Popen(("sleep", "10")) as sleep_process:
+            self.broker.register(
+                "sleep",
+                sleep_process.pid,
+                namespace_classes=(UserNamespace, NetworkNamespace),
+            )
+            self._start_broker()
+
+            with BrokerClient(self.socket_path) as client:
+                for target in ("sleep", sleep_process.pid, str(sleep_process.pid)):
+                    with self.subTest(target=target):
+                        namespaces = client.get_namespaces(target)
+                        try:
+                            self.assertEqual(
+                                [type(ns) for ns in namespaces],
+                                [UserNamespace, NetworkNamespace],
+                            )
+                            self.assertEqual(
+                                namespaces[0].ns_id,
+                                UserNamespace.get_current_ns_id(),
+                            )
+                        finally:
+                            for ns in namespaces:
+                                ns.close()
+
+                self.assertEqual(client.get_trees("sleep"), [])
+
+                with self.assertRaises(KeyError):
+                    client.get_namespaces("unknown")
+
+                sleep_process.kill()
+                sleep_process.wait()
+
+                deadline = monotonic() + 3
+                with self.assertRaises(KeyError):
+                    while monotonic() < deadline:
+                        for ns in client.get_namespaces("sleep"):
+                            ns.close()
+
+    def _get_trees(self, detached_clone: bool, with_path: bool) -> list[str]:
+        # Each test needs a new process to create the user namespace
+        with TemporaryDirectory(dir=self._tmpdir.name) as tmpdir:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                return executor.submit(
+                    get_trees_test, Path(tmpdir), detached_clone, with_path
+                ).result(5)
+
+    def test_get_trees(self) -> None:
+        with self.subTest("Old kernel fallback"):
+            self.assertEqual(self._get_trees(False, True), ["source", "source"])
+
+        with self.subTest("Old kernel without the original path"):
+            self.assertEqual(self._get_trees(False, False), [f"errno {EOPNOTSUPP}"] * 2)
+
+        results = self._get_trees(True, False)
+        if not results:
+            raise self.skipTest("Cloning detached trees requires Linux 6.15")
+
+        self.assertEqual(results, ["source", "source"])
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from lxns.capacity import NamespaceCapacity
+from lxns.namespaces import NetworkNamespace, UserNamespace, unshare_namespaces
+
+
+class TestCapacity(TestCase):
+    def test_limits(self) -> None:
+        with NamespaceCapacity() as capacity:
+            limits = capacity.read_limits()
+
+        self.assertEqual(
+            limits[NetworkNamespace],
+            NetworkNamespace.get_current_limit(),
+        )
+        self.assertEqual(
+            limits[UserNamespace],
+            UserNamespace.get_current_limit(),
+        )
+
+    @staticmethod
+    def count_namespaces_test() -> tuple[int, int, dict[int, int], str]:
+        unshare_namespaces(user=True, network=True)
+        user_ns_id = UserNamespace.get_current_ns_id()
+        network_ns_id = NetworkNamespace.get_current_ns_id()
+
+        with NamespaceCapacity() as capacity:
+            capacity.snapshot()
+            # Second snapshot uses cached owners
+            snapshot = capacity.snapshot()
+
+        return (
+            user_ns_id,
+            network_ns_id,
+            {
+                user_ns_id: counts.get(NetworkNamespace, 0)
+                for user_ns_id, counts in snapshot.counts_by_user_namespace.items()
+            },
+            snapshot.to_prometheus(),
+        )
+
+    def test_count_namespaces(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            user_ns_id, network_ns_id, network_counts, prometheus_text = (
+                executor.submit(self.count_namespaces_test).result(5)
+            )
+
+        self.assertEqual(network_counts[user_ns_id], 1)
+        self.assertIn('lxns_namespaces_limit{type="net"}', prometheus_text)
+        self.assertIn(
+            'lxns_namespaces_by_user_namespace{type="net",'
+            f'user_namespace="{user_ns_id}"}} 1',
+            prometheus_text,
+        )
+
+    def test_usage(self) -> None:
+        with NamespaceCapacity() as capacity:
+            snapshot = capacity.snapshot()
+
+        self.assertGreaterEqual(snapshot.counts[UserNamespace], 1)
+        self.assertGreater(snapshot.usage(UserNamespace), 0)
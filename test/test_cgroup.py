@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from os import getgid, getpid, getuid, listdir
+from shutil import which
+from subprocess import run
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lxns.cgroup import CgroupStatsCollector
+from lxns.namespaces import CgroupNamespace, unshare_namespaces
+
+
+class TestCgroupStatsCollector(TestCase):
+    def setUp(self) -> None:
+        try:
+            self.collector = CgroupStatsCollector()
+        except ValueError:
+            raise self.skipTest("Cgroup v2 is not mounted")
+
+    def tearDown(self) -> None:
+        self.collector.close()
+
+    @staticmethod
+    def namespace_test(mount_point: str) -> tuple[str, set[str]]:
+        uid, gid = getuid(), getgid()
+        unshare_namespaces(user=True, mount=True, cgroup=True)
+        for file_name, content in (
+            ("setgroups", "deny"),
+            ("uid_map", f"0 {uid} 1"),
+            ("gid_map", f"0 {gid} 1"),
+        ):
+            with open(f"/proc/self/{file_name}", mode="w") as f:
+                f.write(content)
+
+        # Cgroup file system mounted in the new cgroup namespace
+        # is rooted at the cgroup of the process.
+        run(("mount", "-t", "cgroup2", "cgroup2", mount_point), check=True)
+        with CgroupNamespace.from_self() as ns:
+            with CgroupStatsCollector(mount_point, namespace=ns) as collector:
+                path = collector.add_pid("self", getpid())
+                return path, set(collector.collect())
+
+    def test_collect(self) -> None:
+        self.collector.add_pid("self", getpid())
+        self.collector.add_path("root", "/")
+
+        with self.assertRaises(KeyError):
+            self.collector.add_path("root", "/")
+
+        self.collector.collect()
+        open_fds = len(listdir("/proc/self/fd"))
+        stats = self.collector.collect()
+        # Files are only opened on the first collection
+        self.assertEqual(len(listdir("/proc/self/fd")), open_fds)
+
+        self.assertEqual(stats.keys(), {"self", "root"})
+        self.assertIn("cpu.stat.usage_usec", stats["self"])
+
+        self.collector.remove("root")
+        self.assertEqual(self.collector.collect().keys(), {"self"})
+
+    def test_namespace(self) -> None:
+        if which("mount") is None:
+            raise self.skipTest("mount command not found")
+
+        with TemporaryDirectory() as mount_point:
+            with ProcessPoolExecutor() as executor:
+                path, targets = executor.submit(
+                    self.namespace_test, mount_point
+                ).result(3)
+
+        self.assertEqual(path, ".")
+        self.assertEqual(targets, {"self"})
+
+    def test_not_cgroup2_mount(self) -> None:
+        with self.assertRaises(ValueError):
+            CgroupStatsCollector("/proc")
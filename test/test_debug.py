@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from unittest import TestCase
+
+from lxns import debug
+from lxns.namespaces import NamespaceSet, NetworkNamespace, UserNamespace
+
+
+class TestDebug(TestCase):
+    def tearDown(self) -> None:
+        debug.disable()
+
+    def test_snapshot_not_enabled(self) -> None:
+        self.assertFalse(debug.is_enabled())
+        with self.assertRaises(RuntimeError):
+            debug.snapshot()
+
+    def test_live_counts(self) -> None:
+        debug.enable()
+        self.assertTrue(debug.is_enabled())
+        first_snapshot = debug.snapshot()
+        self.assertEqual(first_snapshot.live_counts, {})
+
+        user_ns = UserNamespace.from_self()
+        net_namespaces = [NetworkNamespace.from_self() for _ in range(3)]
+        ns_set = NamespaceSet.from_pid("self", (UserNamespace, NetworkNamespace))
+
+        second_snapshot = debug.snapshot()
+        self.assertEqual(
+            second_snapshot.live_counts,
+            {"UserNamespace": 1, "NetworkNamespace": 3, "NamespaceSet": 1},
+        )
+
+        diffs = second_snapshot.compare_to(first_snapshot)
+        self.assertEqual(diffs[0].type_name, "NetworkNamespace")
+        self.assertEqual(diffs[0].count_diff, 3)
+
+        # Views returned by the namespace set and namespaces not owning
+        # the file descriptor are not tracked
+        ns_set.get(UserNamespace)
+        UserNamespace(user_ns.fileno(), closefd=False)
+        self.assertEqual(debug.snapshot().live_counts, second_snapshot.live_counts)
+
+        user_ns.close()
+        ns_set.close()
+        for ns in net_namespaces:
+            ns.close()
+
+        third_snapshot = debug.snapshot()
+        self.assertEqual(third_snapshot.live_counts, {})
+        self.assertEqual(third_snapshot.high_water_marks["NetworkNamespace"], 3)
+        self.assertFalse(third_snapshot.new_handles(first_snapshot))
+
+    def test_created_before_enable(self) -> None:
+        with UserNamespace.from_self():
+            debug.enable()
+
+        self.assertEqual(debug.snapshot().live_counts, {})
+
+    def test_new_handles_tracebacks(self) -> None:
+        debug.enable(record_tracebacks=True)
+        old_snapshot = debug.snapshot()
+
+        with UserNamespace.from_self():
+            new_handles = debug.snapshot().new_handles(old_snapshot)
+
+        self.assertEqual(len(new_handles), 1)
+        type_name, traceback = new_handles[0]
+        self.assertEqual(type_name, "UserNamespace")
+        assert traceback is not None
+        self.assertIn(
+            "test_new_handles_tracebacks", (frame.name for frame in traceback)
+        )
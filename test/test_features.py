@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from ctypes import CDLL, Structure, byref, c_char_p, c_ushort, get_errno
+from errno import EPERM
+from os import close as close_fd
+from os import pidfd_open
+from socket import gethostname, sethostname
+from struct import pack
+from subprocess import Popen
+from unittest import TestCase
+from unittest.mock import patch
+
+from lxns import features
+from lxns.namespaces import (
+    ALL_NAMESPACE_CLASSES,
+    UserNamespace,
+    _run_in_thread,
+    unshare_namespaces,
+)
+from lxns.os import probe_syscall
+
+
+class TestFeatures(TestCase):
+    @staticmethod
+    def setns_pidfd_probe_test() -> tuple[bool, str]:
+        # Process UTS namespace is owned by the new user namespace
+        # so that joining it from the thread would be permitted.
+        unshare_namespaces(user=True, uts=True)
+        sethostname("process")
+
+        def setup() -> None:
+            unshare_namespaces(uts=True)
+            sethostname("thread")
+
+        def probe() -> tuple[bool, str]:
+            features.has_setns_pidfd.cache_clear()
+            return features.has_setns_pidfd(), gethostname()
+
+        return _run_in_thread(setup, probe)
+
+    def test_setns_pidfd_probe(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            available, hostname = executor.submit(self.setns_pidfd_probe_test).result(3)
+
+        self.assertTrue(available)
+        self.assertEqual(hostname, "thread")
+
+    @staticmethod
+    def seccomp_eperm_probe_test() -> tuple[bool, bool]:
+        class SockFprog(Structure):
+            _fields_ = (("len", c_ushort), ("filter", c_char_p))
+
+        # Return EPERM from clone3 like the Docker default seccomp profile.
+        # New syscalls have the same number on all architectures.
+        bpf_filter = b"".join(
+            (
+                pack("HBBI", 0x20, 0, 0, 0),  # Load syscall number
+                pack("HBBI", 0x15, 0, 1, 435),  # Jump if not clone3
+                pack("HBBI", 0x06, 0, 0, 0x00050000 | EPERM),  # Return errno
+                pack("HBBI", 0x06, 0, 0, 0x7FFF0000),  # Allow
+            )
+        )
+        libc = CDLL(None, use_errno=True)
+        prog = SockFprog(len(bpf_filter) // 8, bpf_filter)
+        # PR_SET_NO_NEW_PRIVS and PR_SET_SECCOMP with SECCOMP_MODE_FILTER
+        if libc.prctl(38, 1, 0, 0, 0) or libc.prctl(22, 2, byref(prog), 0, 0):
+            raise OSError(get_errno(), "Failed to set seccomp filter")
+
+        return probe_syscall("clone3"), probe_syscall("mount_setattr")
+
+    def test_seccomp_eperm_probe(self) -> None:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            clone3_available, mount_setattr_available = executor.submit(
+                self.seccomp_eperm_probe_test
+            ).result(3)
+
+        self.assertFalse(clone3_available)
+        self.assertTrue(mount_setattr_available)
+
+    def test_probe_all(self) -> None:
+        probed = features.probe_all()
+        self.assertEqual(set(probed), set(features.ALL_FEATURES))
+        for available in probed.values():
+            self.assertIsInstance(available, bool)
+
+        self.assertFalse(features.has_syscall("not_a_syscall"))
+        # pidfd_open used by the probes exists since Linux 5.3
+        # together with clone3.
+        self.assertTrue(features.has_clone3())
+
+    def test_from_pidfd(self) -> None:
+        paths = [False]
+        if features.has_pidfd_get_namespace():
+            paths.append(True)
+
+        for use_ioctl in paths:
+            with self.subTest(use_ioctl=use_ioctl):
+                with patch.object(
+                    features, "has_pidfd_get_namespace", return_value=use_ioctl
+                ):
+                    self._check_from_pidfd()
+
+    def _check_from_pidfd(self) -> None:
+        process = Popen(("sleep", "10"))
+        pidfd = pidfd_open(process.pid)
+        try:
+            for ns_class in ALL_NAMESPACE_CLASSES:
+                with ns_class.from_pidfd(pidfd) as ns:
+                    with ns_class.from_pid(process.pid) as expected_ns:
+                        self.assertEqual(ns.ns_id, expected_ns.ns_id)
+
+            process.kill()
+            process.wait()
+            with self.assertRaises(ProcessLookupError):
+                UserNamespace.from_pidfd(pidfd)
+        finally:
+            close_fd(pidfd)
+            process.kill()
+            process.wait()
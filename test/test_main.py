@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from json import loads
+from os import environ, readlink
+from pathlib import Path
+from select import select
+from subprocess import PIPE, Popen, run
+from sys import executable
+from unittest import TestCase
+
+import lxns
+
+LXNS_PATH = str(Path(lxns.__file__).parent.parent)
+
+
+def run_lxns(*args: str, input: str | None = None) -> tuple[int, str]:
+    lxns_run = run(
+        args=(executable, "-m", "lxns", *args),
+        env=environ | {"PYTHONPATH": LXNS_PATH},
+        input=input,
+        stdout=PIPE,
+        text=True,
+        timeout=10,
+    )
+    return lxns_run.returncode, lxns_run.stdout
+
+
+class TestMain(TestCase):
+    def test_unshare(self) -> None:
+        returncode, output = run_lxns(
+            "--unshare",
+            "user,pid",
+            "--",
+            "sh",
+            "-c",
+            "echo $$; readlink /proc/self/ns/user",
+        )
+        self.assertEqual(returncode, 0)
+        pid, user_ns = output.split()
+        self.assertEqual(pid, "1")
+        self.assertNotEqual(user_ns, readlink("/proc/self/ns/user"))
+
+    def test_exit_code(self) -> None:
+        returncode, _ = run_lxns("--unshare", "user", "--", "sh", "-c", "exit 3")
+        self.assertEqual(returncode, 3)
+
+        returncode, _ = run_lxns("--unshare", "user", "--", "/non-existent")
+        self.assertEqual(returncode, 127)
+
+    def test_target_and_batch(self) -> None:
+        with Popen(
+            args=(executable, "-m", "lxns", "-u", "user,net", "sleep", "10"),
+            env=environ | {"PYTHONPATH": LXNS_PATH},
+        ) as sleep_process:
+            try:
+                # Wait until the sleep is executed in new namespaces
+                target_net_ns = readlink("/proc/self/ns/net")
+                while target_net_ns == readlink("/proc/self/ns/net"):
+                    target_net_ns = readlink(f"/proc/{sleep_process.pid}/ns/net")
+
+                target = str(sleep_process.pid)
+
+                returncode, output = run_lxns(
+                    "--target", target, "readlink", "/proc/self/ns/net"
+                )
+                self.assertEqual(returncode, 0)
+                self.assertEqual(output.strip(), target_net_ns)
+
+                # Joining network namespace requires capabilities
+                # in the user namespace that owns it.
+                returncode, output = run_lxns(
+                    "--user",
+                    f"/proc/{target}/ns/user",
+                    "--net",
+                    f"/proc/{target}/ns/net",
+                    "readlink",
+                    "/proc/self/ns/net",
+                )
+                self.assertEqual(returncode, 0)
+                self.assertEqual(output.strip(), target_net_ns)
+
+                batch_input = "".join(
+                    (
+                        f"{target} readlink /proc/self/ns/net\n",
+                        f"{target} sh -c 'echo error >&2; exit 2'\n",
+                        f"{target} readlink /proc/self/ns/net\n",
+                        "not-a-pid true\n",
+                    )
+                )
+                returncode, output = run_lxns(
+                    "--batch", "--jobs", "2", input=batch_input
+                )
+
+                # Results are printed while the input is still open
+                with Popen(
+                    args=(executable, "-m", "lxns", "--batch"),
+                    env=environ | {"PYTHONPATH": LXNS_PATH},
+                    stdin=PIPE,
+                    stdout=PIPE,
+                    text=True,
+                ) as batch_process:
+                    assert batch_process.stdin is not None
+                    assert batch_process.stdout is not None
+                    batch_process.stdin.write(f"{target} true\n")
+                    batch_process.stdin.flush()
+                    readable, _, _ = select((batch_process.stdout,), (), (), 10)
+                    self.assertTrue(readable)
+                    self.assertEqual(
+                        loads(batch_process.stdout.readline())["returncode"], 0
+                    )
+                    batch_process.stdin.close()
+                    self.assertEqual(batch_process.wait(timeout=10), 0)
+            finally:
+                sleep_process.kill()
+
+        self.assertEqual(returncode, 1)
+        results = {result["line"]: result for result in map(loads, output.splitlines())}
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[1]["stdout"].strip(), target_net_ns)
+        self.assertEqual(results[2]["returncode"], 2)
+        self.assertEqual(results[2]["stderr"], "error\n")
+        self.assertEqual(results[3]["stdout"].strip(), target_net_ns)
+        self.assertIn("error", results[4])
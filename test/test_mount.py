@@ -3,12 +3,21 @@
 from __future__ import annotations
 
 from concurrent.futures import ProcessPoolExecutor
+from os import chdir, getcwd
 from pathlib import Path
+from socket import AF_UNIX, SOCK_SEQPACKET, socketpair
 from tempfile import TemporaryDirectory
 from unittest import TestCase
 
-from lxns.mount import ClonedTree
-from lxns.namespaces import unshare_namespaces
+from lxns.mount import (
+    ClonedTree,
+    MountNamespacePool,
+    diff_mounts,
+    recv_trees,
+    send_trees,
+    sync_mounts,
+)
+from lxns.namespaces import MountNamespace, unshare_namespaces
 
 
 class TestLxnsMount(TestCase):
@@ -31,3 +40,155 @@ class TestLxnsMount(TestCase):
                 executor.submit(self._test_cloned_tree, foo_file, bar_file).result(3),
                 "foo",
             )
+
+    @staticmethod
+    def _test_send_recv_trees(foo_file: Path, bar_file: Path) -> tuple[str, str]:
+        unshare_namespaces(user=True, mount=True)
+        sock_a, sock_b = socketpair(AF_UNIX, SOCK_SEQPACKET)
+        with sock_a, sock_b:
+            with ClonedTree(foo_file) as tree:
+                send_trees(sock_a, [tree] * 20)
+                try:
+                    recv_trees(sock_b)
+                except ValueError:
+                    ...
+                else:
+                    raise AssertionError("Truncated trees not detected")
+
+                send_trees(sock_a, [tree] * 200)
+                many_trees = recv_trees(sock_b, max_trees=200, bufsize=64 * 1024)
+                for many_tree in many_trees:
+                    many_tree.close()
+
+                if len(many_trees) != 200:
+                    raise AssertionError("Not all trees received")
+
+                send_trees(sock_a, ())
+                if recv_trees(sock_b) != []:
+                    raise AssertionError("Empty trees list not received")
+
+                send_trees(sock_a, (tree,))
+
+            (received_tree,) = recv_trees(sock_b)
+            with received_tree:
+                received_tree.mount(bar_file)
+                return repr(received_tree), bar_file.read_text()
+
+    def test_send_recv_trees(self) -> None:
+        with ProcessPoolExecutor() as executor, TemporaryDirectory() as tmpdir:
+            tmpdir_path = Path(tmpdir)
+            foo_file = tmpdir_path / "foo"
+            foo_file.write_text("foo")
+            bar_file = tmpdir_path / "bar"
+            bar_file.write_text("bar")
+
+            tree_repr, bar_text = executor.submit(
+                self._test_send_recv_trees, foo_file, bar_file
+            ).result(3)
+            self.assertIn(str(foo_file), tree_repr)
+            self.assertEqual(bar_text, "foo")
+
+    @staticmethod
+    def _test_mount_namespace_pool(foo_file: Path, bar_file: Path) -> list[str]:
+        unshare_namespaces(user=True, mount=True)
+        results: list[str] = []
+        with MountNamespace.from_self() as original_ns, MountNamespacePool() as pool:
+            MountNamespace.unshare()
+            with ClonedTree(foo_file) as tree:
+                tree.mount(bar_file)
+
+            template = MountNamespace.from_self()
+            template_id = template.ns_id
+            pool.add_template("foo", template)
+            original_ns.setns()
+            chdir(foo_file.parent)
+            results.append(bar_file.read_text())
+
+            clones = pool.clone_many("foo", 3)
+            clones.append(MountNamespace.clone_from(template))
+            try:
+                clone_ids = {ns.ns_id for ns in clones}
+                assert len(clone_ids) == 4
+                assert template_id not in clone_ids
+                # Cloning does not change the caller
+                assert MountNamespace.get_current_ns_id() == original_ns.ns_id
+                assert getcwd() == str(foo_file.parent)
+
+                for ns in clones:
+                    ns.setns()
+                    results.append(bar_file.read_text())
+            finally:
+                for ns in clones:
+                    ns.close()
+
+                original_ns.setns()
+
+        return results
+
+    def test_mount_namespace_pool(self) -> None:
+        with ProcessPoolExecutor() as executor, TemporaryDirectory() as tmpdir:
+            tmpdir_path = Path(tmpdir)
+            foo_file = tmpdir_path / "foo"
+            foo_file.write_text("foo")
+            bar_file = tmpdir_path / "bar"
+            bar_file.write_text("bar")
+
+            self.assertEqual(
+                executor.submit(
+                    self._test_mount_namespace_pool, foo_file, bar_file
+                ).result(3),
+                ["bar", "foo", "foo", "foo", "foo"],
+            )
+
+    @staticmethod
+    def _test_diff_sync_mounts(tmpdir_path: Path) -> list[object]:
+        unshare_namespaces(user=True, mount=True)
+        foo_file = tmpdir_path / "foo"
+        bar_file = tmpdir_path / "bar"
+        baz_file = tmpdir_path / "baz"
+        results: list[object] = []
+        with MountNamespace.from_self() as target_ns:
+            MountNamespace.unshare()
+            for path in (bar_file, baz_file):
+                with ClonedTree(foo_file) as tree:
+                    tree.mount(path)
+
+            with MountNamespace.from_self() as source_ns:
+                target_ns.setns()
+
+                diff = diff_mounts(source_ns, target_ns)
+                results.append(sorted(mount.mount_point for mount in diff.missing))
+                results.append(diff.extra)
+
+                synced = sync_mounts(source_ns, target_ns, paths=(bar_file,))
+                results.append([mount.mount_point for mount in synced])
+                results.append((bar_file.read_text(), baz_file.read_text()))
+
+                synced = sync_mounts(source_ns, target_ns)
+                results.append([mount.mount_point for mount in synced])
+                results.append(baz_file.read_text())
+
+                results.append(bool(diff_mounts(source_ns, target_ns)))
+                results.append(sync_mounts(source_ns, target_ns))
+
+        return results
+
+    def test_diff_sync_mounts(self) -> None:
+        with ProcessPoolExecutor() as executor, TemporaryDirectory() as tmpdir:
+            tmpdir_path = Path(tmpdir)
+            for name in ("foo", "bar", "baz"):
+                (tmpdir_path / name).write_text(name)
+
+            self.assertEqual(
+                executor.submit(self._test_diff_sync_mounts, tmpdir_path).result(3),
+                [
+                    [str(tmpdir_path / "bar"), str(tmpdir_path / "baz")],
+                    [],
+                    [str(tmpdir_path / "bar")],
+                    ("foo", "baz"),
+                    [str(tmpdir_path / "baz")],
+                    "foo",
+                    False,
+                    [],
+                ],
+            )
@@ -3,10 +3,32 @@
 from __future__ import annotations
 
 from concurrent.futures import ProcessPoolExecutor
-from os import getuid
-from unittest import TestCase
+from errno import EOPNOTSUPP
+from os import WNOHANG
+from os import _exit as os_exit
+from os import fork, fstat, getuid, kill, listdir, waitpid
+from signal import SIGKILL
+from socket import AF_UNIX, SOCK_SEQPACKET, send_fds, socketpair
+from subprocess import PIPE, run
+from sys import executable
+from tempfile import TemporaryDirectory, TemporaryFile
+from time import monotonic, sleep
+from unittest import SkipTest, TestCase
 
-from lxns.namespaces import UserNamespace, unshare_namespaces
+from lxns._fd_holder import fd_lock
+from lxns.namespaces import (
+    MountNamespace,
+    NamespaceSet,
+    NetworkNamespace,
+    TimeNamespace,
+    UserNamespace,
+    current_namespaces,
+    namespace_from_fd,
+    recv_namespaces,
+    send_namespaces,
+    unshare_namespaces,
+)
+from lxns.os import CLONE_NEWUSER, unshare
 
 
 class TestNamespaces(TestCase):
@@ -44,6 +66,39 @@ class TestNamespaces(TestCase):
         self.assertEqual(uid_now, uid_before)
         self.assertNotEqual(uid_now, uid_after)
 
+    @staticmethod
+    def time_namespace_create_test() -> tuple[float, bool]:
+        UserNamespace.unshare()
+        current_ns_id = TimeNamespace.get_current_ns_id()
+        with TimeNamespace.create(monotonic=1000, boottime=1000.5) as time_ns:
+            child_process = run(
+                (executable, "-c", "from time import monotonic; print(monotonic())"),
+                preexec_fn=time_ns.setns,
+                stdout=PIPE,
+                check=True,
+            )
+            offset = float(child_process.stdout) - monotonic()
+
+        # Caller time namespace and namespace for children are not changed
+        with TimeNamespace.from_pid("self", for_children=True) as children_ns:
+            not_changed = (
+                TimeNamespace.get_current_ns_id() == current_ns_id == children_ns.ns_id
+            )
+
+        return offset, not_changed
+
+    def test_time_namespace_create(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            offset, not_changed = executor.submit(
+                self.time_namespace_create_test
+            ).result(3)
+
+        self.assertTrue(999 < offset < 1001)
+        self.assertTrue(not_changed)
+
+        with self.assertRaises(ValueError):
+            NetworkNamespace.from_pid("self", for_children=True)
+
     @staticmethod
     def namespaces_limits_test() -> int:
         UserNamespace.unshare()
@@ -55,3 +110,203 @@ class TestNamespaces(TestCase):
 
         with ProcessPoolExecutor() as executor:
             self.assertEqual(executor.submit(self.namespaces_limits_test).result(3), 0)
+
+    def test_send_recv_namespaces(self) -> None:
+        sock_a, sock_b = socketpair(AF_UNIX, SOCK_SEQPACKET)
+        with (
+            sock_a,
+            sock_b,
+            UserNamespace.from_self() as user_ns,
+            NetworkNamespace.from_self() as net_ns,
+        ):
+            send_namespaces(sock_a, (user_ns, net_ns))
+            received = recv_namespaces(sock_b)
+            try:
+                self.assertEqual(
+                    [type(ns) for ns in received], [UserNamespace, NetworkNamespace]
+                )
+                self.assertEqual(
+                    [ns.ns_id for ns in received], [user_ns.ns_id, net_ns.ns_id]
+                )
+            finally:
+                for ns in received:
+                    ns.close()
+
+            with self.subTest("Not a namespace"), TemporaryFile() as temp_f:
+                with self.assertRaises(ValueError):
+                    namespace_from_fd(temp_f.fileno())
+
+                open_fds = len(listdir("/proc/self/fd"))
+                send_fds(sock_a, (b"\0",), [user_ns.fileno(), temp_f.fileno()])
+                with self.assertRaises(ValueError):
+                    recv_namespaces(sock_b)
+
+                self.assertEqual(len(listdir("/proc/self/fd")), open_fds)
+
+            sock_a.close()
+            with self.assertRaises(ConnectionError):
+                recv_namespaces(sock_b)
+
+    def test_namespace_set(self) -> None:
+        with UserNamespace.from_self() as user_ns:
+            self.assertFalse(hasattr(user_ns, "__dict__"))
+
+        with NamespaceSet.from_pid("self", (UserNamespace, NetworkNamespace)) as ns_set:
+            self.assertEqual(len(ns_set), 2)
+            self.assertIn(UserNamespace, ns_set)
+            self.assertNotIn(MountNamespace, ns_set)
+            self.assertIsNone(ns_set.get(MountNamespace))
+            with self.assertRaises(KeyError):
+                ns_set[MountNamespace]
+
+            self.assertEqual(
+                ns_set[UserNamespace].ns_id, UserNamespace.get_current_ns_id()
+            )
+            self.assertEqual(
+                [type(ns) for ns in ns_set], [UserNamespace, NetworkNamespace]
+            )
+
+        with self.assertRaises(ValueError):
+            ns_set.fileno(UserNamespace)
+
+        with NamespaceSet((MountNamespace.from_self(),)) as ns_set:
+            self.assertEqual(
+                ns_set[MountNamespace].ns_id, MountNamespace.get_current_ns_id()
+            )
+
+            with self.assertRaises(ValueError):
+                NamespaceSet((ns_set[MountNamespace],))
+
+            # View is still usable
+            self.assertEqual(
+                ns_set[MountNamespace].ns_id, MountNamespace.get_current_ns_id()
+            )
+
+    @staticmethod
+    def current_namespaces_test() -> tuple[int, int, int]:
+        id_before = UserNamespace.get_current_ns_id()
+        # Raw unshare is not tracked by the cache
+        unshare(CLONE_NEWUSER)
+        id_stale = UserNamespace.get_current_ns_id()
+        current_namespaces.refresh()
+        return id_before, id_stale, UserNamespace.get_current_ns_id()
+
+    def test_current_namespaces(self) -> None:
+        with UserNamespace.from_self() as user_ns:
+            self.assertTrue(current_namespaces.is_current(user_ns))
+
+        with ProcessPoolExecutor() as executor:
+            id_before, id_stale, id_refreshed = executor.submit(
+                self.current_namespaces_test
+            ).result(3)
+
+        self.assertEqual(id_before, UserNamespace.get_current_ns_id())
+        self.assertEqual(id_before, id_stale)
+        self.assertNotEqual(id_before, id_refreshed)
+
+    def test_fork_while_locked(self) -> None:
+        user_ns = UserNamespace.from_self()
+        # Simulate another thread holding the lock during fork
+        with fd_lock(user_ns):
+            pid = fork()
+            if pid == 0:
+                user_ns.close()
+                os_exit(0)
+
+        user_ns.close()
+        deadline = monotonic() + 3
+        while monotonic() < deadline:
+            if waitpid(pid, WNOHANG) != (0, 0):
+                break
+
+            sleep(0.01)
+        else:
+            kill(pid, SIGKILL)
+            waitpid(pid, 0)
+            self.fail("Child deadlocked closing the namespace")
+
+    def test_wrong_type_closes_fd(self) -> None:
+        open_fds = len(listdir("/proc/self/fd"))
+        with self.assertRaises(ValueError):
+            UserNamespace.from_path("/proc/self/ns/net")
+
+        self.assertEqual(len(listdir("/proc/self/fd")), open_fds)
+
+    def test_close_while_in_use(self) -> None:
+        user_ns = UserNamespace.from_self()
+        fd = user_ns._borrow_fd("closed")
+        user_ns.close()
+        user_ns.close()
+
+        with self.assertRaises(ValueError):
+            user_ns.ns_id
+
+        # Closing is delayed until the file descriptor is returned
+        fstat(fd)
+        user_ns._return_fd(fd)
+        with self.assertRaises(OSError):
+            fstat(fd)
+
+    def test_namespace_set_close_while_in_use(self) -> None:
+        ns_set = NamespaceSet.from_pid("self", (UserNamespace, NetworkNamespace))
+        user_ns = ns_set[UserNamespace]
+        net_ns = ns_set[NetworkNamespace]
+        fd = user_ns._borrow_fd("closed")
+        net_fd = ns_set.fileno(NetworkNamespace)
+        ns_set.close()
+
+        with self.assertRaises(ValueError):
+            net_ns.ns_id
+
+        with self.assertRaises(ValueError):
+            net_ns.fileno()
+
+        # Closing of the set is delayed until the view returns
+        # the file descriptor
+        fstat(net_fd)
+        user_ns._return_fd(fd)
+        with self.assertRaises(OSError):
+            fstat(net_fd)
+
+    @staticmethod
+    def persist_namespace_test(path: str) -> tuple[int, int, int]:
+        unshare_namespaces(user=True, mount=True, network=True)
+        persisted_ns_id = NetworkNamespace.get_current_ns_id()
+        with NetworkNamespace.from_self() as net_ns:
+            net_ns.persist(path)
+
+        NetworkNamespace.unshare()
+        with NetworkNamespace.from_path(path) as net_ns:
+            reopened_ns_id = net_ns.ns_id
+
+        return persisted_ns_id, reopened_ns_id, NetworkNamespace.get_current_ns_id()
+
+    def test_persist_namespace(self) -> None:
+        with TemporaryDirectory() as tmp_dir, ProcessPoolExecutor() as executor:
+            persisted_ns_id, reopened_ns_id, current_ns_id = executor.submit(
+                self.persist_namespace_test, tmp_dir + "/net"
+            ).result(3)
+
+        self.assertEqual(persisted_ns_id, reopened_ns_id)
+        self.assertNotEqual(persisted_ns_id, current_ns_id)
+
+        with self.assertRaises(ValueError):
+            UserNamespace.from_path("/proc/self/ns/net")
+
+    def test_namespace_handle(self) -> None:
+        with NetworkNamespace.from_self() as net_ns:
+            try:
+                handle = net_ns.to_handle()
+            except OSError as e:
+                if e.errno == EOPNOTSUPP:
+                    raise SkipTest("Namespace file handles not supported")
+
+                raise
+
+            ns_id = net_ns.ns_id
+
+        with NetworkNamespace.from_handle(handle) as net_ns:
+            self.assertEqual(ns_id, net_ns.ns_id)
+
+        with self.assertRaises(ValueError):
+            UserNamespace.from_handle(handle)
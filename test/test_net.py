@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from socket import AF_INET, SOCK_STREAM, socket
+from unittest import TestCase
+
+from lxns.namespaces import NetworkNamespace, unshare_namespaces
+from lxns.net import RtnetlinkSocket, setup_loopback
+
+
+class TestNet(TestCase):
+    @staticmethod
+    def setup_loopback_test() -> tuple[bool, bool]:
+        unshare_namespaces(user=True, network=True)
+
+        def can_listen_on_loopback() -> bool:
+            try:
+                with socket(AF_INET, SOCK_STREAM) as sock:
+                    sock.bind(("127.0.0.1", 0))
+                    sock.listen()
+                    with socket(AF_INET, SOCK_STREAM) as client:
+                        client.connect(sock.getsockname())
+            except OSError:
+                return False
+
+            return True
+
+        before = can_listen_on_loopback()
+        setup_loopback()
+        return before, can_listen_on_loopback()
+
+    def test_setup_loopback(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            before, after = executor.submit(self.setup_loopback_test).result(3)
+
+        self.assertFalse(before)
+        self.assertTrue(after)
+
+    @staticmethod
+    def veth_test() -> tuple[int, int]:
+        unshare_namespaces(user=True, network=True)
+        with NetworkNamespace.from_self() as host_ns:
+            NetworkNamespace.unshare()
+            with (
+                NetworkNamespace.from_self() as sandbox_ns,
+                RtnetlinkSocket(host_ns) as host_rtnl,
+                RtnetlinkSocket() as sandbox_rtnl,
+            ):
+                with host_rtnl.batch():
+                    host_rtnl.create_veth("veth-host", "veth-sandbox", sandbox_ns)
+                    host_rtnl.set_link_up("veth-host")
+                    host_rtnl.add_address("veth-host", "10.0.0.1/24")
+
+                with sandbox_rtnl.batch():
+                    sandbox_rtnl.set_link_up("lo")
+                    sandbox_rtnl.set_link_up("veth-sandbox")
+                    sandbox_rtnl.add_address("veth-sandbox", "10.0.0.2/24")
+                    sandbox_rtnl.add_address("veth-sandbox", "fd00::2/64")
+
+                with socket(AF_INET, SOCK_STREAM) as sock:
+                    # Address is assigned to the local link
+                    sock.bind(("10.0.0.2", 0))
+
+                try:
+                    host_rtnl.create_veth("veth-host", "veth-other")
+                except FileExistsError:
+                    ...
+                else:
+                    raise AssertionError("Duplicate link name not rejected")
+
+                sandbox_rtnl.move_link("veth-sandbox", host_ns)
+                return (
+                    host_rtnl.get_link_index("veth-host"),
+                    host_rtnl.get_link_index("veth-sandbox"),
+                )
+
+    def test_veth(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            host_index, moved_index = executor.submit(self.veth_test).result(3)
+
+        self.assertGreater(host_index, 1)
+        self.assertGreater(moved_index, 1)
+
+    @staticmethod
+    def nsid_test() -> tuple[list[int], int, list[int]]:
+        unshare_namespaces(user=True, network=True)
+        with NetworkNamespace.from_self() as host_ns:
+            NetworkNamespace.unshare()
+            with NetworkNamespace.from_self() as sandbox_ns:
+                NetworkNamespace.unshare()
+                with NetworkNamespace.from_self() as other_ns:
+                    with RtnetlinkSocket(host_ns) as host_rtnl:
+                        # Kernel assigns the ids to the peer namespaces
+                        host_rtnl.create_veth("veth-host", "veth-sandbox", sandbox_ns)
+                        nsids = host_rtnl.get_nsids((sandbox_ns, other_ns))
+                        # Cached result
+                        if host_rtnl.get_nsids((sandbox_ns,)) != nsids[:1]:
+                            raise AssertionError("Cached nsid does not match")
+
+                    return (
+                        nsids,
+                        sandbox_ns.get_nsid(relative_to=host_ns),
+                        NetworkNamespace.get_nsids((sandbox_ns, other_ns)),
+                    )
+
+    def test_nsid(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            nsids, shared_nsid, current_nsids = executor.submit(self.nsid_test).result(
+                3
+            )
+
+        sandbox_nsid, other_nsid = nsids
+        self.assertGreaterEqual(sandbox_nsid, 0)
+        self.assertEqual(other_nsid, -1)
+        self.assertEqual(shared_nsid, sandbox_nsid)
+        # Current namespace has not assigned any ids
+        self.assertEqual(current_nsids, [-1, -1])
@@ -2,27 +2,49 @@
 # SPDX-FileCopyrightText: 2024 igo95862
 from __future__ import annotations
 
+from array import array
 from concurrent.futures import ProcessPoolExecutor
-from os import fstat, getpid, getuid, stat
+from errno import EBADF, ENOTTY
+from os import close, fstat, getpid, getuid, stat
 from pathlib import Path
+from sys import addaudithook
 from tempfile import TemporaryDirectory, TemporaryFile
-from unittest import TestCase
+from typing import TYPE_CHECKING, cast
+from unittest import TestCase, skipUnless
 
 from lxns.os import (
     CLONE_NEWNS,
     CLONE_NEWUSER,
     MOVE_MOUNT_F_EMPTY_PATH,
     OPEN_TREE_CLONE,
+    enable_stats,
+    fstat_ino_many,
     move_mount,
+    name_to_handle_at,
     ns_get_nstype,
+    ns_get_nstype_many,
     ns_get_owner_uid,
     ns_get_parent,
     ns_get_userns,
+    ns_get_userns_many,
+    open_by_handle_at,
     open_tree,
+    reset_stats,
     setns,
+    stats,
     unshare,
 )
 
+if TYPE_CHECKING:
+    from typing import Any
+
+try:
+    from concurrent import interpreters  # type: ignore[attr-defined,unused-ignore]
+
+    HAS_INTERPRETERS = True
+except ImportError:
+    HAS_INTERPRETERS = False
+
 NAMESPACES_FILE = "/proc/{pid}/ns/{namespace}"
 NAMESPACES_NAMES = (
     "cgroup",
@@ -114,10 +136,98 @@ class TestLxnsOs(TestCase):
             ):
                 ns_get_owner_uid(temp_f.fileno())
 
+    def test_keyword_arguments(self) -> None:
+        with self.assertRaisesRegex(TypeError, "unexpected keyword argument 'foo'"):
+            open_tree(**cast("dict[str, Any]", {"foo": 1}))
+
+        with self.assertRaisesRegex(TypeError, "multiple values for argument 'dirfd'"):
+            open_tree(-100, **cast("dict[str, Any]", {"dirfd": 1}))
+
+        with self.assertRaisesRegex(TypeError, "missing required argument 'handle'"):
+            open_by_handle_at(**cast("dict[str, Any]", {"mount_fd": -1}))
+
+        handle, _ = name_to_handle_at(path="/")
+        self.assertEqual(name_to_handle_at(-100, "/", 0)[0], handle)
+
     def test_ns_get_nstype(self) -> None:
         with open(SELF_USERNS_FILE) as f:
             self.assertEqual(ns_get_nstype(f.fileno()), CLONE_NEWUSER)
 
+    def test_batched_functions(self) -> None:
+        with open(SELF_USERNS_FILE) as userns_f, TemporaryFile() as temp_f:
+            fds = array("i", (userns_f.fileno(), temp_f.fileno(), -1))
+
+            self.assertEqual(
+                ns_get_nstype_many(fds),
+                [CLONE_NEWUSER, -ENOTTY, -EBADF],
+            )
+            self.assertEqual(
+                fstat_ino_many(list(fds)),
+                [
+                    stat(SELF_USERNS_FILE).st_ino,
+                    fstat(temp_f.fileno()).st_ino,
+                    -EBADF,
+                ],
+            )
+
+            # Initial user namespace has no owner
+            userns_results = ns_get_userns_many(fds[:1])
+            self.assertEqual(len(userns_results), 1)
+            if userns_results[0] >= 0:
+                close(userns_results[0])
+
+            # Buffer of 64 bit integers is filled directly
+            nstypes_buffer = array("q", [0] * (len(fds) + 1))
+            self.assertIsNone(ns_get_nstype_many(fds, nstypes_buffer))
+            self.assertEqual(
+                nstypes_buffer.tolist(), [CLONE_NEWUSER, -ENOTTY, -EBADF, 0]
+            )
+            self.assertIsNone(ns_get_nstype_many(fds, memoryview(nstypes_buffer)))
+            # Any mutable sequence can be used as well
+            nstypes_list = [0] * len(fds)
+            self.assertIsNone(ns_get_nstype_many(list(fds), nstypes_list))
+            self.assertEqual(nstypes_list, [CLONE_NEWUSER, -ENOTTY, -EBADF])
+
+            with self.assertRaises(ValueError):
+                ns_get_nstype_many(fds, array("q"))
+
+            with self.assertRaises(ValueError):
+                ns_get_userns_many(fds[:1], [])
+
+        self.assertEqual(ns_get_nstype_many(()), [])
+
+        with self.assertRaises(TypeError):
+            setns(0)  # type: ignore[call-arg]
+
+        with self.assertRaises(TypeError):
+            ns_get_nstype_many(None)  # type: ignore[call-overload]
+
+    def test_stats(self) -> None:
+        reset_stats()
+        enable_stats(True)
+        try:
+            with open(SELF_USERNS_FILE) as userns_f, TemporaryFile() as temp_f:
+                ns_get_nstype(userns_f.fileno())
+                ns_get_nstype_many((userns_f.fileno(), temp_f.fileno()))
+                with self.assertRaises(OSError):
+                    ns_get_nstype(temp_f.fileno())
+        finally:
+            enable_stats(False)
+
+        # Disabled stats are not recorded
+        with open(SELF_USERNS_FILE) as userns_f:
+            ns_get_nstype(userns_f.fileno())
+
+        nstype_stats = stats()["ns_get_nstype"]
+        self.assertEqual(nstype_stats["calls"], 4)
+        self.assertEqual(nstype_stats["errors"], 2)
+        self.assertEqual(nstype_stats["errnos"], {ENOTTY: 2})
+        self.assertEqual(sum(nstype_stats["latency_ns_histogram"].values()), 4)
+        self.assertEqual(stats()["setns"]["calls"], 0)
+
+        reset_stats()
+        self.assertEqual(stats()["ns_get_nstype"]["calls"], 0)
+
     @staticmethod
     def _unshare_executor() -> None:
         unshare(CLONE_NEWUSER)
@@ -196,3 +306,34 @@ class TestLxnsOs(TestCase):
                 executor.submit(self._open_tree_test, foo_file, bar_file).result(3),
                 "foo",
             )
+
+    @skipUnless(HAS_INTERPRETERS, "Requires concurrent.interpreters module")
+    def test_isolated_subinterpreter(self) -> None:
+        # Interpreters created by the module have their own GIL
+        interp = interpreters.create()
+        try:
+            interp.exec(
+                "from lxns.os import CLONE_NEWUSER, ns_get_nstype\n"
+                "with open('/proc/self/ns/user') as f:\n"
+                "    assert ns_get_nstype(f.fileno()) == CLONE_NEWUSER\n"
+            )
+        finally:
+            interp.close()
+
+    @staticmethod
+    def _audit_test() -> list[tuple[str, tuple[object, ...]]]:
+        events: list[tuple[str, tuple[object, ...]]] = []
+
+        def audit_hook(event: str, args: tuple[object, ...]) -> None:
+            if event.startswith("lxns."):
+                events.append((event, args))
+
+        addaudithook(audit_hook)
+        unshare(CLONE_NEWUSER)
+        return events
+
+    def test_audit_events(self) -> None:
+        with ProcessPoolExecutor() as executor:
+            events = executor.submit(self._audit_test).result(3)
+
+        self.assertEqual(events, [("lxns.os.unshare", (CLONE_NEWUSER,))])
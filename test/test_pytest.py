@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from importlib.util import find_spec
+from os import environ
+from pathlib import Path
+from subprocess import PIPE, run
+from sys import executable
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipIf
+
+import lxns
+
+TEST_MODULE = """
+from os import getpid, getuid
+
+import pytest
+
+from lxns.namespaces import NetworkNamespace, UserNamespace
+
+PARENT_USER_NS_ID = UserNamespace.get_current_ns_id()
+
+
+@pytest.mark.lxns_isolated
+def test_isolated(lxns_namespaces):
+    assert getuid() == 0
+    assert UserNamespace.get_current_ns_id() != PARENT_USER_NS_ID
+    assert lxns_namespaces[UserNamespace].ns_id != PARENT_USER_NS_ID
+
+
+@pytest.mark.lxns_isolated(network=True, pid=True)
+def test_isolated_network_pid():
+    assert getpid() == 1
+    with NetworkNamespace.from_self() as net_ns:
+        assert net_ns.get_user_namespace().ns_id != PARENT_USER_NS_ID
+
+
+@pytest.mark.lxns_isolated
+def test_isolated_fail():
+    assert False
+
+
+def test_regular():
+    assert UserNamespace.get_current_ns_id() == PARENT_USER_NS_ID
+"""
+
+
+@skipIf(find_spec("pytest") is None, "pytest is not installed")
+class TestPytestPlugin(TestCase):
+    def test_plugin(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            test_module_path = Path(tmp_dir) / "test_isolated.py"
+            test_module_path.write_text(TEST_MODULE)
+
+            lxns_path = str(Path(lxns.__file__).parent.parent)
+            pytest_run = run(
+                args=(
+                    executable,
+                    "-m",
+                    "pytest",
+                    "-p",
+                    "lxns.pytest",
+                    "-p",
+                    "no:cacheprovider",
+                    "--lxns-jobs",
+                    "2",
+                    "-q",
+                    str(test_module_path),
+                ),
+                cwd=tmp_dir,
+                env=environ | {"PYTHONPATH": lxns_path},
+                stdout=PIPE,
+                text=True,
+                timeout=30,
+            )
+
+        self.assertIn("1 failed, 3 passed", pytest_run.stdout)
+        self.assertIn("test_isolated_fail", pytest_run.stdout)
@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lxns.sandbox import SandboxSpec
+
+
+class TestSandboxSpec(TestCase):
+    def test_spawn(self) -> None:
+        with TemporaryDirectory() as tmpdir:
+            tmpdir_path = Path(tmpdir)
+            foo_file = tmpdir_path / "foo"
+            foo_file.write_text("foo")
+            bar_file = tmpdir_path / "bar"
+            bar_file.write_text("bar")
+
+            spec = SandboxSpec(
+                network=True,
+                pid=True,
+                uts=True,
+                hostname="sandbox",
+                bind_mounts=((str(foo_file), str(bar_file)),),
+                cwd=tmpdir,
+                env={"FOO": "foo"},
+            )
+            process = spec.spawn(
+                (
+                    "/bin/sh",
+                    "-c",
+                    'test "$(cat /proc/sys/kernel/hostname)" = sandbox '
+                    '&& test "$(cat bar)" = foo '
+                    '&& test "$FOO" = foo '
+                    "&& test $$ -eq 1",
+                )
+            )
+            self.assertEqual(process.wait(), 0)
+            self.assertEqual(
+                list(process.timings),
+                [
+                    "fork",
+                    "unshare",
+                    "setgroups",
+                    "uid_map",
+                    "gid_map",
+                    "fork_pid_init",
+                    "hostname",
+                    f"mount:{bar_file}",
+                    "loopback",
+                    "chdir",
+                    "total",
+                ],
+            )
+            self.assertEqual(bar_file.read_text(), "bar")
+
+            with self.subTest("Exit code"):
+                process = SandboxSpec().spawn(("/bin/sh", "-c", "exit 3"))
+                self.assertEqual(process.wait(), 3)
+
+            with self.subTest("Failed mount"):
+                spec = SandboxSpec(
+                    bind_mounts=((str(tmpdir_path / "missing"), str(bar_file)),)
+                )
+                with self.assertRaises(FileNotFoundError):
+                    spec.spawn(("true",))
+
+            with self.subTest("Failed exec"):
+                with self.assertRaises(FileNotFoundError):
+                    SandboxSpec().spawn((str(tmpdir_path / "missing"),))
@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from asyncio import run as asyncio_run
+from asyncio import wait_for
+from os import getpid
+from subprocess import Popen
+from sys import executable
+from time import monotonic, sleep
+from unittest import TestCase
+from unittest.mock import patch
+
+from lxns.namespaces import NetworkNamespace
+from lxns.watcher import NamespaceWatcher, WatchedNamespace
+
+
+class TestNamespaceWatcher(TestCase):
+    def setUp(self) -> None:
+        self.target_process = Popen(
+            (executable, "-m", "lxns", "-u", "user,net", "sleep", "10")
+        )
+        deadline = monotonic() + 3
+        current_net_ns_id = NetworkNamespace.get_current_ns_id()
+        while True:
+            with NetworkNamespace.from_pid(self.target_process.pid) as ns:
+                if ns.ns_id != current_net_ns_id:
+                    break
+
+            if monotonic() > deadline:
+                raise TimeoutError("Target did not unshare namespaces")
+
+            sleep(0.01)
+
+    def tearDown(self) -> None:
+        self.target_process.kill()
+        self.target_process.wait()
+
+    def test_watch(self) -> None:
+        emptied: list[WatchedNamespace] = []
+        with NamespaceWatcher() as watcher:
+            net_ns = NetworkNamespace.from_pid(self.target_process.pid)
+            watched = watcher.watch(net_ns, callback=emptied.append, auto_close=True)
+            self.assertEqual(watched.pids, {self.target_process.pid})
+            self.assertEqual(watcher.process_events(), [])
+
+            with self.subTest("Not a member"):
+                with self.assertRaises(ValueError):
+                    watcher.add_pids(watched, (getpid(),))
+
+            with self.subTest("Already watched"):
+                with NetworkNamespace.from_pid(self.target_process.pid) as same_ns:
+                    with self.assertRaises(KeyError):
+                        watcher.watch(same_ns)
+
+            self.target_process.kill()
+            self.assertEqual(watcher.process_events(timeout=3), [watched])
+            self.assertEqual(emptied, [watched])
+            self.assertTrue(watched.is_empty)
+            self.assertEqual(watched.pids, set())
+            with self.assertRaises(ValueError):
+                net_ns.fileno()
+
+    def test_rescan_skips_other_processes(self) -> None:
+        emptied: list[WatchedNamespace] = []
+        with NamespaceWatcher(rescan_on_exit=True) as watcher:
+            with NetworkNamespace.from_pid(self.target_process.pid) as net_ns:
+                watched = watcher.watch(net_ns, callback=emptied.append)
+
+                # Scan found a reused pid that is not in the namespace anymore
+                with patch.object(watcher, "_find_members", return_value=[getpid()]):
+                    self.target_process.kill()
+                    self.assertEqual(watcher.process_events(timeout=3), [watched])
+
+                self.assertEqual(emptied, [watched])
+                self.assertTrue(watched.is_empty)
+
+    def test_watch_empty(self) -> None:
+        emptied: list[WatchedNamespace] = []
+        with NamespaceWatcher() as watcher:
+            with NetworkNamespace.from_pid(self.target_process.pid) as net_ns:
+                self.target_process.kill()
+                self.target_process.wait()
+
+                watched = watcher.watch(net_ns, callback=emptied.append)
+                self.assertTrue(watched.is_empty)
+                self.assertEqual(emptied, [watched])
+
+    def test_asyncio(self) -> None:
+        async def wait_target_exit() -> None:
+            with NamespaceWatcher() as watcher:
+                watcher.attach_to_loop()
+                with NetworkNamespace.from_pid(self.target_process.pid) as net_ns:
+                    watched = watcher.watch(net_ns, (self.target_process.pid,))
+                    self.target_process.terminate()
+                    await wait_for(watcher.wait_empty(watched), timeout=3)
+
+                self.assertTrue(watched.is_empty)
+
+        asyncio_run(wait_target_exit())
@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from os import getpid
+from pathlib import Path
+from subprocess import Popen
+from sys import executable
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+from unittest import TestCase
+
+from lxns.namespaces import NetworkNamespace, PidNamespace, UserNamespace
+from lxns.os import CLONE_NEWNET, CLONE_NEWPID
+from lxns.zygote import ZygoteClient, start_zygote
+
+
+def get_namespaces_ids() -> tuple[int, int]:
+    return UserNamespace.get_current_ns_id(), NetworkNamespace.get_current_ns_id()
+
+
+def get_pid_and_namespace_id() -> tuple[int, int]:
+    with PidNamespace.from_self() as ns:
+        return getpid(), ns.ns_id
+
+
+def raise_value_error(message: str) -> None:
+    raise ValueError(message)
+
+
+class TestZygote(TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = TemporaryDirectory()
+        self.socket_path = Path(self._tmpdir.name) / "zygote.socket"
+
+        self.target_process = Popen(
+            (executable, "-m", "lxns", "-u", "user,net", "sleep", "10")
+        )
+        deadline = monotonic() + 3
+        current_user_ns_id = UserNamespace.get_current_ns_id()
+        while True:
+            with UserNamespace.from_pid(self.target_process.pid) as ns:
+                if ns.ns_id != current_user_ns_id:
+                    break
+
+            if monotonic() > deadline:
+                raise TimeoutError("Target did not unshare namespaces")
+
+            sleep(0.01)
+
+    def tearDown(self) -> None:
+        self.target_process.kill()
+        self.target_process.wait()
+        self._tmpdir.cleanup()
+
+    def test_spawn(self) -> None:
+        with UserNamespace.from_pid(self.target_process.pid) as user_ns:
+            target_user_ns_id = user_ns.ns_id
+            zygote_process = start_zygote(
+                self.socket_path,
+                preload=(__name__,),
+                namespaces=(user_ns,),
+            )
+
+        try:
+            with ZygoteClient(self.socket_path) as client:
+                user_ns_id, net_ns_id = client.spawn(get_namespaces_ids).result()
+                self.assertEqual(user_ns_id, target_user_ns_id)
+                self.assertEqual(net_ns_id, NetworkNamespace.get_current_ns_id())
+
+                with self.subTest("Join namespace"):
+                    with NetworkNamespace.from_pid(self.target_process.pid) as net_ns:
+                        net_ns_id = net_ns.ns_id
+                        child = client.spawn(get_namespaces_ids, namespaces=(net_ns,))
+
+                    self.assertEqual(child.result(), (target_user_ns_id, net_ns_id))
+
+                with self.subTest("Unshare"):
+                    children = [
+                        client.spawn(get_namespaces_ids, unshare_flags=CLONE_NEWNET)
+                        for _ in range(3)
+                    ]
+                    net_ns_ids = {child.result()[1] for child in children}
+                    self.assertEqual(len(net_ns_ids), 3)
+                    self.assertNotIn(NetworkNamespace.get_current_ns_id(), net_ns_ids)
+
+                with self.subTest("Pid namespace"):
+                    pid, pid_ns_id = client.spawn(
+                        get_pid_and_namespace_id, unshare_flags=CLONE_NEWPID
+                    ).result()
+                    self.assertEqual(pid, 1)
+                    self.assertNotEqual(pid_ns_id, PidNamespace.get_current_ns_id())
+
+                with self.subTest("Exception"):
+                    child = client.spawn(raise_value_error, "test")
+                    with self.assertRaisesRegex(ValueError, "test"):
+                        child.result()
+
+                with self.subTest("Failed setns"):
+                    # Zygote has no capabilities in the parent user namespace
+                    with UserNamespace.from_self() as parent_user_ns:
+                        child = client.spawn(
+                            get_namespaces_ids, namespaces=(parent_user_ns,)
+                        )
+
+                    with self.assertRaises(PermissionError):
+                        child.result()
+        finally:
+            zygote_process.terminate()
+            zygote_process.wait()
@@ -0,0 +1,459 @@
+# SPDX-License-Identifier: MPL-2.0
+# SPDX-FileCopyrightText: 2025 igo95862
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from json import dump, load
+from os import _exit as os_exit
+from os import close as close_fd
+from os import cpu_count, fork, getgid, getuid, pipe
+from os import read as read_fd
+from os import strerror, uname, waitpid
+from os import write as write_fd
+from pathlib import Path
+from platform import python_implementation, python_version
+from resource import RLIMIT_NOFILE, getrlimit, setrlimit
+from statistics import mean, median
+from struct import Struct
+from sys import stdout
+from tempfile import TemporaryDirectory
+from time import perf_counter_ns, time
+from typing import TYPE_CHECKING
+
+from lxns.mount import ClonedTree
+from lxns.namespaces import (
+    ALL_NAMESPACE_CLASSES,
+    MountNamespace,
+    NetworkNamespace,
+    PidNamespace,
+    UserNamespace,
+    current_namespaces,
+)
+from lxns.os import (
+    CLONE_NEWNS,
+    CLONE_NEWUSER,
+    fstat_ino_many,
+    ns_get_nstype,
+    ns_get_nstype_many,
+    ns_get_userns,
+    ns_get_userns_many,
+    unshare,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from typing import Any, Dict, Union
+
+    from lxns.namespaces import BaseNamespace
+
+    BenchmarkResult = Dict[str, Union[int, float, str]]
+
+DEFAULT_ITERATIONS = 1000
+DEFAULT_SCALES = (1, 10, 100, 1000, 10000)
+
+_TIMING = Struct("=q")
+
+
+def measure(function: Callable[[], object], iterations: int) -> BenchmarkResult:
+    timings: list[int] = []
+    for _ in range(iterations):
+        start = perf_counter_ns()
+        function()
+        timings.append(perf_counter_ns() - start)
+
+    return {
+        "iterations": iterations,
+        "min_ns": min(timings),
+        "median_ns": median(timings),
+        "mean_ns": mean(timings),
+        "max_ns": max(timings),
+    }
+
+
+def measure_total(
+    function: Callable[[], object],
+    operations: int,
+) -> BenchmarkResult:
+    start = perf_counter_ns()
+    function()
+    total_ns = perf_counter_ns() - start
+    return {
+        "operations": operations,
+        "total_ns": total_ns,
+        "per_operation_ns": total_ns / operations,
+    }
+
+
+def measure_in_child(
+    prepare: Callable[[], Callable[[], object]], iterations: int
+) -> BenchmarkResult:
+    # Joining or creating some namespaces changes the process in a way
+    # that can not be repeated. For example, pid namespace can only be
+    # unshared once. Each iteration runs in a fresh forked child.
+    # Prepare is not timed and returns the function to measure.
+    timings: list[int] = []
+    for _ in range(iterations):
+        read_end, write_end = pipe()
+        pid = fork()
+        if pid == 0:
+            try:
+                close_fd(read_end)
+                try:
+                    function = prepare()
+                    start = perf_counter_ns()
+                    function()
+                    timing = perf_counter_ns() - start
+                except OSError as e:
+                    timing = -(e.errno or 0)
+
+                write_fd_all(write_end, _TIMING.pack(timing))
+            finally:
+                os_exit(0)
+
+        close_fd(write_end)
+        try:
+            data = read_fd_all(read_end)
+        finally:
+            close_fd(read_end)
+            waitpid(pid, 0)
+
+        if len(data) != _TIMING.size:
+            raise ChildProcessError("Benchmark child exited without result.")
+
+        (timing,) = _TIMING.unpack(data)
+        if timing < 0:
+            return {"error": strerror(-timing)}
+
+        timings.append(timing)
+
+    return {
+        "iterations": iterations,
+        "min_ns": min(timings),
+        "median_ns": median(timings),
+        "mean_ns": mean(timings),
+        "max_ns": max(timings),
+    }
+
+
+def read_fd_all(fd: int) -> bytes:
+    chunks: list[bytes] = []
+    while chunk := read_fd(fd, 4096):
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+def write_fd_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[write_fd(fd, view) :]
+
+
+def raise_open_files_limit() -> None:
+    # Scaling benchmarks hold thousands of file descriptors
+    _, hard_limit = getrlimit(RLIMIT_NOFILE)
+    setrlimit(RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+
+def unshare_user_namespace() -> None:
+    # Map the current user to root so that nested
+    # namespaces can be created.
+    uid, gid = getuid(), getgid()
+    unshare(CLONE_NEWUSER)
+    current_namespaces.refresh()
+    Path("/proc/self/setgroups").write_text("deny")
+    Path("/proc/self/uid_map").write_text(f"0 {uid} 1")
+    Path("/proc/self/gid_map").write_text(f"0 {gid} 1")
+
+
+def _return_function(function: Callable[[], object]) -> Callable[[], object]:
+    return function
+
+
+def _prepare_children_setns(ns_class: type[BaseNamespace]) -> Callable[[], object]:
+    ns_class.unshare()
+    if ns_class is PidNamespace:
+        # Pid namespace can not be opened until its init process is created.
+        pid = fork()
+        if pid == 0:
+            os_exit(0)
+
+        waitpid(pid, 0)
+
+    namespace = ns_class.from_pid("self", for_children=True)
+    return namespace.setns
+
+
+def bench_namespaces(iterations: int) -> dict[str, BenchmarkResult]:
+    unshare_user_namespace()
+    results: dict[str, BenchmarkResult] = {}
+
+    for ns_class in ALL_NAMESPACE_CLASSES:
+        type_name = ns_class.__name__
+
+        results[f"{type_name}.from_pid"] = measure(
+            lambda: ns_class.from_pid("self").close(), iterations
+        )
+
+        results[f"{type_name}.get_current_ns_id"] = measure(
+            ns_class.get_current_ns_id, iterations
+        )
+
+        def get_current_ns_id_uncached() -> None:
+            current_namespaces.invalidate(ns_class.NAMESPACE_CONSTANT)
+            ns_class.get_current_ns_id()
+
+        results[f"{type_name}.get_current_ns_id.uncached"] = measure(
+            get_current_ns_id_uncached, iterations
+        )
+
+        if ns_class is UserNamespace:
+            # Every new user namespace increases the nesting level
+            # which is limited to 32 levels.
+            continue
+
+        if ns_class.HAS_NAMESPACE_FOR_CHILDREN:
+            # Pid and time namespaces can only be unshared once and
+            # only joined if owned by the benchmark user namespace.
+            # Each iteration runs in a fresh child which joins
+            # the namespace it created for its children.
+            results[f"{type_name}.unshare"] = measure_in_child(
+                partial(_return_function, ns_class.unshare), iterations
+            )
+            results[f"{type_name}.setns"] = measure_in_child(
+                partial(_prepare_children_setns, ns_class), iterations
+            )
+            continue
+
+        try:
+            results[f"{type_name}.unshare"] = measure(ns_class.unshare, iterations)
+        except OSError as e:
+            results[f"{type_name}.unshare"] = {"error": str(e)}
+
+        with ns_class.from_self() as ns:
+            try:
+                results[f"{type_name}.setns"] = measure(ns.setns, iterations)
+            except OSError as e:
+                results[f"{type_name}.setns"] = {"error": str(e)}
+
+    with NetworkNamespace.from_self() as ns:
+        fd = ns.fileno()
+        results["ns_get_nstype"] = measure(lambda: ns_get_nstype(fd), iterations)
+        results["ns_get_userns"] = measure(
+            lambda: close_fd(ns_get_userns(fd)), iterations
+        )
+
+    return results
+
+
+def bench_mounts(iterations: int, scales: Iterable[int]) -> dict[str, BenchmarkResult]:
+    unshare_user_namespace()
+    MountNamespace.unshare()
+    results: dict[str, BenchmarkResult] = {}
+
+    with TemporaryDirectory() as tmp_dir, MountNamespace.from_self() as clean_ns:
+        mount_source = Path(tmp_dir) / "source"
+        mount_source.mkdir()
+        mount_target = Path(tmp_dir) / "target"
+        mount_target.mkdir()
+
+        results["ClonedTree.__init__"] = measure(
+            lambda: ClonedTree(mount_source).close(), iterations
+        )
+
+        try:
+            for scale in scales:
+                clean_ns.setns()
+                MountNamespace.unshare()
+                # Each detached tree can only be mounted once
+                trees = [ClonedTree(mount_source) for _ in range(scale)]
+                try:
+
+                    def mount_many() -> None:
+                        for tree in trees:
+                            tree.mount(mount_target)
+
+                    results[f"ClonedTree.mount.{scale}"] = measure_total(
+                        mount_many, scale
+                    )
+                finally:
+                    for tree in trees:
+                        tree.close()
+
+                results[f"MountNamespace.unshare.{scale}_mounts"] = measure(
+                    MountNamespace.unshare, min(iterations, 100)
+                )
+
+                with MountNamespace.from_self() as template:
+                    results[f"MountNamespace.clone_from.{scale}_mounts"] = measure(
+                        lambda: MountNamespace.clone_from(template).close(),
+                        min(iterations, 100),
+                    )
+        finally:
+            # Temporary directory can only be removed without mounts on top
+            clean_ns.setns()
+
+    return results
+
+
+def bench_many_namespaces(scales: Iterable[int]) -> dict[str, BenchmarkResult]:
+    unshare_user_namespace()
+    results: dict[str, BenchmarkResult] = {}
+
+    for scale in scales:
+        namespaces: list[NetworkNamespace] = []
+
+        def create_many() -> None:
+            for _ in range(scale):
+                NetworkNamespace.unshare()
+                namespaces.append(NetworkNamespace.from_self())
+
+        try:
+            results[f"NetworkNamespace.create.{scale}"] = measure_total(
+                create_many, scale
+            )
+
+            fds = [ns.fileno() for ns in namespaces]
+            results[f"ns_get_nstype_many.{scale}"] = measure_total(
+                lambda: ns_get_nstype_many(fds), scale
+            )
+
+            def ns_get_userns_many_and_close() -> None:
+                for user_ns_fd in ns_get_userns_many(fds):
+                    close_fd(user_ns_fd)
+
+            results[f"ns_get_userns_many.{scale}"] = measure_total(
+                ns_get_userns_many_and_close, scale
+            )
+            results[f"fstat_ino_many.{scale}"] = measure_total(
+                lambda: fstat_ino_many(fds), scale
+            )
+
+            def ns_id_many() -> None:
+                for ns in namespaces:
+                    ns.ns_id
+
+            results[f"BaseNamespace.ns_id.{scale}"] = measure_total(ns_id_many, scale)
+        finally:
+            for ns in namespaces:
+                ns.close()
+
+    return results
+
+
+def executor_task() -> int:
+    NetworkNamespace.unshare()
+    return NetworkNamespace.get_current_ns_id()
+
+
+def executor_initializer() -> None:
+    unshare(CLONE_NEWUSER | CLONE_NEWNS)
+
+
+def bench_process_executor(scales: Iterable[int]) -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+
+    for scale in scales:
+        with ProcessPoolExecutor(initializer=executor_initializer) as executor:
+            # Start the workers before measuring
+            for future in [executor.submit(int) for _ in range(cpu_count() or 1)]:
+                future.result()
+
+            def run_tasks() -> None:
+                futures = [executor.submit(executor_task) for _ in range(scale)]
+                for future in futures:
+                    future.result()
+
+            results[f"ProcessPoolExecutor.unshare.{scale}"] = measure_total(
+                run_tasks, scale
+            )
+
+    return results
+
+
+def run_in_child(function: Callable[..., dict[str, Any]], *args: Any) -> Any:
+    # Every benchmark group runs in a fresh process
+    # that can create its own user namespace.
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> None:
+    for name, result in results["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+
+        for key in ("median_ns", "per_operation_ns"):
+            if key in result and key in baseline_result:
+                ratio = result[key] / baseline_result[key]
+                print(f"{name}: {ratio:.2f}x", flush=True)
+
+
+def main(
+    output: Path | None,
+    baseline: Path | None,
+    iterations: int,
+    scales: list[int],
+) -> None:
+    raise_open_files_limit()
+
+    results: dict[str, Any] = {}
+    results.update(run_in_child(bench_namespaces, iterations))
+    results.update(run_in_child(bench_mounts, iterations, scales))
+    results.update(run_in_child(bench_many_namespaces, scales))
+    results.update(bench_process_executor(scales))
+
+    report = {
+        "timestamp": time(),
+        "python": f"{python_implementation()} {python_version()}",
+        "kernel": uname().release,
+        "iterations": iterations,
+        "results": results,
+    }
+
+    if output is None:
+        dump(report, stdout, indent=2)
+        print()
+    else:
+        with open(output, mode="w") as f:
+            dump(report, f, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            compare(report, load(f))
+
+
+if __name__ == "__main__":
+    arg_parse = ArgumentParser(
+        description=(
+            "Run benchmarks inside unprivileged user namespaces "
+            "and output results as JSON."
+        ),
+    )
+    arg_parse.add_argument(
+        "--output",
+        type=Path,
+        help="Write results to file instead of stdout.",
+    )
+    arg_parse.add_argument(
+        "--baseline",
+        type=Path,
+        help="Results file of previous run to compare against.",
+    )
+    arg_parse.add_argument(
+        "--iterations",
+        type=int,
+        default=DEFAULT_ITERATIONS,
+    )
+    arg_parse.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SCALES),
+        help="Number of namespaces and mounts to create. Up to 10000.",
+    )
+
+    main(**vars(arg_parse.parse_args()))